@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, FinancialAccount
+from .models import User, FinancialAccount, AccountBalanceCheckpoint, ExchangeRate
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('email', 'first_name', 'last_name', 'is_staff', 'is_active')
@@ -24,18 +24,35 @@ class CustomUserAdmin(UserAdmin):
 
 
 class FinancialAccountAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'account_type', 'initial_balance', 'currency', 'is_active', 'is_default')
+    list_display = ('name', 'user', 'account_type', 'initial_balance', 'balance', 'currency', 'is_active', 'is_default')
     list_filter = ('account_type', 'is_active', 'is_default', 'currency')
     search_fields = ('name', 'user__username', 'user__email')
     ordering = ('user', 'name')
+    readonly_fields = ('balance',)
     
     fieldsets = (
         (None, {'fields': ('user', 'name', 'account_type')}),
-        ('Finance', {'fields': ('initial_balance', 'currency')}),
+        ('Finance', {'fields': ('initial_balance', 'balance', 'currency')}),
         ('Appearance', {'fields': ('color', 'icon')}),
         ('Settings', {'fields': ('is_active', 'is_default', 'include_in_total', 'description')}),
     )
 
 
+class AccountBalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('account', 'date', 'balance')
+    list_filter = ('account__currency',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('account',)
+
+
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('date', 'currency', 'rate')
+    list_filter = ('currency',)
+    date_hierarchy = 'date'
+    ordering = ('-date', 'currency')
+
+
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(FinancialAccount, FinancialAccountAdmin)
+admin.site.register(AccountBalanceCheckpoint, AccountBalanceCheckpointAdmin)
+admin.site.register(ExchangeRate, ExchangeRateAdmin)
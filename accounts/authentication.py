@@ -0,0 +1,168 @@
+"""
+authentication.py - Autentizace API požadavků bez dotazu do databáze
+
+@author Tomáš Holes
+@description Obsahuje:
+    - UserCache: LRU cache uživatelů s krátkou platností (v rámci procesu)
+    - get_cached_user() / invalidate_user(): načtení a zneplatnění uživatele
+    - CachedJWTAuthentication: JWT autentizace - uživatel z cache podle user_id v tokenu
+    - CachedTokenAuthentication: tokenová autentizace (zpětná kompatibilita) přes cache
+
+@note Podpis JWT ověřuje simplejwt bez databáze, načtení uživatele se při zásahu
+      do cache také obejde bez dotazu. Záznam se zneplatní při uložení uživatele
+      (úprava profilu, změna hesla, deaktivace); ostatní procesy serveru změnu
+      uvidí nejpozději po USER_CACHE_TTL sekundách.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Výchozí platnost záznamu (sekundy) a maximální počet uživatelů v cache
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 1024
+
+
+class UserCache:
+    """Jednoduchá thread-safe LRU cache s časovou platností záznamů."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def delete_where(self, predicate):
+        """Odstraní všechny záznamy, jejichž hodnota splňuje podmínku."""
+        with self._lock:
+            for key in [key for key, (value, _) in self._items.items() if predicate(value)]:
+                del self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+_user_cache = UserCache(
+    getattr(settings, 'USER_CACHE_TTL', USER_CACHE_TTL),
+    getattr(settings, 'USER_CACHE_SIZE', USER_CACHE_SIZE),
+)
+
+# Klíč tokenu -> id uživatele (tokeny pro zpětnou kompatibilitu)
+_token_cache = UserCache(
+    getattr(settings, 'USER_CACHE_TTL', USER_CACHE_TTL),
+    getattr(settings, 'USER_CACHE_SIZE', USER_CACHE_SIZE),
+)
+
+
+def get_cached_user(user_id):
+    """
+    Vrátí uživatele podle id - z cache, nebo jedním dotazem z databáze.
+
+    Každý požadavek dostane vlastní kopii instance, aby se změny v jednom
+    požadavku (např. user.save()) nepromítly do ostatních vláken.
+    """
+    # JWT nese id jako řetězec - klíč cache je vždy řetězec
+    key = str(user_id)
+    user = _user_cache.get(key)
+    if user is None:
+        user = get_user_model()._default_manager.filter(pk=user_id).first()
+        if user is None:
+            return None
+        _user_cache.set(key, user)
+    return copy.copy(user)
+
+
+def invalidate_user(user_id):
+    """Odstraní uživatele a jeho tokeny z cache (volá se po uložení uživatele)."""
+    _user_cache.delete(str(user_id))
+    _token_cache.delete_where(lambda cached_id: str(cached_id) == str(user_id))
+
+
+def invalidate_token(key):
+    _token_cache.delete(key)
+
+
+def clear_user_cache():
+    _user_cache.clear()
+    _token_cache.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, která uživatele načítá přes get_cached_user().
+    Předpokládá USER_ID_FIELD = 'id' (výchozí nastavení simplejwt).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        # Stejné kontroly jako JWTAuthentication.get_user
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            jwt_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication s cache klíč tokenu -> uživatel."""
+
+    def authenticate_credentials(self, key):
+        user_id = _token_cache.get(key)
+        if user_id is None:
+            user_id = self.get_model().objects.filter(key=key).values_list('user_id', flat=True).first()
+            if user_id is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            _token_cache.set(key, user_id)
+
+        user = get_cached_user(user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        # DRF vrací (user, token) - instance tokenu se sestaví bez dotazu,
+        # request.auth.key a request.auth.user fungují jako u TokenAuthentication
+        return user, self.get_model()(key=key, user=user)
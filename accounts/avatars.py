@@ -0,0 +1,142 @@
+"""
+avatars.py - Zpracování nahraných avatarů
+
+@author Tomáš Holes
+@description Obsahuje:
+    - process_avatar(): upload -> čtvercové varianty ve WebP a JPEG bez EXIF
+    - variant_names() / delete_avatar_files(): soubory variant a jejich mazání
+    - avatar_variant_path(): cesta k nejvhodnější variantě pro danou velikost
+
+@note Upload se po částech zapíše do dočasného souboru, takže se celý nedrží
+      v paměti. Názvy souborů obsahují hash obsahu - URL se při změně obrázku
+      změní, a soubory proto mohou mít neomezenou platnost v cache prohlížeče.
+"""
+import hashlib
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Výchozí hodnoty - settings.AVATAR_SIZES / AVATAR_DEFAULT_SIZE / AVATAR_MAX_UPLOAD_SIZE je přepíší
+# Velikosti variant (px) a výchozí velikost pro serializer
+AVATAR_SIZES = (64, 128, 256)
+AVATAR_DEFAULT_SIZE = 128
+
+# Formáty variant: klíč -> (formát Pillow, přípona, parametry uložení)
+AVATAR_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+# Limity vstupu - velikost souboru a počet pixelů (ochrana proti "decompression bomb")
+AVATAR_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+AVATAR_MAX_PIXELS = 40_000_000
+
+AVATAR_DIRECTORY = 'avatars'
+
+
+def _sizes():
+    return tuple(sorted(getattr(settings, 'AVATAR_SIZES', AVATAR_SIZES)))
+
+
+def _open_upload(upload):
+    """Zapíše upload po částech do dočasného souboru a otevře ho v Pillow."""
+    max_size = getattr(settings, 'AVATAR_MAX_UPLOAD_SIZE', AVATAR_MAX_UPLOAD_SIZE)
+    if upload.size and upload.size > max_size:
+        raise ValidationError(f'Soubor je příliš velký (maximum {max_size // (1024 * 1024)} MB).')
+
+    temp = tempfile.TemporaryFile()
+    for chunk in upload.chunks():
+        temp.write(chunk)
+    temp.seek(0)
+    try:
+        image = Image.open(temp)
+        # Rozměry jsou známé z hlavičky, dekóduje se až po kontrole
+        too_large = image.width * image.height > AVATAR_MAX_PIXELS
+        if not too_large:
+            image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        temp.close()
+        raise ValidationError('Soubor není platný obrázek.')
+    if too_large:
+        temp.close()
+        raise ValidationError('Obrázek má příliš velké rozměry.')
+    return image, temp
+
+
+def _normalize(image):
+    """Otočí obrázek podle EXIF orientace a převede ho na RGB bez metadat."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        # JPEG nemá průhlednost - podklad bílou barvou
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def process_avatar(upload, user_id):
+    """
+    Vytvoří a uloží varianty avatara.
+
+    Obrázek se ořízne na střed do čtverce a zmenší na každou velikost
+    z AVATAR_SIZES ve formátech WebP a JPEG. Metadata (EXIF, GPS) se neukládají.
+
+    Returns:
+        dict: {'128': {'webp': 'avatars/<user_id>/<hash>_128.webp', 'jpeg': ...}, ...}
+
+    Raises:
+        ValidationError: soubor není obrázek nebo je příliš velký
+    """
+    image, temp = _open_upload(upload)
+    try:
+        image = _normalize(image)
+    finally:
+        temp.close()
+
+    variants = {}
+    largest = _sizes()[-1]
+    base = ImageOps.fit(image, (largest, largest), Image.Resampling.LANCZOS)
+    for size in _sizes():
+        resized = base if size == largest else base.resize((size, size), Image.Resampling.LANCZOS)
+        variants[str(size)] = {}
+        for key, (image_format, extension, options) in AVATAR_FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, **options)
+            content = buffer.getvalue()
+            digest = hashlib.sha256(content).hexdigest()[:16]
+            name = f'{AVATAR_DIRECTORY}/{user_id}/{digest}_{size}.{extension}'
+            # Stejný obsah = stejný název, soubor se neukládá znovu
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(content))
+            variants[str(size)][key] = name
+    return variants
+
+
+def variant_names(variants):
+    """Množina cest ke všem souborům variant."""
+    return {name for formats in (variants or {}).values() for name in formats.values()}
+
+
+def delete_avatar_files(names):
+    """Smaže soubory avatara (chybějící soubory se přeskočí)."""
+    for name in names:
+        default_storage.delete(name)
+
+
+def avatar_variant_path(variants, size=None, image_format='webp'):
+    """
+    Cesta k nejmenší variantě, která je alespoň požadované velikosti
+    (jinak k největší dostupné).
+    """
+    if not variants:
+        return None
+    size = size or getattr(settings, 'AVATAR_DEFAULT_SIZE', AVATAR_DEFAULT_SIZE)
+    available = sorted(int(key) for key in variants)
+    chosen = next((candidate for candidate in available if candidate >= size), available[-1])
+    formats = variants[str(chosen)]
+    return formats.get(image_format) or next(iter(formats.values()))
@@ -0,0 +1,317 @@
+"""
+balances.py - Udržovaný zůstatek účtů a kontrolní body
+
+@author Tomáš Holes
+@description Obsahuje:
+    - transaction_deltas(): změny zůstatků, které způsobí jedna transakce
+    - apply_deltas(): atomické přičtení změn do FinancialAccount.balance a kontrolních bodů
+    - balance_as_of(): zůstatek účtu k datu (kontrolní bod + krátký rozsah transakcí)
+    - rebuild_checkpoints(): přepočet měsíčních kontrolních bodů z historie
+    - find_drift() / repair_balances(): kontrola a oprava udržovaných zůstatků
+    - history_points() / balance_history(): časová řada zůstatků účtů (den/měsíc)
+    - set_running_balances(): zůstatek po každém řádku stránky výpisu účtu
+
+@note Kontrolní bod drží zůstatek na konci svého dne. Změna transakce ze dne D
+      proto posune zůstatek účtu i všechny kontrolní body s datem >= D.
+      Hodnoty se mění pouze výrazy F('balance') + delta, souběžné zápisy se nepřepíší.
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Sum, Value
+
+from transactions.fields import CentsAmountField
+
+from .models import AccountBalanceCheckpoint, FinancialAccount
+
+ZERO = Decimal('0')
+
+
+def transaction_deltas(transaction_type, amount, account_id, to_account_id, day, sign=1):
+    """
+    Změny zůstatků účtů způsobené jednou transakcí.
+
+    Returns:
+        list: n-tice (account_id, date, delta); sign=-1 vrátí opačné změny (smazání)
+    """
+    amount = (amount or ZERO) * sign
+    deltas = []
+    if account_id:
+        deltas.append((account_id, day, amount if transaction_type == 'INCOME' else -amount))
+    if to_account_id and transaction_type == 'TRANSFER':
+        deltas.append((to_account_id, day, amount))
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Přičte změny do udržovaných zůstatků a kontrolních bodů.
+
+    Args:
+        deltas: iterable (account_id, date, delta); date=None posune všechny kontrolní body
+    """
+    merged = defaultdict(Decimal)
+    for account_id, day, delta in deltas:
+        merged[(account_id, day)] += delta
+
+    with db_transaction.atomic():
+        for (account_id, day), delta in merged.items():
+            if not delta:
+                continue
+            change = Value(delta, output_field=CentsAmountField())
+            FinancialAccount.objects.filter(pk=account_id).update(balance=F('balance') + change)
+            checkpoints = AccountBalanceCheckpoint.objects.filter(account_id=account_id)
+            if day is not None:
+                checkpoints = checkpoints.filter(date__gte=day)
+            checkpoints.update(balance=F('balance') + change)
+
+
+def balance_delta_expression(account):
+    """Výraz se změnou zůstatku účtu, kterou způsobí jeden řádek transakce."""
+    from django.db.models import Case, ExpressionWrapper, When
+
+    negative = ExpressionWrapper(F('amount') * Value(-1), output_field=CentsAmountField())
+    return Case(
+        When(account_id=account.pk, type='INCOME', then=F('amount')),
+        When(account_id=account.pk, then=negative),
+        When(to_account_id=account.pk, type='TRANSFER', then=F('amount')),
+        output_field=CentsAmountField(),
+    )
+
+
+def _delta_totals(transactions, account):
+    """Součet změn zůstatku účtu z daných transakcí (jeden dotaz)."""
+    totals = transactions.aggregate(
+        income=Sum('amount', filter=Q(account=account, type='INCOME')),
+        outgoing=Sum('amount', filter=Q(account=account, type__in=['EXPENSE', 'TRANSFER'])),
+        incoming=Sum('amount', filter=Q(to_account=account, type='TRANSFER')),
+    )
+    return (totals['income'] or ZERO) - (totals['outgoing'] or ZERO) + (totals['incoming'] or ZERO)
+
+
+def balance_as_of(account, day):
+    """
+    Zůstatek účtu na konci dne.
+
+    Vezme poslední kontrolní bod do daného dne (jinak počáteční zůstatek)
+    a přičte jen transakce mezi ním a požadovaným dnem.
+    """
+    from transactions.models import Transaction
+
+    checkpoint = account.balance_checkpoints.filter(date__lte=day).order_by('-date').values_list(
+        'date', 'balance'
+    ).first()
+    transactions = Transaction.objects.filter(
+        Q(account=account) | Q(to_account=account),
+        user_id=account.user_id,
+        date__lte=day
+    )
+    if checkpoint:
+        start, base = checkpoint
+        transactions = transactions.filter(date__gt=start)
+    else:
+        base = account.initial_balance
+    return base + _delta_totals(transactions, account)
+
+
+def _daily_deltas(account_ids):
+    """
+    Denní změny zůstatků účtů ze dvou seskupených dotazů.
+
+    Returns:
+        dict: account_id -> {date: delta}
+    """
+    from transactions.models import Transaction
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    outgoing = Transaction.objects.filter(
+        account_id__in=account_ids, user=F('account__user')
+    ).values_list('account_id', 'date', 'type').annotate(total=Sum('amount')).order_by()
+    for account_id, day, transaction_type, total in outgoing:
+        deltas[account_id][day] += total if transaction_type == 'INCOME' else -total
+
+    incoming = Transaction.objects.filter(
+        to_account_id__in=account_ids, type='TRANSFER', user=F('to_account__user')
+    ).values_list('to_account_id', 'date').annotate(total=Sum('amount')).order_by()
+    for account_id, day, total in incoming:
+        deltas[account_id][day] += total
+    return deltas
+
+
+def _month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def rebuild_checkpoints(account_ids, until):
+    """
+    Přepočítá kontrolní body účtů z historie transakcí.
+
+    Kontrolní bod vznikne ke konci každého měsíce s nějakou transakcí (do data
+    until včetně); existující body se přepočtou, i když v jejich měsíci nic není.
+
+    Returns:
+        int: počet zapsaných kontrolních bodů
+    """
+    account_ids = list(account_ids)
+    deltas = _daily_deltas(account_ids)
+    initial = dict(FinancialAccount.objects.filter(pk__in=account_ids).values_list('id', 'initial_balance'))
+    existing = defaultdict(set)
+    for account_id, day in AccountBalanceCheckpoint.objects.filter(account_id__in=account_ids).values_list(
+        'account_id', 'date'
+    ):
+        existing[account_id].add(day)
+
+    rows = []
+    for account_id, opening in initial.items():
+        daily = deltas.get(account_id, {})
+        checkpoint_dates = existing[account_id] | {
+            _month_end(day) for day in daily if _month_end(day) <= until
+        }
+        # Společný průchod seřazenými dny transakcí a kontrolních bodů
+        days = sorted(daily)
+        running, index = opening, 0
+        for checkpoint_date in sorted(checkpoint_dates):
+            while index < len(days) and days[index] <= checkpoint_date:
+                running += daily[days[index]]
+                index += 1
+            rows.append(AccountBalanceCheckpoint(account_id=account_id, date=checkpoint_date, balance=running))
+
+    AccountBalanceCheckpoint.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['account', 'date'],
+        update_fields=['balance'],
+    )
+    return len(rows)
+
+
+def find_drift(accounts=None):
+    """
+    Porovná udržovaný zůstatek se zůstatkem spočteným z transakcí.
+
+    Returns:
+        list: n-tice (account, uložený zůstatek, spočtený zůstatek) pro účty s rozdílem
+    """
+    accounts = accounts if accounts is not None else FinancialAccount.objects.all()
+    return [
+        (account, account.balance, account.calculated_balance)
+        for account in accounts.with_balances().order_by('pk').iterator(chunk_size=1000)
+        if account.balance != account.calculated_balance
+    ]
+
+
+def repair_balances(drifted):
+    """
+    Opraví udržované zůstatky účtů s rozdílem o chybějící změnu (F výraz,
+    aby se nepřepsaly souběžné zápisy) a přepočítá jejich kontrolní body.
+    """
+    from django.utils import timezone
+
+    with db_transaction.atomic():
+        for account, stored, calculated in drifted:
+            FinancialAccount.objects.filter(pk=account.pk).update(
+                balance=F('balance') + Value(calculated - stored, output_field=CentsAmountField())
+            )
+        rebuild_checkpoints([account.pk for account, _, _ in drifted], timezone.now().date())
+
+
+def history_points(start, end, interval='day'):
+    """
+    Data bodů časové řady - každý den, nebo konec každého měsíce
+    (poslední bod je vždy end, i když měsíc ještě neskončil).
+    """
+    if interval == 'day':
+        return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    points = []
+    day = _month_end(start)
+    while day < end:
+        points.append(day)
+        day = _month_end(day + timedelta(days=1))
+    points.append(end)
+    return points
+
+
+def balance_history(accounts, points):
+    """
+    Zůstatky účtů na konci každého dne z points.
+
+    Jeden seskupený dotaz vrátí denní změny od prvního bodu dál. Zůstatek před
+    prvním bodem je udržovaný zůstatek minus všechny tyto změny, zbytek je
+    kumulativní součet - dny bez transakcí přebírají předchozí hodnotu.
+
+    Returns:
+        dict: account_id -> list zůstatků (Decimal) ve stejném pořadí jako points
+    """
+    from transactions.models import Transaction
+
+    accounts = list(accounts)
+    if not accounts or not points:
+        return {account.pk: [] for account in accounts}
+    ids = [account.pk for account in accounts]
+    user_ids = {account.user_id for account in accounts}
+
+    rows = Transaction.objects.filter(
+        Q(account_id__in=ids) | Q(to_account_id__in=ids, type='TRANSFER'),
+        user_id__in=user_ids,
+        date__gte=points[0]
+    ).values_list('account_id', 'to_account_id', 'type', 'date').annotate(total=Sum('amount')).order_by()
+
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for account_id, to_account_id, transaction_type, day, total in rows:
+        for delta in transaction_deltas(transaction_type, total, account_id, to_account_id, day):
+            deltas[delta[0]][day] += delta[2]
+
+    history = {}
+    for account in accounts:
+        daily = deltas.get(account.pk, {})
+        running = account.balance - sum(daily.values(), ZERO)
+        days = sorted(daily)
+        index = 0
+        values = []
+        for point in points:
+            while index < len(days) and days[index] <= point:
+                running += daily[days[index]]
+                index += 1
+            values.append(running)
+        history[account.pk] = values
+    return history
+
+
+def set_running_balances(account, rows, descending=True):
+    """
+    Doplní do řádků stránky výpisu účtu atribut running_balance (zůstatek po řádku).
+
+    Řádky musí být souvislý úsek historie účtu seřazený podle (date, id) a mít
+    anotace balance_delta a cumulative_delta (okenní Sum ve stejném pořadí).
+    Kotva se vezme z kontrolního bodu k datu prvního řádku a změn ve stejném
+    dni - stránka tak nikdy nepřepočítává historii od začátku.
+    """
+    from transactions.models import Transaction
+
+    if not rows:
+        return rows
+    first = rows[0]
+    same_day = Transaction.objects.filter(
+        Q(account=account) | Q(to_account=account),
+        user_id=account.user_id,
+        date=first.date
+    )
+    # Okenní součet může začínat i před stránkou - počítá se relativně k prvnímu řádku
+    origin = first.cumulative_delta - first.balance_delta
+    if descending:
+        # Zůstatek po prvním (nejnovějším) řádku = konec dne minus novější řádky téhož dne
+        anchor = balance_as_of(account, first.date) - _delta_totals(same_day.filter(id__gt=first.id), account)
+        for row in rows:
+            row.running_balance = anchor - (row.cumulative_delta - row.balance_delta - origin)
+    else:
+        # Zůstatek před prvním (nejstarším) řádkem = konec předchozího dne plus starší řádky téhož dne
+        anchor = balance_as_of(account, first.date - timedelta(days=1)) + _delta_totals(
+            same_day.filter(id__lt=first.id), account
+        )
+        for row in rows:
+            row.running_balance = anchor + (row.cumulative_delta - origin)
+    return rows
@@ -0,0 +1,260 @@
+"""
+currency.py - Přepočet měn pro agregace
+
+@author Tomáš Holes
+@description Obsahuje:
+    - RateTable: kurzy v paměti indexované podle dne (poslední známý kurz
+      k danému dni, takže víkendy a svátky používají kurz z pátku)
+    - get_rate_table(): sdílená cache kurzů pro celý proces
+    - CurrencyConverter: součty transakcí v preferované měně uživatele
+
+@note Transakce nemají vlastní měnu - platí měna jejich účtu, u transakcí
+      bez účtu preferovaná měna uživatele. Agregace se proto v databázi
+      seskupí podle (měna, den) a přepočítají se až tyto skupiny, nikoli
+      jednotlivé řádky. Pokud uživatel nemá žádný účet v jiné měně, použije
+      se obyčejný SUM bez přepočtu.
+@note Chybí-li kurz k danému dni, použije se poslední známý (před prvním
+      kurzem ten nejstarší). Částky v měně bez jakéhokoli kurzu se vynechají
+      a view je hlásí v poli missing_rates.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+from decimal import ROUND_FLOOR, Decimal
+
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+# Kurzy jsou vedeny vůči koruně (počet CZK za 1 jednotku měny)
+BASE_CURRENCY = 'CZK'
+
+# Jak často (v sekundách) ověřit, zda se tabulka kurzů v DB nezměnila
+RATE_CACHE_TTL = 60
+
+CURRENCY_LABELS = {
+    'CZK': 'Kč',
+    'EUR': '€',
+    'USD': '$',
+}
+
+
+def currency_label(currency):
+    """Zobrazovaný symbol měny pro texty (insights, zprávy)."""
+    return CURRENCY_LABELS.get(currency, currency)
+
+
+class RateTable:
+    """Kurzy všech měn seřazené podle dne pro rychlé vyhledání bisekcí."""
+
+    def __init__(self, rows=()):
+        days = defaultdict(list)
+        for day, currency, rate in rows:
+            days[currency].append((day.toordinal(), Decimal(rate)))
+        self._days = {}
+        self._rates = {}
+        for currency, values in days.items():
+            values.sort()
+            self._days[currency] = [ordinal for ordinal, _ in values]
+            self._rates[currency] = [rate for _, rate in values]
+        self.version = None
+
+    def has_currency(self, currency):
+        return currency == BASE_CURRENCY or currency in self._days
+
+    def rate(self, currency, day):
+        """Kurz měny platný k danému dni (poslední známý), nebo None."""
+        if currency == BASE_CURRENCY:
+            return Decimal('1')
+        days = self._days.get(currency)
+        if not days:
+            return None
+        index = bisect_right(days, day.toordinal()) - 1
+        # Před prvním známým kurzem použijeme ten nejstarší
+        return self._rates[currency][max(index, 0)]
+
+    def rate_bounds(self, currency, start, end):
+        """Nejnižší a nejvyšší kurz měny platný v některém dni období, nebo None."""
+        if currency == BASE_CURRENCY:
+            return Decimal('1'), Decimal('1')
+        days = self._days.get(currency)
+        if not days:
+            return None
+        first = max(bisect_right(days, start.toordinal()) - 1, 0)
+        last = max(bisect_right(days, end.toordinal()), first + 1)
+        rates = self._rates[currency][first:last]
+        return min(rates), max(rates)
+
+    def convert(self, amount, from_currency, to_currency, day):
+        """
+        Přepočte částku mezi měnami kurzem platným k danému dni.
+
+        Returns:
+            Decimal nebo None, pokud pro měnu není v tabulce žádný kurz
+        """
+        if from_currency == to_currency or not amount:
+            return amount
+        from_rate = self.rate(from_currency, day)
+        to_rate = self.rate(to_currency, day)
+        if from_rate is None or to_rate is None:
+            logger.warning('Chybí kurz %s/%s k %s, částka vynechána',
+                           from_currency, to_currency, day)
+            return None
+        return Decimal(amount) * from_rate / to_rate
+
+
+_rate_table = None
+_rate_table_checked = 0.0
+_rate_table_lock = threading.Lock()
+
+
+def _rates_version():
+    from .models import ExchangeRate
+    stats = ExchangeRate.objects.aggregate(count=Count('id'), max_date=Max('date'), max_id=Max('id'))
+    return (stats['count'], stats['max_date'], stats['max_id'])
+
+
+def get_rate_table():
+    """Vrátí tabulku kurzů z cache; verzi v DB ověřuje nejvýše jednou za RATE_CACHE_TTL."""
+    global _rate_table, _rate_table_checked
+    from .models import ExchangeRate
+
+    now = time.monotonic()
+    with _rate_table_lock:
+        table = _rate_table
+        if table is not None and now - _rate_table_checked < RATE_CACHE_TTL:
+            return table
+
+    version = _rates_version()
+    if table is None or table.version != version:
+        table = RateTable(ExchangeRate.objects.values_list('date', 'currency', 'rate').iterator(chunk_size=5000))
+        table.version = version
+
+    with _rate_table_lock:
+        _rate_table = table
+        _rate_table_checked = now
+    return table
+
+
+def invalidate_rate_table():
+    """Vynutí znovunačtení kurzů při příštím použití."""
+    global _rate_table
+    with _rate_table_lock:
+        _rate_table = None
+
+
+class CurrencyConverter:
+    """
+    Součty transakcí uživatele v jeho preferované měně.
+
+    Použití:
+        converter = CurrencyConverter(user)
+        converter.total(queryset)                   # Decimal
+        converter.grouped(queryset, 'category__name')  # [{..., 'total', 'count'}]
+        converter.amount_at_least(limit, start, end)  # Q pro kandidáty nad limitem
+
+    Částky v měně bez jakéhokoli kurzu se do součtů nezapočítají (nelze je
+    vydávat za částky v měně uživatele) a jejich měny se zaznamenají
+    v missing_rates, aby je view mohlo ohlásit.
+    """
+
+    def __init__(self, user):
+        from .models import FinancialAccount
+
+        self.currency = user.currency_preference or BASE_CURRENCY
+        self.account_currencies = set(
+            FinancialAccount.objects.filter(user=user).order_by().values_list('currency', flat=True).distinct()
+        )
+        # Přepočet je potřeba jen pokud má uživatel účet v jiné měně
+        self.active = bool(self.account_currencies - {self.currency})
+        self.rates = get_rate_table() if self.active else None
+        self.missing_rates = set()
+
+    @property
+    def label(self):
+        return currency_label(self.currency)
+
+    def convert(self, amount, currency, day):
+        """Přepočte jednu částku z měny účtu do měny uživatele (0 bez dostupného kurzu)."""
+        if not self.active or amount is None:
+            return amount
+        currency = currency or self.currency
+        converted = self.rates.convert(amount, currency, self.currency, day)
+        if converted is None:
+            # Bez kurzu by se cizí částka vydávala za částku v měně uživatele
+            self.missing_rates.add(currency)
+            return Decimal('0')
+        return converted
+
+    def amount_at_least(self, threshold, start, end):
+        """
+        Podmínka pro řádky, jejichž částka v měně uživatele může dosáhnout threshold.
+
+        Práh se pro každou měnu účtu přepočte nejvýhodnějším kurzem v období
+        (start-end), takže podmínka propustí všechny řádky nad prahem a jen
+        málo pod ním. Kandidáty je pak nutné přesně přepočítat přes convert().
+        Měny bez kurzu se vynechají a zaznamenají v missing_rates.
+
+        Returns:
+            Q: podmínka nad amount a account__currency
+        """
+        if not self.active:
+            return Q(amount__gte=threshold)
+        condition = (Q(account__isnull=True) | Q(account__currency=self.currency)) & Q(amount__gte=threshold)
+        own_bounds = self.rates.rate_bounds(self.currency, start, end)
+        for currency in self.account_currencies - {self.currency}:
+            bounds = self.rates.rate_bounds(currency, start, end)
+            if bounds is None or own_bounds is None:
+                self.missing_rates.add(currency)
+                continue
+            # amount * kurz měny / kurz uživatele >= threshold
+            bound = (Decimal(threshold) * own_bounds[0] / bounds[1]).quantize(Decimal('0.01'), rounding=ROUND_FLOOR)
+            condition |= Q(account__currency=currency, amount__gte=bound)
+        return condition
+
+    def grouped(self, queryset, *fields, **expressions):
+        """
+        Ekvivalent queryset.values(*fields).annotate(total=Sum('amount'), count=Count('id'))
+        se součty přepočtenými do měny uživatele.
+
+        Returns:
+            list: slovníky s klíči fields/expressions, 'total' (Decimal) a 'count'
+        """
+        queryset = queryset.order_by()
+        if not self.active:
+            return [
+                dict(row, total=row['total'] or Decimal('0'))
+                for row in queryset.values(*fields, **expressions).annotate(
+                    total=Sum('amount'),
+                    count=Count('id')
+                )
+            ]
+
+        # Seskupení navíc podle měny účtu a dne - přepočítávají se skupiny, ne řádky
+        rows = queryset.values(
+            *fields,
+            row_currency=Coalesce('account__currency', Value(self.currency)),
+            row_day=F('date'),
+            **expressions
+        ).annotate(total=Sum('amount'), count=Count('id'))
+
+        keys = list(fields) + list(expressions)
+        merged = {}
+        for row in rows:
+            key = tuple(row[name] for name in keys)
+            converted = self.convert(row['total'] or Decimal('0'), row['row_currency'], row['row_day'])
+            if key in merged:
+                merged[key]['total'] += converted
+                merged[key]['count'] += row['count']
+            else:
+                merged[key] = dict(zip(keys, key), total=Decimal(converted), count=row['count'])
+        return list(merged.values())
+
+    def total(self, queryset):
+        """Součet částek querysetu v měně uživatele (Decimal, 0 pro prázdný výsledek)."""
+        if not self.active:
+            return queryset.order_by().aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        return sum((row['total'] for row in self.grouped(queryset)), Decimal('0'))
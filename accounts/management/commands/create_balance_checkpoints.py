@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.balances import rebuild_checkpoints
+from accounts.models import FinancialAccount
+
+
+class Command(BaseCommand):
+    help = 'Vytvoří (a přepočítá) měsíční kontrolní body zůstatků účtů - spouštět periodicky, např. cronem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='ID uživatele')
+        parser.add_argument('--batch-size', type=int, default=500, help='Počet účtů zpracovaných najednou')
+
+    def handle(self, *args, **options):
+        accounts = FinancialAccount.objects.order_by('pk')
+        if options.get('user_id'):
+            accounts = accounts.filter(user_id=options['user_id'])
+        account_ids = list(accounts.values_list('pk', flat=True))
+        today = timezone.now().date()
+
+        written = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(account_ids), batch_size):
+            written += rebuild_checkpoints(account_ids[start:start + batch_size], today)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Zapsáno {written} kontrolních bodů pro {len(account_ids)} účtů'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = 'Po dávkách smaže expirované refresh tokeny (outstanding i blacklisted) - spouštět periodicky'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Počet tokenů smazaných v jedné transakci')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = aware_utcnow()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('id')
+
+        deleted_outstanding = deleted_blacklisted = 0
+        last_id = 0
+        while True:
+            # Po dávkách podle primárního klíče - krátké transakce, bez zámku celé tabulky
+            ids = list(expired.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                deleted_blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+                deleted_outstanding += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Smazáno {deleted_outstanding} expirovaných tokenů, z toho {deleted_blacklisted} na blacklistu'
+        ))
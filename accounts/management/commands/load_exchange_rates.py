@@ -0,0 +1,117 @@
+"""
+load_exchange_rates.py - Načtení kurzů měn z lokálního souboru
+
+@author Tomáš Holes
+@description Podporované formáty:
+    - CSV s hlavičkou: date,currency,rate[,amount] (datum YYYY-MM-DD nebo DD.MM.YYYY)
+    - denní kurzovní lístek ČNB (řádky země|měna|množství|kód|kurz)
+    - roční soubor ČNB (hlavička Datum|1 EUR|100 JPY|...)
+
+@note Existující kurzy pro stejné (datum, měna) se přepíšou.
+"""
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.currency import BASE_CURRENCY, invalidate_rate_table
+from accounts.models import ExchangeRate
+
+BATCH_SIZE = 2000
+
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Neplatné datum: {value}')
+
+
+def _parse_decimal(value):
+    return Decimal(value.strip().replace(' ', '').replace(',', '.'))
+
+
+def parse_rates(lines):
+    """
+    Rozpozná formát souboru a vrátí seznam n-tic (date, currency, rate),
+    kde rate je počet CZK za 1 jednotku měny.
+    """
+    lines = [line.strip() for line in lines if line.strip()]
+    if not lines:
+        return []
+
+    header = lines[0]
+    rows = []
+
+    # Roční soubor ČNB: Datum|1 AUD|1 BRL|...
+    if header.startswith('Datum|'):
+        columns = []
+        for column in header.split('|')[1:]:
+            amount, code = column.split()
+            columns.append((code, Decimal(amount)))
+        for line in lines[1:]:
+            if line.startswith('Datum|'):
+                continue
+            values = line.split('|')
+            day = _parse_date(values[0])
+            for (code, amount), value in zip(columns, values[1:]):
+                if value.strip():
+                    rows.append((day, code, _parse_decimal(value) / amount))
+        return rows
+
+    # Denní lístek ČNB: "18.10.2026 #201" a hlavička země|měna|množství|kód|kurz
+    if '#' in header and '|' in lines[1]:
+        day = _parse_date(header.split('#')[0])
+        for line in lines[2:]:
+            _country, _name, amount, code, value = line.split('|')
+            rows.append((day, code, _parse_decimal(value) / _parse_decimal(amount)))
+        return rows
+
+    # Obecné CSV: date,currency,rate[,amount]
+    for record in csv.DictReader(lines):
+        amount = _parse_decimal(record.get('amount') or '1')
+        rows.append((
+            _parse_date(record['date']),
+            record['currency'].strip().upper(),
+            _parse_decimal(record['rate']) / amount,
+        ))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Načte kurzy měn vůči CZK ze souboru (CSV nebo formát ČNB)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Cesta k souboru s kurzy')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig') as handle:
+                rows = parse_rates(handle)
+        except OSError as e:
+            raise CommandError(f'Soubor nelze otevřít: {e}')
+        except (ValueError, KeyError, InvalidOperation) as e:
+            raise CommandError(f'Neplatný formát souboru s kurzy: {e}')
+
+        rates = [
+            ExchangeRate(date=day, currency=currency, rate=rate.quantize(Decimal('0.000001')))
+            for day, currency, rate in rows
+            if currency != BASE_CURRENCY
+        ]
+        for start in range(0, len(rates), BATCH_SIZE):
+            ExchangeRate.objects.bulk_create(
+                rates[start:start + BATCH_SIZE],
+                update_conflicts=True,
+                unique_fields=['date', 'currency'],
+                update_fields=['rate'],
+            )
+        invalidate_rate_table()
+
+        days = {rate.date for rate in rates}
+        self.stdout.write(self.style.SUCCESS(
+            f'Načteno {len(rates)} kurzů pro {len(days)} dní'
+        ))
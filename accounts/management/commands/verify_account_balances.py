@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from accounts.balances import find_drift, repair_balances
+from accounts.models import FinancialAccount
+
+
+class Command(BaseCommand):
+    help = 'Porovná udržované zůstatky účtů s historií transakcí a volitelně je opraví'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='ID uživatele')
+        parser.add_argument('--repair', action='store_true',
+                            help='Opravit rozdíly a přepočítat kontrolní body dotčených účtů')
+
+    def handle(self, *args, **options):
+        accounts = FinancialAccount.objects.all()
+        if options.get('user_id'):
+            accounts = accounts.filter(user_id=options['user_id'])
+
+        drifted = find_drift(accounts)
+        for account, stored, calculated in drifted:
+            self.stdout.write(
+                f'Účet {account.pk} ({account.name}): uloženo {stored}, '
+                f'podle transakcí {calculated}, rozdíl {calculated - stored}'
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('Všechny zůstatky odpovídají transakcím'))
+            return
+        if options['repair']:
+            repair_balances(drifted)
+            self.stdout.write(self.style.SUCCESS(f'Opraveno {len(drifted)} účtů'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Nalezeno {len(drifted)} účtů s rozdílem (opravit: --repair)'
+            ))
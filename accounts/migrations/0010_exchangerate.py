@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_alter_financialaccount_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Datum')),
+                ('currency', models.CharField(max_length=3, verbose_name='Měna')),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=14, verbose_name='Kurz')),
+            ],
+            options={
+                'verbose_name': 'Kurz měny',
+                'verbose_name_plural': 'Kurzy měn',
+                'ordering': ['-date', 'currency'],
+                'unique_together': {('date', 'currency')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:08
+
+import django.db.models.deletion
+import transactions.fields
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def populate_balances(apps, schema_editor):
+    """Naplní udržovaný zůstatek z dosavadní historie transakcí."""
+    FinancialAccount = apps.get_model('accounts', 'FinancialAccount')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    balances = dict(FinancialAccount.objects.values_list('id', 'initial_balance'))
+    outgoing = Transaction.objects.filter(
+        account__isnull=False, user=F('account__user')
+    ).values_list('account_id', 'type').annotate(total=Sum('amount')).order_by()
+    for account_id, transaction_type, total in outgoing:
+        balances[account_id] += total if transaction_type == 'INCOME' else -total
+    incoming = Transaction.objects.filter(
+        to_account__isnull=False, type='TRANSFER', user=F('to_account__user')
+    ).values_list('to_account_id').annotate(total=Sum('amount')).order_by()
+    for account_id, total in incoming:
+        balances[account_id] += total
+
+    accounts = [FinancialAccount(pk=pk, balance=balance) for pk, balance in balances.items()]
+    FinancialAccount.objects.bulk_update(accounts, ['balance'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_exchangerate'),
+        ('transactions', '0007_transaction_compact_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='financialaccount',
+            name='balance',
+            field=transactions.fields.CentsAmountField(db_column='balance_cents', default=0, max_digits=12, verbose_name='Zůstatek'),
+        ),
+        migrations.CreateModel(
+            name='AccountBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Datum')),
+                ('balance', transactions.fields.CentsAmountField(db_column='balance_cents', max_digits=12, verbose_name='Zůstatek')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='accounts.financialaccount')),
+            ],
+            options={
+                'verbose_name': 'Kontrolní bod zůstatku',
+                'verbose_name_plural': 'Kontrolní body zůstatků',
+                'ordering': ['account', '-date'],
+                'unique_together': {('account', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
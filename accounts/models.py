@@ -7,7 +7,10 @@ models.py - Modely pro správu uživatelů aplikace Plutoa
     - User: Rozšířený uživatelský model s preferencemi měny
     - EmailVerificationToken: Token pro ověření emailové adresy
     - PasswordResetToken: Token pro reset hesla
+    - FinancialAccountQuerySet: Zůstatky účtů z historie transakcí (kontrola udržovaného zůstatku)
     - FinancialAccount: Model pro finanční účty uživatele
+    - AccountBalanceCheckpoint: Zůstatek účtu ke konci dne (pro dotazy k datu)
+    - ExchangeRate: Denní kurzy měn vůči CZK
 
 @note Používá Django AbstractUser jako základ pro rozšíření
 """
@@ -16,6 +19,7 @@ from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from django.utils import timezone
+from transactions.fields import CentsAmountField
 import secrets
 from datetime import timedelta
 
@@ -83,6 +87,8 @@ class User(AbstractUser):
     
     # Volitelná pole pro personalizaci
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Zmenšené varianty avatara: {"128": {"webp": cesta, "jpeg": cesta}} - viz accounts/avatars.py
+    avatar_variants = models.JSONField(default=dict, blank=True)
     currency_preference = models.CharField(max_length=3, default='CZK')
     
     # Konfigurace modelu
@@ -143,6 +149,44 @@ class PasswordResetToken(models.Model):
         return cls.objects.create(user=user, token=token)
 
 
+class FinancialAccountQuerySet(models.QuerySet):
+    """
+    QuerySet finančních účtů s hromadným výpočtem zůstatků z historie transakcí.
+
+    Výpisy účtů a celkový zůstatek čtou udržovaný sloupec balance; with_balances()
+    slouží jen ke kontrole a opravě tohoto sloupce (find_drift, calculated_balance)
+    a do běžných požadavků nepatří - agreguje všechny transakce účtů.
+    """
+
+    # Názvy anotací, které používá FinancialAccount.calculated_balance
+    BALANCE_ANNOTATIONS = ('income_total', 'expense_total', 'transfer_in_total', 'transfer_out_total')
+
+    def with_balances(self):
+        """
+        Anotuje součty příjmů, výdajů a převodů pro všechny účty jedním dotazem
+        (pro kontrolu udržovaného zůstatku, viz accounts.balances.find_drift).
+
+        Příjmy, výdaje a odchozí převody jsou podmíněné Sum přes transakce účtu,
+        příchozí převody korelovaný poddotaz (druhý JOIN by násobil řádky).
+        """
+        from django.db.models import OuterRef, Q, Subquery, Sum
+        from transactions.models import Transaction
+
+        own = Q(transactions__user=models.F('user'))
+        transfers_in = Transaction.objects.filter(
+            to_account=OuterRef('pk'),
+            user=OuterRef('user'),
+            type='TRANSFER'
+        ).order_by().values('to_account').annotate(total=Sum('amount')).values('total')
+
+        return self.annotate(
+            income_total=Sum('transactions__amount', filter=own & Q(transactions__type='INCOME')),
+            expense_total=Sum('transactions__amount', filter=own & Q(transactions__type='EXPENSE')),
+            transfer_out_total=Sum('transactions__amount', filter=own & Q(transactions__type='TRANSFER')),
+            transfer_in_total=Subquery(transfers_in, output_field=CentsAmountField()),
+        )
+
+
 class FinancialAccount(models.Model):
     """
     Model pro finanční účty uživatele.
@@ -204,9 +248,13 @@ class FinancialAccount(models.Model):
     is_default = models.BooleanField(default=False, verbose_name='Výchozí účet')
     include_in_total = models.BooleanField(default=True, verbose_name='Zahrnout do celkového zůstatku')
     description = models.TextField(blank=True, verbose_name='Popis')
+    # Udržovaný zůstatek (v haléřích) - mění se pouze přes F() v accounts/balances.py
+    balance = CentsAmountField(max_digits=12, default=0, db_column='balance_cents', verbose_name='Zůstatek')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    objects = FinancialAccountQuerySet.as_manager()
+
     class Meta:
         ordering = ['-is_default', 'name']
         verbose_name = 'Finanční účet'
@@ -216,47 +264,106 @@ class FinancialAccount(models.Model):
         return f"{self.name} ({self.get_account_type_display()})"
     
     def save(self, *args, **kwargs):
+        from .balances import apply_deltas
+
         # Pokud je tento účet nastaven jako výchozí, odstraň výchozí z ostatních
         if self.is_default:
             FinancialAccount.objects.filter(
                 user=self.user, 
                 is_default=True
             ).exclude(pk=self.pk).update(is_default=False)
+
+        if self._state.adding:
+            self.balance = self.initial_balance
+            super().save(*args, **kwargs)
+            return
+
+        previous = FinancialAccount.objects.filter(pk=self.pk).values_list('initial_balance', flat=True).first()
+        if previous is None:
+            super().save(*args, **kwargs)
+            return
+        # Zůstatek v instanci může být zastaralý - ukládá se vše kromě něj
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'balance'
+            ]
         super().save(*args, **kwargs)
+        if previous != self.initial_balance:
+            # Změna počátečního zůstatku posune zůstatek i všechny kontrolní body
+            apply_deltas([(self.pk, None, self.initial_balance - previous)])
+        self.balance = FinancialAccount.objects.values_list('balance', flat=True).get(pk=self.pk)
     
     @property
     def current_balance(self):
-        """Vypočítá aktuální zůstatek účtu na základě transakcí"""
-        from transactions.models import Transaction
-        from django.db.models import Sum, Case, When, F, DecimalField
+        """Aktuální zůstatek účtu (udržovaný sloupec, bez agregace transakcí)."""
+        return self.balance
+
+    @property
+    def calculated_balance(self):
+        """
+        Zůstatek spočtený z historie transakcí - pro kontrolu udržovaného sloupce.
+
+        Pokud byl účet načten přes FinancialAccount.objects.with_balances(),
+        použijí se anotace a nespouští se žádný další dotaz.
+        """
         from decimal import Decimal
-        
-        # Suma příjmů
-        income = Transaction.objects.filter(
-            user=self.user,
-            account=self,
-            type='INCOME'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        # Suma výdajů
-        expenses = Transaction.objects.filter(
-            user=self.user,
-            account=self,
-            type='EXPENSE'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        # Transfery - příchozí (tento účet je cílem)
-        transfers_in = Transaction.objects.filter(
-            user=self.user,
-            to_account=self,
-            type='TRANSFER'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        # Transfery - odchozí (tento účet je zdrojem)
-        transfers_out = Transaction.objects.filter(
-            user=self.user,
-            account=self,
-            type='TRANSFER'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        return self.initial_balance + income - expenses + transfers_in - transfers_out
\ No newline at end of file
+
+        names = FinancialAccountQuerySet.BALANCE_ANNOTATIONS
+        if all(hasattr(self, name) for name in names):
+            totals = {name: getattr(self, name) for name in names}
+        else:
+            totals = FinancialAccount.objects.filter(pk=self.pk).with_balances().values(*names).first() or {}
+
+        income = totals.get('income_total') or Decimal('0')
+        expenses = totals.get('expense_total') or Decimal('0')
+        transfers_in = totals.get('transfer_in_total') or Decimal('0')
+        transfers_out = totals.get('transfer_out_total') or Decimal('0')
+        return self.initial_balance + income - expenses + transfers_in - transfers_out
+
+    def balance_as_of(self, day):
+        """Zůstatek na konci daného dne (kontrolní bod + transakce od něj)."""
+        from .balances import balance_as_of
+        return balance_as_of(self, day)
+
+
+class AccountBalanceCheckpoint(models.Model):
+    """
+    Zůstatek účtu na konci dne. Vytváří se periodicky (create_balance_checkpoints)
+    a posouvá se spolu s udržovaným zůstatkem při každé změně starší transakce.
+    """
+    account = models.ForeignKey(
+        FinancialAccount,
+        on_delete=models.CASCADE,
+        related_name='balance_checkpoints'
+    )
+    date = models.DateField(verbose_name='Datum')
+    balance = CentsAmountField(max_digits=12, db_column='balance_cents', verbose_name='Zůstatek')
+
+    class Meta:
+        ordering = ['account', '-date']
+        unique_together = ['account', 'date']
+        verbose_name = 'Kontrolní bod zůstatku'
+        verbose_name_plural = 'Kontrolní body zůstatků'
+
+    def __str__(self):
+        return f"{self.account.name}: {self.balance} ({self.date})"
+
+
+class ExchangeRate(models.Model):
+    """
+    Denní kurz měny vůči koruně (počet CZK za 1 jednotku měny).
+    Plní se příkazem load_exchange_rates z lokálního souboru (např. kurzy ČNB).
+    """
+    date = models.DateField(verbose_name='Datum')
+    currency = models.CharField(max_length=3, verbose_name='Měna')
+    rate = models.DecimalField(max_digits=14, decimal_places=6, verbose_name='Kurz')
+
+    class Meta:
+        ordering = ['-date', 'currency']
+        unique_together = ['date', 'currency']
+        verbose_name = 'Kurz měny'
+        verbose_name_plural = 'Kurzy měn'
+
+    def __str__(self):
+        return f"{self.currency} {self.rate} ({self.date})"
@@ -3,16 +3,21 @@ serializers.py - Serializery pro aplikaci Accounts
 
 @author Tomáš Holes
 @description Obsahuje implementaci serializace a deserializace dat pro:
-    - Uživatele (registrace, login, profil)
+    - Uživatele (registrace, login, profil, varianty avatara)
     - Finanční účty (CRUD operace, souhrny)
+    - Obnovení JWT tokenu s kontrolou blacklistu přes Bloom filtr
 
 @note Používá Django REST Framework serializery
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.contrib.auth.password_validation import validate_password
 from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 from .models import FinancialAccount
+from .tokens import BloomRefreshToken
+from .avatars import avatar_variant_path
 
 User = get_user_model()
 
@@ -95,21 +100,44 @@ class UserProfileSerializer(serializers.ModelSerializer):
     Používá se pro vracení dat o uživateli po přihlášení/registraci.
     """
     avatar = serializers.SerializerMethodField()
+    avatar_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ('id', 'username', 'first_name', 'last_name', 'currency_preference', 
-                 'avatar', 'date_joined', 'is_active', 'email')
+                 'avatar', 'avatar_variants', 'date_joined', 'is_active', 'email')
         read_only_fields = ('username', 'date_joined', 'is_active')
     
+    def _absolute_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    
+    def _requested_size(self):
+        """Velikost avatara z parametru ?avatar_size= (jinak výchozí)."""
+        params = getattr(self.context.get('request'), 'query_params', {})
+        size = params.get('avatar_size', '')
+        return int(size) if size.isdigit() else None
+    
     def get_avatar(self, obj):
-        """Vrací úplnou URL avatara včetně domény."""
+        """
+        Vrací úplnou URL avatara včetně domény - zmenšenou WebP variantu
+        (výchozí velikost nebo ?avatar_size=). Starší avatary bez variant vrací jako originál.
+        """
+        if obj.avatar_variants:
+            return self._absolute_url(avatar_variant_path(obj.avatar_variants, self._requested_size()))
         if obj.avatar:
-            request = self.context.get('request')
-            if request is not None:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
+            return self._absolute_url(obj.avatar.name)
         return None
+    
+    def get_avatar_variants(self, obj):
+        """URL všech variant {velikost: {formát: url}} - pro srcset/picture na frontendu."""
+        return {
+            size: {image_format: self._absolute_url(name) for image_format, name in formats.items()}
+            for size, formats in (obj.avatar_variants or {}).items()
+        }
 
 
 class FinancialAccountSerializer(serializers.ModelSerializer):
@@ -155,4 +183,8 @@ class FinancialAccountSummarySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = FinancialAccount
-        fields = ('id', 'name', 'account_type', 'color', 'icon', 'current_balance', 'is_default')
\ No newline at end of file
+        fields = ('id', 'name', 'account_type', 'color', 'icon', 'current_balance', 'is_default')
+
+class BloomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Obnovení tokenu - zneplatněné refresh tokeny se hledají nejdřív v Bloom filtru."""
+    token_class = BloomRefreshToken
@@ -0,0 +1,26 @@
+"""
+signals.py - Zneplatnění cache autentizace při změnách uživatele
+
+@author Tomáš Holes
+@description Obsahuje:
+    - invalidate_cached_user(): po uložení nebo smazání uživatele (úprava profilu,
+      změna hesla, deaktivace) ho odstraní z cache autentizace
+    - invalidate_cached_token(): po smazání tokenu odstraní jeho klíč z cache
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
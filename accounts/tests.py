@@ -7,13 +7,32 @@ tests.py - Unit testy pro modul accounts
     - Přihlášení a JWT tokeny
     - Aktualizaci profilu
     - Změnu hesla
+    - Zpracování avatarů (varianty, EXIF, cache hlavičky)
+    - Servírování media (Range, ETag, X-Accel-Redirect)
     - Model User
+    - Udržované zůstatky účtů a kontrolní body
+    - Autentizaci s cache uživatelů
+    - Session v cache a API bez session
+    - Sdílený throttling s klouzavým oknem
+    - Rotaci refresh tokenů a Bloom filtr blacklistu
+    - Přepočet měn v agregacích
 """
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import User, FinancialAccount
+from datetime import date, timedelta
+from decimal import Decimal
+from transactions.models import Transaction, Category
+from .currency import RateTable, CurrencyConverter, get_rate_table, invalidate_rate_table
+from .management.commands.load_exchange_rates import parse_rates
+from .models import User, FinancialAccount, ExchangeRate
 
 
 class UserModelTests(TestCase):
@@ -223,6 +242,126 @@ class ProfileTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class AvatarTests(APITestCase):
+    """Testy zpracování avatarů (varianty, EXIF, cache hlavičky)"""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='avataruser', password='TestPass123!')
+        self.client.force_authenticate(user=self.user)
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def _photo(self, color='red', size=(1200, 800)):
+        """JPEG s EXIF (orientace + GPS), jako fotka z telefonu."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientace: otočit o 90°
+        exif[0x8825] = {1: 'N'}  # GPS IFD
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+    
+    def test_upload_creates_variants_without_exif(self):
+        """Test vytvoření variant bez metadat a URL výchozí varianty"""
+        response = self.client.post(reverse('user-upload-avatar'), {'avatar': self._photo()}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(set(self.user.avatar_variants), {'64', '128', '256'})
+        for size, formats in self.user.avatar_variants.items():
+            for name in formats.values():
+                with Image.open(os.path.join(self.media_root, name)) as image:
+                    self.assertEqual(image.size, (int(size), int(size)))
+                    self.assertFalse(image.getexif())
+        self.assertTrue(response.data['avatar'].endswith(self.user.avatar_variants['128']['webp']))
+        
+        profile = self.client.get(reverse('user-me'), {'avatar_size': '64'})
+        self.assertTrue(profile.data['avatar'].endswith(self.user.avatar_variants['64']['webp']))
+    
+    def test_reupload_replaces_files(self):
+        """Test smazání souborů předchozího avatara"""
+        self.client.post(reverse('user-upload-avatar'), {'avatar': self._photo('red')}, format='multipart')
+        self.user.refresh_from_db()
+        old_files = [name for formats in self.user.avatar_variants.values() for name in formats.values()]
+        self.client.post(reverse('user-upload-avatar'), {'avatar': self._photo('blue')}, format='multipart')
+        for name in old_files:
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, name)))
+    
+    def test_invalid_file_rejected(self):
+        """Test odmítnutí souboru, který není obrázek"""
+        upload = SimpleUploadedFile('avatar.jpg', b'not an image', content_type='image/jpeg')
+        response = self.client.post(reverse('user-upload-avatar'), {'avatar': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.avatar_variants, {})
+    
+    def test_variants_served_with_immutable_cache(self):
+        """Test dlouhodobé cache pro varianty s hashem v názvu"""
+        self.client.post(reverse('user-upload-avatar'), {'avatar': self._photo()}, format='multipart')
+        self.user.refresh_from_db()
+        response = self.client.get('/media/' + self.user.avatar_variants['64']['jpeg'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+class MediaServingTests(APITestCase):
+    """Testy servírování media (Range, ETag, 304, X-Accel-Redirect)"""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_SERVE_MODE='python')
+        self.settings_override.enable()
+        os.makedirs(os.path.join(self.media_root, 'avatars'))
+        with open(os.path.join(self.media_root, 'avatars', 'file.bin'), 'wb') as handle:
+            handle.write(bytes(range(100)))
+        with open(os.path.join(self.media_root, 'private.bin'), 'wb') as handle:
+            handle.write(b'private')
+    
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+    
+    def _content(self, response):
+        return b''.join(response.streaming_content)
+    
+    def test_conditional_requests_return_304(self):
+        """Test odpovědi 304 podle ETag i If-Modified-Since"""
+        response = self.client.get('/media/avatars/file.bin')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._content(response), bytes(range(100)))
+        
+        cached = self.client.get('/media/avatars/file.bin', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        cached = self.client.get('/media/avatars/file.bin', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_range_requests(self):
+        """Test částečných odpovědí (206) a rozsahu mimo soubor (416)"""
+        response = self.client.get('/media/avatars/file.bin', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(self._content(response), bytes(range(10, 20)))
+        
+        response = self.client.get('/media/avatars/file.bin', HTTP_RANGE='bytes=-5')
+        self.assertEqual(self._content(response), bytes(range(95, 100)))
+        
+        response = self.client.get('/media/avatars/file.bin', HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+    
+    def test_accel_redirect_mode(self):
+        """Test předání přenosu nginxu a odmítnutí cesty mimo veřejné adresáře"""
+        with override_settings(MEDIA_SERVE_MODE='x-accel'):
+            response = self.client.get('/media/avatars/file.bin')
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/avatars/file.bin')
+            self.assertEqual(response.content, b'')
+        for path in ('/media/../manage.py', '/media/avatars/../private.bin', '/media/private.bin'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
 class FinancialAccountTests(APITestCase):
     """Testy pro finanční účty"""
     
@@ -286,3 +425,451 @@ class FinancialAccountTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['name'], 'Můj účet')
+
+    def test_balances_annotated_in_one_query(self):
+        """Test že zůstatky všech účtů se spočtou jedním dotazem včetně převodů"""
+        checking = FinancialAccount.objects.create(user=self.user, name='Běžný', initial_balance=1000)
+        savings = FinancialAccount.objects.create(user=self.user, name='Spořicí', initial_balance=0)
+        Transaction.objects.create(user=self.user, account=checking, amount=Decimal('500.50'),
+                                   type='INCOME', date=date.today())
+        Transaction.objects.create(user=self.user, account=checking, amount=Decimal('200.25'),
+                                   type='EXPENSE', date=date.today())
+        Transaction.objects.create(user=self.user, account=checking, to_account=savings,
+                                   amount=Decimal('300'), type='TRANSFER', date=date.today())
+
+        with self.assertNumQueries(1):
+            balances = {
+                account.name: account.calculated_balance
+                for account in FinancialAccount.objects.filter(user=self.user).with_balances()
+            }
+        self.assertEqual(balances, {'Běžný': Decimal('1000.25'), 'Spořicí': Decimal('300.00')})
+        # Bez anotací vlastnost dopočítá zůstatek sama
+        self.assertEqual(FinancialAccount.objects.get(pk=checking.pk).calculated_balance, Decimal('1000.25'))
+
+        response = self.client.get(reverse('financial-account-total-balance'))
+        self.assertEqual(response.data['total_balance'], 1300.25)
+        self.assertEqual(response.data['accounts_count'], 2)
+
+    def test_balance_history(self):
+        """Test časové řady zůstatků s doplněním dnů bez transakcí"""
+        checking = FinancialAccount.objects.create(user=self.user, name='Běžný', initial_balance=1000)
+        hidden = FinancialAccount.objects.create(user=self.user, name='Skrytý', initial_balance=50,
+                                                 include_in_total=False)
+        Transaction.objects.create(user=self.user, account=checking, amount=Decimal('100'),
+                                   type='EXPENSE', date=date(2026, 1, 2))
+        Transaction.objects.create(user=self.user, account=checking, to_account=hidden,
+                                   amount=Decimal('30'), type='TRANSFER', date=date(2026, 1, 4))
+        Transaction.objects.create(user=self.user, account=checking, amount=Decimal('500'),
+                                   type='INCOME', date=date(2026, 2, 10))
+
+        url = reverse('financial-account-balance-history')
+        response = self.client.get(url, {'date_from': '2026-01-01', 'date_to': '2026-01-05'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['dates']), 5)
+        series = {item['name']: item['balances'] for item in response.data['accounts']}
+        self.assertEqual(series['Běžný'], [1000.0, 900.0, 900.0, 870.0, 870.0])
+        self.assertEqual(series['Skrytý'], [50.0, 50.0, 50.0, 80.0, 80.0])
+        self.assertEqual(response.data['total'], [1000.0, 900.0, 900.0, 870.0, 870.0])
+
+        response = self.client.get(url, {'date_from': '2026-01-01', 'date_to': '2026-02-15', 'interval': 'month'})
+        self.assertEqual(response.data['dates'], [date(2026, 1, 31), date(2026, 2, 15)])
+        self.assertEqual(response.data['total'], [870.0, 1370.0])
+
+        response = self.client.get(url, {'interval': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AccountBalanceMaintenanceTests(TestCase):
+    """Testy udržovaného zůstatku účtů a kontrolních bodů"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.checking = FinancialAccount.objects.create(user=self.user, name='Běžný', initial_balance=1000)
+        self.savings = FinancialAccount.objects.create(user=self.user, name='Spořicí')
+    
+    def balances(self):
+        return tuple(
+            FinancialAccount.objects.values_list('balance', flat=True).get(pk=account.pk)
+            for account in (self.checking, self.savings)
+        )
+    
+    def test_balance_follows_transaction_writes(self):
+        """Test že vytvoření, úprava a smazání transakce posune zůstatky"""
+        expense = Transaction.objects.create(user=self.user, account=self.checking, amount=Decimal('200'),
+                                             type='EXPENSE', date=date(2026, 1, 10))
+        transfer = Transaction.objects.create(user=self.user, account=self.checking, to_account=self.savings,
+                                              amount=Decimal('300'), type='TRANSFER', date=date(2026, 1, 12))
+        self.assertEqual(self.balances(), (Decimal('500.00'), Decimal('300.00')))
+        
+        expense.account = self.savings
+        expense.amount = Decimal('50')
+        expense.save()
+        self.assertEqual(self.balances(), (Decimal('700.00'), Decimal('250.00')))
+        
+        transfer.delete()
+        self.assertEqual(self.balances(), (Decimal('1000.00'), Decimal('-50.00')))
+        
+        # Uložení zastaralé instance účtu nepřepíše udržovaný zůstatek
+        self.checking.initial_balance = Decimal('1100')
+        self.checking.save()
+        self.assertEqual(self.balances(), (Decimal('1100.00'), Decimal('-50.00')))
+    
+    def test_stale_instances_use_stored_state(self):
+        """Test že úprava i smazání zastaralé instance odečte uložený stav, ne stav v paměti"""
+        from unittest import mock
+        from django.db import transaction as db_transaction
+        expense = Transaction.objects.create(user=self.user, account=self.checking, amount=Decimal('200'),
+                                             type='EXPENSE', date=date(2026, 1, 10))
+        stale = Transaction.objects.get(pk=expense.pk)
+        
+        # Snímek i přepočet běží v jedné DB transakci (se zámkem řádku)
+        with mock.patch('transactions.models.db_transaction.atomic', wraps=db_transaction.atomic) as atomic:
+            expense.amount = Decimal('50')
+            expense.save()
+        atomic.assert_any_call(using=None, savepoint=False)
+        self.assertEqual(self.balances(), (Decimal('950.00'), Decimal('0.00')))
+        
+        stale.amount = Decimal('80')
+        stale.save()
+        self.assertEqual(self.balances(), (Decimal('920.00'), Decimal('0.00')))
+        
+        expense.delete()
+        self.assertEqual(self.balances(), (Decimal('1000.00'), Decimal('0.00')))
+    
+    def test_balance_as_of_uses_checkpoints(self):
+        """Test zůstatku k datu přes kontrolní body i po zpětné úpravě"""
+        from .balances import rebuild_checkpoints
+        for day, amount in [(date(2026, 1, 5), '100'), (date(2026, 2, 5), '200'), (date(2026, 3, 5), '400')]:
+            Transaction.objects.create(user=self.user, account=self.checking, amount=Decimal(amount),
+                                       type='INCOME', date=day)
+        self.assertEqual(rebuild_checkpoints([self.checking.pk], date(2026, 2, 28)), 2)
+        
+        Transaction.objects.create(user=self.user, account=self.checking, amount=Decimal('10'),
+                                   type='EXPENSE', date=date(2026, 1, 20))
+        checkpoint = self.checking.balance_checkpoints.get(date=date(2026, 2, 28))
+        self.assertEqual(checkpoint.balance, Decimal('1290.00'))
+        self.assertEqual(self.checking.balance_as_of(date(2026, 1, 15)), Decimal('1100.00'))
+        self.assertEqual(self.checking.balance_as_of(date(2026, 3, 10)), Decimal('1690.00'))
+        self.assertEqual(self.checking.balance_as_of(date(2025, 12, 31)), Decimal('1000.00'))
+    
+    def test_verify_command_repairs_drift(self):
+        """Test že příkaz verify_account_balances najde a opraví rozdíl"""
+        from io import StringIO
+        from django.core.management import call_command
+        Transaction.objects.create(user=self.user, account=self.checking, amount=Decimal('75'),
+                                   type='EXPENSE', date=date(2026, 1, 5))
+        # Hromadný update obchází signály - vznikne rozdíl
+        Transaction.objects.filter(user=self.user).update(account=self.savings)
+        
+        output = StringIO()
+        call_command('verify_account_balances', stdout=output)
+        self.assertIn('Nalezeno 2 účtů s rozdílem', output.getvalue())
+        
+        call_command('verify_account_balances', '--repair', stdout=StringIO())
+        self.assertEqual(self.balances(), (Decimal('1000.00'), Decimal('-75.00')))
+
+
+class AuthenticationCacheTests(APITestCase):
+    """Testy autentizace s cache uživatelů"""
+    
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from .authentication import clear_user_cache
+        clear_user_cache()
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.url = reverse('user-me')
+    
+    def test_repeated_requests_skip_user_query(self):
+        """Test že opakovaný požadavek načte uživatele z cache"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'accounts_user' in query['sql']])
+    
+    def test_profile_update_and_deactivation_invalidate(self):
+        """Test že úprava profilu a deaktivace zneplatní záznam v cache"""
+        self.client.get(self.url)
+        self.client.patch(reverse('user-update-profile'), {'first_name': 'Petr'}, format='json')
+        self.assertEqual(self.client.get(self.url).data['first_name'], 'Petr')
+        
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_legacy_token_authentication(self):
+        """Test tokenové autentizace přes cache a zneplatnění smazaného tokenu"""
+        from rest_framework.authtoken.models import Token
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        
+        # I z cache vrací instanci Token jako TokenAuthentication, bez dotazu
+        from rest_framework.test import APIRequestFactory
+        from .authentication import CachedTokenAuthentication
+        request = APIRequestFactory().get(self.url, HTTP_AUTHORIZATION=f'Token {token.key}')
+        with self.assertNumQueries(0):
+            user, auth = CachedTokenAuthentication().authenticate(request)
+        self.assertIsInstance(auth, Token)
+        self.assertEqual(auth.key, token.key)
+        self.assertEqual(auth.user.pk, self.user.pk)
+        
+        token.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class SessionTests(APITestCase):
+    """Testy session v cache a rychlé cesty pro API s hlavičkou Authorization"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='sessionuser', password='TestPass123!', is_staff=True)
+        self.url = reverse('user-me')
+    
+    def _session_queries(self, callback):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = callback()
+        return response, [query for query in queries if 'django_session' in query['sql']]
+    
+    def test_bearer_request_skips_session(self):
+        """Test že požadavek s JWT nečte session ani nenastavuje cookie"""
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.client.login(username='sessionuser', password='TestPass123!')
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response, session_queries = self._session_queries(lambda: self.client.get(self.url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(session_queries, [])
+        self.assertNotIn('sessionid', response.cookies)
+    
+    def test_cookie_session_read_from_cache(self):
+        """Test že session z cookie se čte z cache a odhlášení ji zneplatní"""
+        self.client.login(username='sessionuser', password='TestPass123!')
+        response, session_queries = self._session_queries(lambda: self.client.get(self.url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(session_queries, [])
+        
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_clear_expired_sessions(self):
+        """Test dávkového mazání expirovaných session"""
+        from io import StringIO
+        from django.contrib.sessions.models import Session
+        from django.core.management import call_command
+        from django.utils import timezone
+        Session.objects.bulk_create([
+            Session(session_key=f'expired{index}', session_data='', expire_date=timezone.now() - timedelta(days=1))
+            for index in range(5)
+        ] + [Session(session_key='active', session_data='', expire_date=timezone.now() + timedelta(days=1))])
+        call_command('clear_expired_sessions', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['active'])
+
+
+class SharedThrottleTests(TestCase):
+    """Testy sdíleného throttlingu s klouzavým oknem"""
+    
+    def setUp(self):
+        from finance_platform.throttling import SlidingWindowStore
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'throttle.sqlite3')
+        self.store = SlidingWindowStore(self.path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_sliding_window_limit(self):
+        """Test odhadu z předchozího a aktuálního okna"""
+        # 10 požadavků za okno 100 s, všechny v okně začínajícím časem 1000
+        for second in range(10):
+            self.assertTrue(self.store.hit('user_1', 10, 100, now=1000 + second)[0])
+        allowed, wait = self.store.hit('user_1', 10, 100, now=1050)
+        self.assertFalse(allowed)
+        self.assertEqual(wait, 50)
+        # V polovině dalšího okna z předchozího zbývá odhadem 5 požadavků
+        for _ in range(5):
+            self.assertTrue(self.store.hit('user_1', 10, 100, now=1150)[0])
+        self.assertFalse(self.store.hit('user_1', 10, 100, now=1150)[0])
+        # Jiný klíč má vlastní počítadlo
+        self.assertTrue(self.store.hit('user_2', 10, 100, now=1150)[0])
+    
+    def test_test_runner_uses_memory_store(self):
+        """Test že testy nepoužívají soubor počítadel sdílený se serverem"""
+        from finance_platform.throttling import get_throttle_store
+        self.assertEqual(get_throttle_store().path, ':memory:')
+    
+    def test_counter_shared_between_processes(self):
+        """Test že dvě instance nad stejným souborem (dva workery) sdílí limit"""
+        from finance_platform.throttling import SlidingWindowStore
+        other_worker = SlidingWindowStore(self.path)
+        self.assertTrue(self.store.hit('anon_1', 2, 60, now=600)[0])
+        self.assertTrue(other_worker.hit('anon_1', 2, 60, now=601)[0])
+        self.assertFalse(self.store.hit('anon_1', 2, 60, now=602)[0])
+
+
+class RefreshTokenBlacklistTests(APITestCase):
+    """Testy rotace refresh tokenů a Bloom filtru blacklistu"""
+    
+    def setUp(self):
+        from .tokens import get_blacklist_filter
+        get_blacklist_filter().reset()
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.url = reverse('token_refresh')
+    
+    def test_bloom_filter_has_no_false_negatives(self):
+        """Test že přidané prvky filtr vždy najde a cizí téměř nikdy"""
+        from .tokens import BloomFilter
+        bloom = BloomFilter(1000, 0.01)
+        for index in range(1000):
+            bloom.add(f'jti-{index}')
+        self.assertTrue(all(f'jti-{index}' in bloom for index in range(1000)))
+        false_positives = sum(f'other-{index}' in bloom for index in range(1000))
+        self.assertLess(false_positives, 50)
+    
+    def test_rotated_token_is_rejected_without_query_for_fresh_ones(self):
+        """Test že rotovaný token je odmítnut a platný se neověřuje v tabulce blacklistu"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .tokens import BloomRefreshToken
+        first = str(BloomRefreshToken.for_user(self.user))
+        response = self.client.post(self.url, {'refresh': first}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'refresh': response.data['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Kontrola blacklistu = dotaz přes JOIN na jti (zápis rotace ho nepotřebuje)
+        lookups = [query for query in queries if 'blacklistedtoken' in query['sql'] and 'JOIN' in query['sql']]
+        self.assertEqual(lookups, [])
+        
+        response = self.client.post(self.url, {'refresh': first}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_flush_expired_tokens(self):
+        """Test dávkového mazání expirovaných tokenů"""
+        from io import StringIO
+        from django.core.management import call_command
+        from django.utils import timezone
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+        expired = timezone.now() - timedelta(days=1)
+        for index in range(5):
+            token = OutstandingToken.objects.create(user=self.user, jti=f'old-{index}', token='x', expires_at=expired)
+            BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(user=self.user, jti='fresh', token='x',
+                                        expires_at=timezone.now() + timedelta(days=1))
+        
+        call_command('flush_expired_tokens', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['fresh'])
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+
+
+class CurrencyConversionTests(APITestCase):
+    """Testy přepočtu měn v agregacích"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+        ExchangeRate.objects.create(date=self.today - timedelta(days=10), currency='EUR', rate=Decimal('25'))
+        invalidate_rate_table()
+    
+    def tearDown(self):
+        invalidate_rate_table()
+    
+    def test_rate_table_uses_last_known_rate(self):
+        """Test že se pro den bez kurzu použije poslední známý kurz"""
+        table = RateTable([
+            (date(2026, 1, 2), 'EUR', Decimal('24.5')),
+            (date(2026, 1, 5), 'EUR', Decimal('24.8')),
+        ])
+        self.assertEqual(table.rate('EUR', date(2026, 1, 4)), Decimal('24.5'))
+        self.assertEqual(table.rate('EUR', date(2026, 1, 6)), Decimal('24.8'))
+        self.assertEqual(table.convert(Decimal('10'), 'EUR', 'CZK', date(2026, 1, 5)), Decimal('248.0'))
+    
+    def test_rate_bounds_cover_period(self):
+        """Test rozpětí kurzů platných v období (včetně kurzu platného k prvnímu dni)"""
+        table = RateTable([
+            (date(2026, 1, 2), 'EUR', Decimal('24.5')),
+            (date(2026, 1, 5), 'EUR', Decimal('24.8')),
+            (date(2026, 1, 9), 'EUR', Decimal('24.1')),
+        ])
+        self.assertEqual(table.rate_bounds('EUR', date(2026, 1, 4), date(2026, 1, 6)), (Decimal('24.5'), Decimal('24.8')))
+        self.assertEqual(table.rate_bounds('EUR', date(2025, 12, 1), date(2025, 12, 31)), (Decimal('24.5'), Decimal('24.5')))
+        self.assertEqual(table.rate_bounds('EUR', date(2026, 1, 1), date(2026, 1, 31)), (Decimal('24.1'), Decimal('24.8')))
+        self.assertIsNone(table.rate_bounds('USD', date(2026, 1, 1), date(2026, 1, 31)))
+    
+    def test_parse_cnb_daily_format(self):
+        """Test načtení denního kurzovního lístku ČNB"""
+        rows = parse_rates([
+            '02.01.2026 #1',
+            'země|měna|množství|kód|kurz',
+            'EMU|euro|1|EUR|24,500',
+            'Japonsko|jen|100|JPY|15,000',
+        ])
+        self.assertIn((date(2026, 1, 2), 'EUR', Decimal('24.500')), rows)
+        self.assertIn((date(2026, 1, 2), 'JPY', Decimal('0.15')), rows)
+    
+    def test_total_converted_to_preferred_currency(self):
+        """Test že součet transakcí z eurového účtu je přepočten do CZK"""
+        euro_account = FinancialAccount.objects.create(user=self.user, name='Euro', currency='EUR')
+        Transaction.objects.create(user=self.user, amount=Decimal('10'), type='EXPENSE',
+                                   account=euro_account, date=self.today)
+        Transaction.objects.create(user=self.user, amount=Decimal('100'), type='EXPENSE', date=self.today)
+        
+        converter = CurrencyConverter(self.user)
+        self.assertTrue(converter.active)
+        self.assertEqual(converter.total(Transaction.objects.filter(user=self.user)), Decimal('350'))
+    
+    def test_total_balance_converted(self):
+        """Test celkového zůstatku přes účty v různých měnách"""
+        FinancialAccount.objects.create(user=self.user, name='Euro', currency='EUR', initial_balance=100)
+        FinancialAccount.objects.create(user=self.user, name='Koruny', currency='CZK', initial_balance=500)
+        response = self.client.get(reverse('financial-account-total-balance'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_balance'], 3000.0)
+        self.assertEqual(response.data['currency'], 'CZK')
+    
+    def test_missing_rate_is_excluded_and_reported(self):
+        """Test že částka v měně bez kurzu se nezapočte jako koruny a je nahlášena"""
+        FinancialAccount.objects.create(user=self.user, name='Dolary', currency='USD', initial_balance=100)
+        FinancialAccount.objects.create(user=self.user, name='Koruny', currency='CZK', initial_balance=500)
+        self.assertIsNone(get_rate_table().convert(Decimal('100'), 'USD', 'CZK', self.today))
+        
+        response = self.client.get(reverse('financial-account-total-balance'))
+        self.assertEqual(response.data['total_balance'], 500.0)
+        self.assertEqual(response.data['missing_rates'], ['USD'])
+        
+        # Kurz z dřívějšího dne se použije, měna pak mezi chybějícími není
+        FinancialAccount.objects.filter(currency='USD').update(currency='EUR')
+        response = self.client.get(reverse('financial-account-total-balance'))
+        self.assertEqual(response.data['total_balance'], 3000.0)
+        self.assertEqual(response.data['missing_rates'], [])
+    
+    def test_analytics_breakdown_converted(self):
+        """Test že analytika sčítá výdaje z různých měn v měně uživatele"""
+        category = Category.objects.create(user=self.user, name='Jídlo', category_type='EXPENSE')
+        euro_account = FinancialAccount.objects.create(user=self.user, name='Euro', currency='EUR')
+        Transaction.objects.create(user=self.user, amount=Decimal('4'), type='EXPENSE', category=category,
+                                   account=euro_account, date=self.today)
+        Transaction.objects.create(user=self.user, amount=Decimal('50'), type='EXPENSE', category=category,
+                                   date=self.today)
+        
+        response = self.client.get(reverse('analytics-overview') + '?time_range=1m')
+        self.assertEqual(response.data['total_expenses'], 150.0)
+        self.assertEqual(response.data['currency'], 'CZK')
+        
+        response = self.client.get(reverse('analytics-heatmap'))
+        self.assertEqual(response.data['stats']['total_expenses'], 150.0)
+        self.assertEqual(response.data['stats']['total_transactions'], 2)
+        
+        response = self.client.get(reverse('analytics-category-breakdown'))
+        self.assertEqual(response.data[0]['total_amount'], 150.0)
+        self.assertEqual(response.data[0]['transaction_count'], 2)
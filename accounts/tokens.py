@@ -0,0 +1,160 @@
+"""
+tokens.py - Refresh tokeny s Bloom filtrem zneplatněných JTI
+
+@author Tomáš Holes
+@description Obsahuje:
+    - BloomFilter: pravděpodobnostní množina (bez falešně negativních odpovědí)
+    - BlacklistFilter: Bloom filtr zneplatněných JTI v rámci procesu
+    - get_blacklist_filter(): sdílená instance filtru
+    - BloomRefreshToken: RefreshToken, který se do databáze ptá jen při možné shodě
+
+@note Filtr se celý přestaví jednou za JWT_BLOOM_REBUILD_INTERVAL sekund (jen
+      neexpirované tokeny) a nejvýše jednou za JWT_BLOOM_SYNC_INTERVAL sekund
+      si dotáhne nově zneplatněné tokeny ostatních procesů dotazem na rozsah
+      primárního klíče. Token zneplatněný jiným workerem je tak odmítnut
+      nejpozději po JWT_BLOOM_SYNC_INTERVAL; rotace ve stejném procesu platí hned.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+# Výchozí intervaly (sekundy) a požadovaná míra falešně pozitivních odpovědí
+REBUILD_INTERVAL = 300
+SYNC_INTERVAL = 2
+ERROR_RATE = 0.001
+
+# Minimální kapacita filtru a rezerva pro tokeny zneplatněné do další přestavby
+MIN_CAPACITY = 1024
+CAPACITY_HEADROOM = 2
+
+
+class BloomFilter:
+    """Bloom filtr nad bytearray s dvojitým hashováním (blake2b)."""
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def saturated(self):
+        """Filtr obsahuje víc prvků, než na kolik byl dimenzován."""
+        return self.count > self.capacity
+
+
+class BlacklistFilter:
+    """
+    Bloom filtr zneplatněných JTI v jednom procesu.
+
+    Záporná odpověď znamená "určitě není na blacklistu" (do posledního
+    dotažení), kladná jen "možná" - pak rozhodne dotaz do databáze.
+    """
+
+    def __init__(self, rebuild_interval=None, sync_interval=None, error_rate=None):
+        self.rebuild_interval = rebuild_interval if rebuild_interval is not None else getattr(
+            settings, 'JWT_BLOOM_REBUILD_INTERVAL', REBUILD_INTERVAL)
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(
+            settings, 'JWT_BLOOM_SYNC_INTERVAL', SYNC_INTERVAL)
+        self.error_rate = error_rate or getattr(settings, 'JWT_BLOOM_ERROR_RATE', ERROR_RATE)
+        self._bloom = None
+        self._watermark = 0
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self):
+        """Přestaví filtr ze všech neexpirovaných zneplatněných tokenů."""
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+        capacity = max(MIN_CAPACITY, rows.count() * CAPACITY_HEADROOM)
+        bloom = BloomFilter(capacity, self.error_rate)
+        # Vodoznak bere i expirované řádky - dotahování pak začíná za nimi
+        watermark = BlacklistedToken.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        for jti in rows.filter(id__lte=watermark).values_list('token__jti', flat=True).iterator(chunk_size=5000):
+            bloom.add(jti)
+
+        now = time.monotonic()
+        with self._lock:
+            self._bloom, self._watermark = bloom, watermark
+            self._built_at = self._synced_at = now
+
+    def sync(self):
+        """Dotáhne tokeny zneplatněné od posledního přestavění/dotažení (i jinými procesy)."""
+        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=self._watermark).order_by('id').values_list('id', 'token__jti')
+        )
+        with self._lock:
+            for pk, jti in rows:
+                self._bloom.add(jti)
+                self._watermark = max(self._watermark, pk)
+            self._synced_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._bloom is None or self._bloom.saturated or now - self._built_at >= self.rebuild_interval:
+            self.rebuild()
+        elif now - self._synced_at >= self.sync_interval:
+            self.sync()
+
+    def might_contain(self, jti):
+        self._ensure_fresh()
+        return jti in self._bloom
+
+    def add(self, jti):
+        """Přidá JTI zneplatněné v tomto procesu (rotace refresh tokenu)."""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._watermark = 0
+
+
+_blacklist_filter = BlacklistFilter()
+
+
+def get_blacklist_filter():
+    return _blacklist_filter
+
+
+class BloomRefreshToken(RefreshToken):
+    """
+    RefreshToken, který kontrolu blacklistu nejdřív položí Bloom filtru.
+    Dotaz do tabulky blacklistu proběhne jen při (možné) shodě.
+    """
+
+    def check_blacklist(self):
+        if get_blacklist_filter().might_contain(self.payload[jwt_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        get_blacklist_filter().add(self.payload[jwt_settings.JTI_CLAIM])
+        return result
@@ -1,6 +1,5 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 # Router pro automatické generování URL pro ViewSety
@@ -16,7 +15,7 @@ urlpatterns = [
     # JWT Authentication endpoints
     path('login/', views.LoginView.as_view(), name='login'),  # POST /api/accounts/login/
     path('register/', views.RegisterView.as_view(), name='register'),  # POST /api/accounts/register/
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  # POST /api/accounts/token/refresh/
+    path('token/refresh/', views.BloomTokenRefreshView.as_view(), name='token_refresh'),  # POST /api/accounts/token/refresh/
     
     # Password Reset endpoints
     path('password-reset/request/', views.request_password_reset, name='password-reset-request'),  # POST
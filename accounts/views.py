@@ -14,13 +14,17 @@ from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
-from rest_framework.throttling import AnonRateThrottle
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.shortcuts import get_object_or_404
-from .serializers import UserSerializer, UserLoginSerializer, UserProfileSerializer
+from finance_platform.throttling import SharedAnonRateThrottle
+from notifications.mail import queue_email
+from .serializers import UserSerializer, UserLoginSerializer, UserProfileSerializer, BloomTokenRefreshSerializer
+from .tokens import BloomRefreshToken
+from .avatars import process_avatar, variant_names, delete_avatar_files, avatar_variant_path
 from .models import User, PasswordResetToken
 from rest_framework import serializers
 
@@ -147,21 +151,30 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Smažeme starý avatar pokud existuje
-        if user.avatar:
-            user.avatar.delete(save=False)
-        
-        user.avatar = request.FILES['avatar']
-        user.save()
+        try:
+            variants = process_avatar(request.FILES['avatar'], user.pk)
+        except DjangoValidationError as e:
+            return Response(
+                {'error': e.messages[0]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Vrátíme úplnou URL avatara
-        avatar_url = None
+        # Smažeme soubory starého avatara (kromě variant se stejným obsahem)
+        old_files = variant_names(user.avatar_variants)
         if user.avatar:
-            avatar_url = request.build_absolute_uri(user.avatar.url)
+            old_files.add(user.avatar.name)
+        
+        # Pole avatar ukazuje na největší JPEG variantu - originál se neukládá
+        user.avatar_variants = variants
+        user.avatar.name = avatar_variant_path(variants, max(int(size) for size in variants), 'jpeg')
+        user.save(update_fields=['avatar', 'avatar_variants'])
+        delete_avatar_files(old_files - variant_names(variants) - {user.avatar.name})
         
+        profile = UserProfileSerializer(user, context={'request': request}).data
         return Response({
             'message': 'Avatar byl úspěšně nahrán.',
-            'avatar': avatar_url
+            'avatar': profile['avatar'],
+            'avatar_variants': profile['avatar_variants']
         })
 
 
@@ -172,7 +185,7 @@ class LoginView(generics.GenericAPIView):
     """
     serializer_class = UserLoginSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
     throttle_scope = 'login'
 
     def post(self, request):
@@ -191,7 +204,7 @@ class LoginView(generics.GenericAPIView):
         
         if user:
             # Vytvoříme JWT tokeny
-            refresh = RefreshToken.for_user(user)
+            refresh = BloomRefreshToken.for_user(user)
             
             # Vytvoříme nebo získáme token pro backward compatibility
             token, created = Token.objects.get_or_create(user=user)
@@ -209,6 +222,14 @@ class LoginView(generics.GenericAPIView):
         )
 
 
+class BloomTokenRefreshView(TokenRefreshView):
+    """
+    Obnovení access tokenu (s rotací refresh tokenu).
+    Kontrola zneplatněných refresh tokenů nejdřív v Bloom filtru procesu.
+    """
+    serializer_class = BloomTokenRefreshSerializer
+
+
 class RegisterView(generics.GenericAPIView):
     """
     View pro registraci nového uživatele s validací hesla.
@@ -216,7 +237,7 @@ class RegisterView(generics.GenericAPIView):
     """
     serializer_class = UserSerializer
     permission_classes = [AllowAny]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
 
     def post(self, request):
         """
@@ -248,7 +269,7 @@ class RegisterView(generics.GenericAPIView):
             self.create_default_categories(user)
             
             # Vytvoření JWT tokenů
-            refresh = RefreshToken.for_user(user)
+            refresh = BloomRefreshToken.for_user(user)
             
             # Vytvoření Token pro backward compatibility
             token, created = Token.objects.get_or_create(user=user)
@@ -299,7 +320,8 @@ class RegisterView(generics.GenericAPIView):
 def request_password_reset(request):
     """
     Vytvoří reset token pro uživatele na základě username.
-    Vrátí token - v produkci by se poslal emailem, zde ho vrátíme přímo.
+    Má-li uživatel email, zařadí odkaz do fronty emailů (odeslání mimo požadavek).
+    Vrátí token - v produkci by se poslal jen emailem, zde ho vrátíme přímo.
     """
     username = request.data.get('username')
     
@@ -321,6 +343,17 @@ def request_password_reset(request):
     # Vytvoř reset token
     reset_token = PasswordResetToken.create_token(user)
     
+    # Email jen zařadíme do fronty - odešle ho příkaz send_queued_emails mimo požadavek
+    if user.email:
+        queue_email(
+            user.email,
+            'Plutoa - obnovení hesla',
+            f'Dobrý den,\n\npro nastavení nového hesla otevřete odkaz (platí 1 hodinu):\n'
+            f'{settings.SITE_URL}/reset-password/{reset_token.token}\n\n'
+            f'Pokud jste o obnovení hesla nežádali, tento email ignorujte.',
+            user=user
+        )
+    
     # V produkci by se token poslal emailem
     # Zde ho vrátíme přímo pro testování (v produkci SMAZAT!)
     return Response({
@@ -429,7 +462,11 @@ class FinancialAccountViewSet(viewsets.ModelViewSet):
     Poskytuje CRUD operace pro účty (běžný, spořicí, hotovost, kreditka).
     """
     permission_classes = [IsAuthenticated]
-    
+
+    # Časová řada zůstatků - povolené intervaly a maximální rozsah (10 let)
+    HISTORY_INTERVALS = ('day', 'month')
+    MAX_HISTORY_DAYS = 3660
+
     def get_serializer_class(self):
         from .serializers import FinancialAccountSerializer, FinancialAccountSummarySerializer
         if self.action == 'list_summary':
@@ -437,7 +474,7 @@ class FinancialAccountViewSet(viewsets.ModelViewSet):
         return FinancialAccountSerializer
     
     def get_queryset(self):
-        """Vrátí pouze účty aktuálního uživatele."""
+        """Vrátí pouze účty aktuálního uživatele (zůstatek je udržovaný sloupec)."""
         return self.request.user.financial_accounts.all()
     
     def perform_create(self, serializer):
@@ -456,15 +493,95 @@ class FinancialAccountViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def total_balance(self, request):
-        """Vrátí celkový zůstatek ze všech aktivních účtů."""
+        """Vrátí celkový zůstatek ze všech aktivních účtů v měně uživatele."""
         from decimal import Decimal
-        accounts = self.get_queryset().filter(is_active=True, include_in_total=True)
-        total = sum(acc.current_balance for acc in accounts)
+        from django.utils import timezone
+        from .currency import CurrencyConverter
+        converter = CurrencyConverter(request.user)
+        today = timezone.now().date()
+        accounts = list(self.get_queryset().filter(is_active=True, include_in_total=True))
+        # Zůstatky účtů v cizí měně se přepočtou aktuálním kurzem
+        total = sum(
+            (converter.convert(acc.current_balance, acc.currency, today) for acc in accounts),
+            Decimal('0')
+        )
         return Response({
             'total_balance': float(total),
-            'accounts_count': accounts.count()
+            'accounts_count': len(accounts),
+            'currency': converter.currency,
+            'missing_rates': sorted(converter.missing_rates)
         })
     
+    @action(detail=False, methods=['get'])
+    def balance_history(self, request):
+        """
+        Časová řada zůstatků aktivních účtů a celkového čistého jmění.
+
+        Parametry:
+        - date_from, date_to: rozsah ve formátu YYYY-MM-DD (výchozí posledních 365 dní)
+        - interval: 'day' nebo 'month' (zůstatek ke konci období, výchozí 'day')
+        - account: ID jednoho účtu (volitelné)
+
+        Součet (total) zahrnuje jen účty s include_in_total a je v měně uživatele.
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+        from django.utils.dateparse import parse_date
+        from .balances import balance_history, history_points
+        from .currency import CurrencyConverter
+
+        interval = request.query_params.get('interval', 'day')
+        accounts = self.get_queryset().filter(is_active=True)
+        try:
+            date_to = parse_date(request.query_params.get('date_to', '')) or timezone.now().date()
+            date_from = parse_date(request.query_params.get('date_from', '')) or date_to - timedelta(days=365)
+            if request.query_params.get('account'):
+                accounts = accounts.filter(pk=int(request.query_params['account']))
+        except ValueError:
+            date_to = date_from = None
+        if interval not in self.HISTORY_INTERVALS or date_from is None or date_from > date_to:
+            return Response(
+                {'error': 'Neplatné parametry interval, date_from, date_to nebo account'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if (date_to - date_from).days > self.MAX_HISTORY_DAYS:
+            return Response(
+                {'error': f'Maximální rozsah je {self.MAX_HISTORY_DAYS} dní'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        accounts = list(accounts)
+        points = history_points(date_from, date_to, interval)
+        history = balance_history(accounts, points)
+
+        converter = CurrencyConverter(request.user)
+        total = [0.0] * len(points)
+        series = []
+        for account in accounts:
+            values = history[account.pk]
+            if account.include_in_total:
+                for index, (point, value) in enumerate(zip(points, values)):
+                    total[index] += float(converter.convert(value, account.currency, point))
+            series.append({
+                'id': account.id,
+                'name': account.name,
+                'currency': account.currency,
+                'color': account.color,
+                'include_in_total': account.include_in_total,
+                'balances': [float(value) for value in values],
+            })
+
+        return Response({
+            'interval': interval,
+            'date_from': date_from,
+            'date_to': date_to,
+            'currency': converter.currency,
+            'missing_rates': sorted(converter.missing_rates),
+            'dates': points,
+            'accounts': series,
+            'total': [round(value, 2) for value in total],
+        })
+
     @action(detail=True, methods=['post'])
     def set_default(self, request, pk=None):
         """Nastaví účet jako výchozí."""
@@ -14,7 +14,8 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from decimal import Decimal
 from datetime import date, timedelta
-from accounts.models import User
+from accounts.currency import CurrencyConverter, invalidate_rate_table
+from accounts.models import User, FinancialAccount, ExchangeRate
 from transactions.models import Category, Transaction
 from budgets.models import Budget
 from goals.models import FinancialGoal
@@ -206,6 +207,32 @@ class InsightsTests(APITestCase):
         # Měl by obsahovat achievement insight o úsporách
         insight_types = [i['type'] for i in response.data]
         self.assertTrue(len(response.data) > 0)
+    
+    def test_high_expense_in_foreign_currency(self):
+        """Test že se neobvyklý výdaj z eurového účtu porovnává po přepočtu do CZK"""
+        ExchangeRate.objects.create(date=date.today() - timedelta(days=10), currency='EUR', rate=Decimal('25'))
+        invalidate_rate_table()
+        self.addCleanup(invalidate_rate_table)
+        euro_account = FinancialAccount.objects.create(user=self.user, name='Euro', currency='EUR')
+        for _ in range(3):
+            Transaction.objects.create(amount=100, type='EXPENSE', category=self.category,
+                                       date=date.today() - timedelta(days=2), user=self.user)
+        # 20 EUR = 500 Kč, průměr je 200 Kč
+        Transaction.objects.create(amount=20, type='EXPENSE', account=euro_account,
+                                   date=date.today() - timedelta(days=1), user=self.user, description='Hotel')
+        
+        # Z databáze se načte jen kandidát nad přepočteným prahem
+        converter = CurrencyConverter(self.user)
+        candidates = Transaction.objects.filter(
+            converter.amount_at_least(Decimal('400'), date.today() - timedelta(days=30), date.today()),
+            user=self.user
+        )
+        self.assertEqual(list(candidates.values_list('description', flat=True)), ['Hotel'])
+        
+        response = self.client.get(reverse('analytics-insights'))
+        high = [i for i in response.data if i['title'] == 'Neobvyklý výdaj detekován']
+        self.assertEqual(len(high), 1)
+        self.assertEqual(high[0]['amount'], 500.0)
 
 
 class TrendAnalysisTests(APITestCase):
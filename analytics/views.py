@@ -10,7 +10,7 @@ views.py - ViewSety pro aplikaci Analytics
     - Finanční zdraví (scoring system)
 """
 from django.shortcuts import render
-from django.db.models import Sum, Count, Avg, Q, F
+from django.db.models import Sum, Count, Avg, Q, F, BooleanField, ExpressionWrapper
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
@@ -19,9 +19,12 @@ from rest_framework.permissions import IsAuthenticated
 from datetime import datetime, timedelta
 from decimal import Decimal
 from collections import defaultdict
+from operator import itemgetter
 import calendar
+import heapq
 
 from transactions.models import Transaction, Category
+from accounts.currency import CurrencyConverter
 from budgets.models import Budget
 from goals.models import FinancialGoal
 from .serializers import (
@@ -63,6 +66,19 @@ class AnalyticsViewSet(viewsets.ViewSet):
         
         return start_date, end_date
 
+    def _totals_by_type(self, converter, transactions):
+        """Součty příjmů a výdajů v měně uživatele jedním dotazem."""
+        totals = {
+            row['type']: row['total']
+            for row in converter.grouped(transactions.filter(type__in=['INCOME', 'EXPENSE']), 'type')
+        }
+        return totals.get('INCOME', Decimal('0')), totals.get('EXPENSE', Decimal('0'))
+
+    @staticmethod
+    def _first_half(mid_date):
+        """Příznak první poloviny období pro seskupení trendů v DB."""
+        return ExpressionWrapper(Q(date__lt=mid_date), output_field=BooleanField())
+
     @action(detail=False, methods=['get'])
     def overview(self, request):
         """
@@ -70,6 +86,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """
         time_range = request.query_params.get('time_range', '6m')
         start_date, end_date = self._get_date_range(time_range)
+        converter = CurrencyConverter(request.user)
         
         # Filtr transakcí pro daného uživatele a období
         transactions = Transaction.objects.filter(
@@ -77,26 +94,40 @@ class AnalyticsViewSet(viewsets.ViewSet):
             date__range=[start_date, end_date]
         )
         
-        # Celkové příjmy a výdaje
-        income_total = transactions.filter(type='INCOME').aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
+        # Denní součty podle typu - jeden dotaz, z něj se skládají všechny grafy
+        daily_totals = defaultdict(lambda: Decimal('0'))
+        for row in converter.grouped(transactions.filter(type__in=['INCOME', 'EXPENSE']), 'type', 'date'):
+            daily_totals[(row['type'], row['date'])] = row['total']
+        
+        def period_total(transaction_type, period_start, period_end):
+            total = Decimal('0')
+            day = period_start
+            while day <= period_end:
+                total += daily_totals.get((transaction_type, day), Decimal('0'))
+                day += timedelta(days=1)
+            return total
         
-        expense_total = transactions.filter(type='EXPENSE').aggregate(
-            total=Sum('amount')
-        )['total'] or Decimal('0')
+        # Celkové příjmy a výdaje
+        income_total = sum(
+            (total for (transaction_type, _), total in daily_totals.items() if transaction_type == 'INCOME'),
+            Decimal('0')
+        )
+        expense_total = sum(
+            (total for (transaction_type, _), total in daily_totals.items() if transaction_type == 'EXPENSE'),
+            Decimal('0')
+        )
         
         savings_total = income_total - expense_total
         
         # Data podle kategorií
-        category_data = transactions.filter(
-            type='EXPENSE',
-            category__isnull=False
-        ).values(
-            'category__name', 'category__icon', 'category__color'
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('-total')
+        category_data = sorted(
+            converter.grouped(
+                transactions.filter(type='EXPENSE', category__isnull=False),
+                'category__name', 'category__icon', 'category__color'
+            ),
+            key=lambda item: item['total'],
+            reverse=True
+        )
         
         # Měsíční data - dynamická granularita podle období
         monthly_data = []
@@ -107,15 +138,8 @@ class AnalyticsViewSet(viewsets.ViewSet):
         if days_diff <= 60:  # Do 2 měsíců - denní granularita (30-60 sloupců)
             temp_date = start_date
             while temp_date <= end_date:
-                day_income = transactions.filter(
-                    type='INCOME',
-                    date=temp_date
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                day_expenses = transactions.filter(
-                    type='EXPENSE',
-                    date=temp_date
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+                day_income = daily_totals.get(('INCOME', temp_date), Decimal('0'))
+                day_expenses = daily_totals.get(('EXPENSE', temp_date), Decimal('0'))
                 
                 monthly_data.append({
                     'month': temp_date.strftime('%d.%m'),
@@ -126,22 +150,15 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 })
                 
                 temp_date += timedelta(days=1)
-                
+        
         elif days_diff <= 180:  # 3-6 měsíců - týdenní granularita (12-25 týdnů)
             temp_date = start_date
             week_num = 1
             while temp_date <= end_date:
                 week_end = min(temp_date + timedelta(days=6), end_date)
                 
-                week_income = transactions.filter(
-                    type='INCOME',
-                    date__range=[temp_date, week_end]
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                week_expenses = transactions.filter(
-                    type='EXPENSE',
-                    date__range=[temp_date, week_end]
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+                week_income = period_total('INCOME', temp_date, week_end)
+                week_expenses = period_total('EXPENSE', temp_date, week_end)
                 
                 monthly_data.append({
                     'month': f'T{week_num}',
@@ -153,7 +170,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 
                 temp_date = week_end + timedelta(days=1)
                 week_num += 1
-                
+        
         else:  # Více než 6 měsíců - měsíční granularita (12+ měsíců)
             current_date = start_date
             while current_date <= end_date:
@@ -161,15 +178,8 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 last_day = calendar.monthrange(current_date.year, current_date.month)[1]
                 month_end = current_date.replace(day=last_day)
                 
-                month_income = transactions.filter(
-                    type='INCOME',
-                    date__range=[month_start, month_end]
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                month_expenses = transactions.filter(
-                    type='EXPENSE',
-                    date__range=[month_start, month_end]
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+                month_income = period_total('INCOME', month_start, month_end)
+                month_expenses = period_total('EXPENSE', month_start, month_end)
                 
                 monthly_data.append({
                     'month': month_start.strftime('%Y-%m'),
@@ -187,14 +197,14 @@ class AnalyticsViewSet(viewsets.ViewSet):
         
         # Transakce pro vizualizace
         transactions_list = list(transactions.values(
-            'date', 'amount', 'type', 'category__name'
+            'date', 'amount', 'type', 'category__name', 'account__currency'
         ).order_by('-date'))
         
-        # Převod na JSON serializovatelný formát
+        # Převod na JSON serializovatelný formát (částky v měně uživatele)
         transactions_data = [
             {
                 'date': t['date'].isoformat(),
-                'amount': float(t['amount']),
+                'amount': float(converter.convert(t['amount'], t['account__currency'], t['date'])),
                 'type': t['type'],
                 'category': t['category__name']
             }
@@ -215,7 +225,9 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 for item in category_data
             ],
             'monthly_data': monthly_data,
-            'transactions': transactions_data
+            'transactions': transactions_data,
+            'currency': converter.currency,
+            'missing_rates': sorted(converter.missing_rates)
         }
         
         return Response(analytics_data)
@@ -226,6 +238,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         Denní data pro heatmap kalendář - zobrazuje aktivitu za posledních N měsíců
         """
         months = int(request.query_params.get('months', 3))
+        converter = CurrencyConverter(request.user)
         
         end_date = timezone.now().date()
         start_date = end_date - timedelta(days=months * 31)  # Přibližně N měsíců
@@ -252,15 +265,15 @@ class AnalyticsViewSet(viewsets.ViewSet):
             }
             current_date += timedelta(days=1)
         
-        # Naplnit daty z transakcí
-        for tx in transactions:
-            date_str = tx.date.isoformat()
+        # Naplnit daty seskupenými v DB podle dne a typu
+        for row in converter.grouped(transactions, 'date', 'type'):
+            date_str = row['date'].isoformat()
             if date_str in daily_data:
-                if tx.type == 'INCOME':
-                    daily_data[date_str]['income'] += float(tx.amount)
-                elif tx.type == 'EXPENSE':
-                    daily_data[date_str]['expenses'] += float(tx.amount)
-                daily_data[date_str]['transaction_count'] += 1
+                if row['type'] == 'INCOME':
+                    daily_data[date_str]['income'] += float(row['total'])
+                elif row['type'] == 'EXPENSE':
+                    daily_data[date_str]['expenses'] += float(row['total'])
+                daily_data[date_str]['transaction_count'] += row['count']
         
         # Vypočítat bilanci pro každý den
         for date_str in daily_data:
@@ -287,7 +300,9 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 'total_income': total_income,
                 'total_expenses': total_expenses,
                 'balance': total_income - total_expenses
-            }
+            },
+            'currency': converter.currency,
+            'missing_rates': sorted(converter.missing_rates)
         })
 
     @action(detail=False, methods=['get'])
@@ -297,6 +312,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """
         time_range = request.query_params.get('time_range', '3m')
         start_date, end_date = self._get_date_range(time_range)
+        converter = CurrencyConverter(request.user)
         
         transactions = Transaction.objects.filter(
             user=request.user,
@@ -305,24 +321,24 @@ class AnalyticsViewSet(viewsets.ViewSet):
             category__isnull=False
         )
         
-        total_expenses = transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        # Součty kategorií rozdělené na první a druhou polovinu období (pro trend)
+        mid_date = start_date + (end_date - start_date) / 2
+        halves = defaultdict(lambda: {'first': Decimal('0'), 'second': Decimal('0'), 'count': 0})
+        for row in converter.grouped(transactions, 'category__name', first_half=self._first_half(mid_date)):
+            item = halves[row['category__name']]
+            item['first' if row['first_half'] else 'second'] += row['total']
+            item['count'] += row['count']
         
-        patterns = []
-        categories = transactions.values('category__name').distinct()
+        total_expenses = sum((item['first'] + item['second'] for item in halves.values()), Decimal('0'))
         
-        for cat in categories:
-            cat_name = cat['category__name']
-            cat_transactions = transactions.filter(category__name=cat_name)
-            
-            cat_total = cat_transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            cat_count = cat_transactions.count()
+        patterns = []
+        for cat_name, item in halves.items():
+            first_half = item['first']
+            second_half = item['second']
+            cat_total = first_half + second_half
+            cat_count = item['count']
             cat_avg = cat_total / cat_count if cat_count > 0 else Decimal('0')
             
-            # Vypočítej trend (porovnej první a druhou polovinu období)
-            mid_date = start_date + (end_date - start_date) / 2
-            first_half = cat_transactions.filter(date__lt=mid_date).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            second_half = cat_transactions.filter(date__gte=mid_date).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
             if first_half > 0:
                 change = ((second_half - first_half) / first_half) * 100
                 if change > 10:
@@ -357,6 +373,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         insights = []
         time_range = request.query_params.get('time_range', '1m')
         start_date, end_date = self._get_date_range(time_range)
+        converter = CurrencyConverter(request.user)
         
         transactions = Transaction.objects.filter(
             user=request.user,
@@ -369,10 +386,10 @@ class AnalyticsViewSet(viewsets.ViewSet):
             is_active=True,
             start_date__lte=end_date,
             end_date__gte=start_date
-        )
+        ).select_related('category').with_spent(start_date, end_date)
         
         for budget in active_budgets:
-            spent = budget.get_spent_amount(start_date, end_date)
+            spent = budget.spent_amount
             percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
             
             if percentage >= 100:
@@ -389,28 +406,39 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 })
         
         # 2. Neobvykle vysoké výdaje
-        avg_daily = transactions.filter(type='EXPENSE').aggregate(
-            avg=Avg('amount')
-        )['avg'] or Decimal('0')
-        
-        high_expenses = transactions.filter(
-            type='EXPENSE',
-            amount__gte=avg_daily * 2
-        ).order_by('-amount')[:3]
+        expense_stats = converter.grouped(transactions.filter(type='EXPENSE'))
+        if expense_stats and expense_stats[0]['count']:
+            avg_daily = expense_stats[0]['total'] / expense_stats[0]['count']
+        else:
+            avg_daily = Decimal('0')
+        
+        # Kandidáty nad prahem vybere databáze (práh přepočtený do měny každého účtu),
+        # přesně se přepočtou a seřadí jen ty
+        threshold = avg_daily * 2
+        candidates = transactions.filter(
+            converter.amount_at_least(threshold, start_date, end_date),
+            type='EXPENSE'
+        ).select_related('account', 'category').order_by('-amount')
+        if not converter.active:
+            candidates = candidates[:3]
+        converted = [
+            (converter.convert(expense.amount, expense.account.currency if expense.account else None, expense.date), expense)
+            for expense in candidates
+        ]
+        high_expenses = heapq.nlargest(3, (row for row in converted if row[0] >= threshold), key=itemgetter(0))
         
-        for expense in high_expenses:
+        for amount, expense in high_expenses:
             insights.append({
                 'type': 'info',
                 'title': 'Neobvyklý výdaj detekován',
-                'message': f'{expense.description or "Bez popisu"} - {float(expense.amount):.2f} Kč',
+                'message': f'{expense.description or "Bez popisu"} - {float(amount):.2f} {converter.label}',
                 'category': expense.category.name if expense.category else None,
-                'amount': float(expense.amount),
+                'amount': float(amount),
                 'priority': 2
             })
         
         # 3. Úspěšné úspory
-        income_total = transactions.filter(type='INCOME').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        expense_total = transactions.filter(type='EXPENSE').aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        income_total, expense_total = self._totals_by_type(converter, transactions)
         savings = income_total - expense_total
         
         if savings > 0:
@@ -419,7 +447,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 insights.append({
                     'type': 'achievement',
                     'title': 'Skvělá úspornost!',
-                    'message': f'Ušetřili jste {savings_rate:.1f}% příjmů ({float(savings):.2f} Kč)',
+                    'message': f'Ušetřili jste {savings_rate:.1f}% příjmů ({float(savings):.2f} {converter.label})',
                     'category': None,
                     'amount': float(savings),
                     'priority': 4
@@ -428,19 +456,18 @@ class AnalyticsViewSet(viewsets.ViewSet):
             insights.append({
                 'type': 'warning',
                 'title': 'Záporná bilance',
-                'message': f'Tento měsíc utrácíte více než vyděláváte ({float(abs(savings)):.2f} Kč)',
+                'message': f'Tento měsíc utrácíte více než vyděláváte ({float(abs(savings)):.2f} {converter.label})',
                 'category': None,
                 'amount': float(abs(savings)),
                 'priority': 5
             })
         
         # 4. Doporučení na základě vzorů
-        top_category = transactions.filter(
-            type='EXPENSE',
-            category__isnull=False
-        ).values('category__name').annotate(
-            total=Sum('amount')
-        ).order_by('-total').first()
+        category_totals = converter.grouped(
+            transactions.filter(type='EXPENSE', category__isnull=False),
+            'category__name'
+        )
+        top_category = max(category_totals, key=lambda item: item['total'], default=None)
         
         if top_category:
             category_total = top_category['total']
@@ -456,6 +483,17 @@ class AnalyticsViewSet(viewsets.ViewSet):
                     'priority': 3
                 })
         
+        # 5. Částky v měnách bez kurzu nejsou v součtech
+        if converter.missing_rates:
+            insights.append({
+                'type': 'warning',
+                'title': 'Chybí kurz měny',
+                'message': f'Částky v měně {", ".join(sorted(converter.missing_rates))} nejsou započítány',
+                'category': None,
+                'amount': 0.0,
+                'priority': 5
+            })
+        
         # Seřaď podle priority
         insights.sort(key=lambda x: x['priority'], reverse=True)
         
@@ -468,6 +506,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """
         time_range = request.query_params.get('time_range', '3m')
         start_date, end_date = self._get_date_range(time_range)
+        converter = CurrencyConverter(request.user)
         
         # Aktuální období
         current_transactions = Transaction.objects.filter(
@@ -486,10 +525,10 @@ class AnalyticsViewSet(viewsets.ViewSet):
         )
         
         trends = []
+        current_income, current_expenses = self._totals_by_type(converter, current_transactions)
+        previous_income, previous_expenses = self._totals_by_type(converter, previous_transactions)
         
         # Trend příjmů
-        current_income = current_transactions.filter(type='INCOME').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        previous_income = previous_transactions.filter(type='INCOME').aggregate(total=Sum('amount'))['total'] or Decimal('0')
         income_change = current_income - previous_income
         income_change_pct = (income_change / previous_income * 100) if previous_income > 0 else 0
         
@@ -503,8 +542,6 @@ class AnalyticsViewSet(viewsets.ViewSet):
         })
         
         # Trend výdajů
-        current_expenses = current_transactions.filter(type='EXPENSE').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        previous_expenses = previous_transactions.filter(type='EXPENSE').aggregate(total=Sum('amount'))['total'] or Decimal('0')
         expense_change = current_expenses - previous_expenses
         expense_change_pct = (expense_change / previous_expenses * 100) if previous_expenses > 0 else 0
         
@@ -529,7 +566,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
             'trend': 'up' if savings_change > 0 else 'down' if savings_change < 0 else 'stable',
             'change_percentage': float(savings_change_pct),
             'change_amount': float(savings_change),
-            'comparison_text': f'{"Lepší" if savings_change > 0 else "Horší"} bilance o {abs(float(savings_change)):.2f} Kč'
+            'comparison_text': f'{"Lepší" if savings_change > 0 else "Horší"} bilance o {abs(float(savings_change)):.2f} {converter.label}'
         })
         
         return Response(trends)
@@ -541,6 +578,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """
         time_range = request.query_params.get('time_range', '3m')
         start_date, end_date = self._get_date_range(time_range)
+        converter = CurrencyConverter(request.user)
         
         transactions = Transaction.objects.filter(
             user=request.user,
@@ -549,32 +587,34 @@ class AnalyticsViewSet(viewsets.ViewSet):
             category__isnull=False
         )
         
-        total_expenses = transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        # Jeden dotaz: kategorie × polovina období (pro trend)
+        mid_date = start_date + (end_date - start_date) / 2
+        breakdown = {}
+        for row in converter.grouped(
+            transactions,
+            'category__name', 'category__icon', 'category__color',
+            first_half=self._first_half(mid_date)
+        ):
+            item = breakdown.setdefault(row['category__name'], {
+                'category__icon': row['category__icon'],
+                'category__color': row['category__color'],
+                'first': Decimal('0'),
+                'second': Decimal('0'),
+                'count': 0
+            })
+            item['first' if row['first_half'] else 'second'] += row['total']
+            item['count'] += row['count']
         
-        breakdown = transactions.values(
-            'category__name', 'category__icon', 'category__color'
-        ).annotate(
-            total_amount=Sum('amount'),
-            transaction_count=Count('id'),
-            average_transaction=Avg('amount')
-        ).order_by('-total_amount')
+        total_expenses = sum((item['first'] + item['second'] for item in breakdown.values()), Decimal('0'))
         
         result = []
-        for item in breakdown:
-            percentage = (item['total_amount'] / total_expenses * 100) if total_expenses > 0 else 0
+        for name, item in breakdown.items():
+            first_half = item['first']
+            second_half = item['second']
+            total_amount = first_half + second_half
+            percentage = (total_amount / total_expenses * 100) if total_expenses > 0 else 0
             
             # Vypočítej trend
-            mid_date = start_date + (end_date - start_date) / 2
-            first_half = transactions.filter(
-                category__name=item['category__name'],
-                date__lt=mid_date
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            second_half = transactions.filter(
-                category__name=item['category__name'],
-                date__gte=mid_date
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
             if first_half > 0:
                 change = ((second_half - first_half) / first_half) * 100
                 trend = 'increasing' if change > 10 else 'decreasing' if change < -10 else 'stable'
@@ -582,16 +622,18 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 trend = 'new'
             
             result.append({
-                'category_name': item['category__name'],
+                'category_name': name,
                 'category_icon': item['category__icon'],
                 'category_color': item['category__color'],
-                'total_amount': float(item['total_amount']),
-                'transaction_count': item['transaction_count'],
+                'total_amount': float(total_amount),
+                'transaction_count': item['count'],
                 'percentage': float(percentage),
-                'average_transaction': float(item['average_transaction']),
+                'average_transaction': float(total_amount / item['count']) if item['count'] else 0.0,
                 'trend': trend
             })
         
+        result.sort(key=lambda x: x['total_amount'], reverse=True)
+        
         return Response(result)
 
     @action(detail=False, methods=['get'])
@@ -601,6 +643,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         """
         time_range = request.query_params.get('time_range', '1m')
         start_date, end_date = self._get_date_range(time_range)
+        converter = CurrencyConverter(request.user)
         
         transactions = Transaction.objects.filter(
             user=request.user,
@@ -609,25 +652,23 @@ class AnalyticsViewSet(viewsets.ViewSet):
             category__isnull=False
         )
         
-        total_income = transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        breakdown = transactions.values(
-            'category__name', 'category__icon', 'category__color'
-        ).annotate(
-            total_amount=Sum('amount'),
-            transaction_count=Count('id')
-        ).order_by('-total_amount')
+        breakdown = sorted(
+            converter.grouped(transactions, 'category__name', 'category__icon', 'category__color'),
+            key=lambda item: item['total'],
+            reverse=True
+        )
+        total_income = sum((item['total'] for item in breakdown), Decimal('0'))
         
         result = []
         for item in breakdown:
-            percentage = (item['total_amount'] / total_income * 100) if total_income > 0 else 0
+            percentage = (item['total'] / total_income * 100) if total_income > 0 else 0
             
             result.append({
                 'category_name': item['category__name'],
                 'category_icon': item['category__icon'],
                 'category_color': item['category__color'],
-                'total_amount': float(item['total_amount']),
-                'transaction_count': item['transaction_count'],
+                'total_amount': float(item['total']),
+                'transaction_count': item['count'],
                 'percentage': float(percentage)
             })
         
@@ -651,8 +692,9 @@ def financial_health_score(request):
         date__gte=thirty_days_ago
     )
     
-    income = recent_transactions.filter(type='INCOME').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    expenses = recent_transactions.filter(type='EXPENSE').aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    converter = CurrencyConverter(user)
+    income = converter.total(recent_transactions.filter(type='INCOME'))
+    expenses = converter.total(recent_transactions.filter(type='EXPENSE'))
     
     if income > 0:
         savings_rate = ((income - expenses) / income) * 100
@@ -665,11 +707,12 @@ def financial_health_score(request):
         }
     
     # 2. Budget adherence (max 25 bodů)
-    active_budgets = Budget.objects.filter(user=user, is_active=True)
-    if active_budgets.exists():
+    # Rozpočty i s čerpáním jedním dotazem (místo exists() + dotazu na každý rozpočet)
+    active_budgets = list(Budget.objects.filter(user=user, is_active=True).with_spent())
+    if active_budgets:
         budget_scores = []
         for budget in active_budgets:
-            spent = budget.get_spent_amount()
+            spent = budget.spent_amount
             if budget.amount > 0:
                 usage = (spent / budget.amount) * 100
                 # Ideální je 70-90% využití
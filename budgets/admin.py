@@ -16,7 +16,7 @@ class BudgetAdmin(admin.ModelAdmin):
     search_fields = ['name', 'user__username', 'user__email']
     date_hierarchy = 'start_date'
     ordering = ['-created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['spent_total', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Základní informace', {
@@ -26,7 +26,7 @@ class BudgetAdmin(admin.ModelAdmin):
             'fields': ('period', 'start_date', 'end_date')
         }),
         ('Stav', {
-            'fields': ('is_active',)
+            'fields': ('is_active', 'spent_total')
         }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at'),
@@ -0,0 +1,192 @@
+"""
+forecast.py - Průběh čerpání rozpočtu a odhad útraty na konci období
+
+@author Tomáš Holes
+@description Obsahuje:
+    - prior_periods(): předchozí období rozpočtu (měsíce, roky, okna stejné délky)
+    - daily_expenses(): výdaje rozpočtu po dnech - jeden seskupený dotaz
+    - cumulative(): kumulativní součet výdajů po dnech období
+    - burndown(): skutečné čerpání, ideální lineární průběh a odhad konce období
+    - project_budgets(): odhad konce období pro více rozpočtů jedním dotazem
+
+@note Odhad konce období: k dosavadní útratě se přičte, kolik se v každém
+      z předchozích období utratilo od stejného dne (podle pozice v období,
+      měsíce mají různou délku) do jeho konce. Výsledkem je průměr a pásmo
+      průměr ± směrodatná odchylka. Bez historie se útrata lineárně
+      extrapoluje. Výdaje aktuálního i předchozích období se načtou jedním
+      dotazem; NumPy v závislostech není a pro desítky období stačí čistý Python.
+"""
+import datetime as dt
+from statistics import mean, pstdev
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum
+
+from transactions.models import Transaction
+
+# Počet předchozích období pro profil útraty
+FORECAST_PERIODS = 6
+
+
+def _step(budget):
+    if budget.period == 'MONTHLY':
+        return relativedelta(months=1)
+    if budget.period == 'YEARLY':
+        return relativedelta(years=1)
+    return dt.timedelta(days=(budget.end_date - budget.start_date).days + 1)
+
+
+def prior_periods(budget, count=FORECAST_PERIODS):
+    """
+    Předchozí období navazující na období rozpočtu (od nejbližšího).
+
+    Returns:
+        list: n-tice (začátek, konec)
+    """
+    step = _step(budget)
+    periods = []
+    end = budget.start_date - dt.timedelta(days=1)
+    for offset in range(1, count + 1):
+        start = budget.start_date - step * offset
+        periods.append((start, end))
+        end = start - dt.timedelta(days=1)
+    return periods
+
+
+def daily_expenses(budget, start, end):
+    """Výdaje v kategorii rozpočtu (nebo všechny) seskupené po dnech: {datum: částka}."""
+    transactions = Transaction.objects.filter(
+        user_id=budget.user_id,
+        type='EXPENSE',
+        date__range=[start, end]
+    )
+    if budget.category_id:
+        transactions = transactions.filter(category_id=budget.category_id)
+    rows = transactions.order_by().values('date').annotate(total=Sum('amount')).values_list('date', 'total')
+    return {day: float(total) for day, total in rows}
+
+
+def cumulative(daily, start, length):
+    """Kumulativní výdaje pro length dní od start (index 0 = první den)."""
+    series = []
+    total = 0.0
+    for offset in range(length):
+        total += daily.get(start + dt.timedelta(days=offset), 0.0)
+        series.append(total)
+    return series
+
+
+def _projection(budget, daily, priors, today):
+    """
+    Kumulativní čerpání aktuálního období a odhad útraty na jeho konci.
+
+    Returns:
+        tuple: (kumulativní řada celého období, počet uplynulých dní, projection)
+    """
+    length = (budget.end_date - budget.start_date).days + 1
+    amount = float(budget.amount)
+    series = cumulative(daily, budget.start_date, length)
+    elapsed = min(max((today - budget.start_date).days + 1, 0), length)
+    spent = series[elapsed - 1] if elapsed else 0.0
+
+    # Kolik se v předchozích obdobích utratilo od stejné pozice v období do konce
+    remaining = []
+    for start, end in priors:
+        prior_length = (end - start).days + 1
+        prior_series = cumulative(daily, start, prior_length)
+        if not prior_series[-1]:
+            # Období bez výdajů (např. před začátkem používání aplikace) se nepočítá
+            continue
+        day = round(elapsed / length * prior_length)
+        remaining.append(prior_series[-1] - (prior_series[day - 1] if day else 0.0))
+
+    if elapsed == length:
+        method, projected, low, high = 'actual', spent, spent, spent
+    elif remaining:
+        average, deviation = mean(remaining), pstdev(remaining)
+        method, projected = 'history', spent + average
+        low, high = spent + max(average - deviation, 0.0), spent + average + deviation
+    else:
+        projected = spent / elapsed * length if elapsed else 0.0
+        method, low, high = 'linear', projected, projected
+
+    return series, elapsed, {
+        'spent': round(projected, 2),
+        'low': round(low, 2),
+        'high': round(high, 2),
+        'percent': round(projected / amount * 100, 1) if amount > 0 else 0,
+        'method': method,
+        'periods': len(remaining),
+    }
+
+
+def burndown(budget, today=None, periods=FORECAST_PERIODS):
+    """
+    Čerpání rozpočtu po dnech a odhad útraty na konci období.
+
+    Returns:
+        dict: days, actual (kumulativně do dneška), ideal (lineární průběh limitu)
+              a projection (spent, low, high, percent, method, periods)
+    """
+    today = today or dt.date.today()
+    priors = prior_periods(budget, periods)
+    first_day = priors[-1][0] if priors else budget.start_date
+    daily = daily_expenses(budget, first_day, budget.end_date)
+    series, elapsed, projection = _projection(budget, daily, priors, today)
+
+    length = len(series)
+    amount = float(budget.amount)
+    return {
+        'days': [(budget.start_date + dt.timedelta(days=offset)).isoformat() for offset in range(length)],
+        'actual': [round(value, 2) for value in series[:elapsed]],
+        'ideal': [round(amount * (offset + 1) / length, 2) for offset in range(length)],
+        'projection': projection,
+    }
+
+
+def project_budgets(budgets, today=None, periods=FORECAST_PERIODS):
+    """
+    Odhad útraty na konci období pro více rozpočtů jedním dotazem.
+
+    Denní výdaje se načtou seskupené podle uživatele, kategorie a dne za celé
+    rozpětí všech rozpočtů; rozpočty bez kategorie sčítají všechny kategorie.
+
+    Returns:
+        dict: {pk rozpočtu: projection (viz burndown)}
+    """
+    budgets = list(budgets)
+    if not budgets:
+        return {}
+    today = today or dt.date.today()
+    priors = {budget.pk: prior_periods(budget, periods) for budget in budgets}
+    first_day = min(priors[budget.pk][-1][0] if priors[budget.pk] else budget.start_date for budget in budgets)
+    last_day = max(budget.end_date for budget in budgets)
+
+    rows = (
+        Transaction.objects.filter(
+            user_id__in={budget.user_id for budget in budgets},
+            type='EXPENSE',
+            date__range=[first_day, last_day]
+        )
+        .order_by()
+        .values('user_id', 'category_id', 'date')
+        .annotate(total=Sum('amount'))
+        .values_list('user_id', 'category_id', 'date', 'total')
+    )
+    by_category = {}
+    by_user = {}
+    for user_id, category_id, day, total in rows:
+        amount = float(total)
+        daily = by_category.setdefault((user_id, category_id), {})
+        daily[day] = daily.get(day, 0.0) + amount
+        daily = by_user.setdefault(user_id, {})
+        daily[day] = daily.get(day, 0.0) + amount
+
+    projections = {}
+    for budget in budgets:
+        if budget.category_id:
+            daily = by_category.get((budget.user_id, budget.category_id), {})
+        else:
+            daily = by_user.get(budget.user_id, {})
+        projections[budget.pk] = _projection(budget, daily, priors[budget.pk], today)[2]
+    return projections
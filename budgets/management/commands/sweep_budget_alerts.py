@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from budgets.sweep import CHUNK_SIZE, sweep_budget_alerts
+
+
+class Command(BaseCommand):
+    help = 'Zkontroluje prahy všech aktivních rozpočtů a vytvoří chybějící upozornění (po dávkách, v poolu procesů)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Počet rozpočtů načtených jedním dotazem')
+        parser.add_argument('--workers', type=int, default=None, help='Počet procesů pro vyhodnocení prahů (výchozí: počet jader, 1 = bez poolu)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        checked, created = sweep_budget_alerts(options['chunk_size'], options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Zkontrolováno {checked} rozpočtů, vytvořeno {created} upozornění za {time.monotonic() - started:.1f} s'
+        ))
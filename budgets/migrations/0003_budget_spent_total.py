@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:34
+
+import transactions.fields
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_spent_totals(apps, schema_editor):
+    """Naplní udržovanou utracenou částku z dosavadních výdajů."""
+    Budget = apps.get_model('budgets', 'Budget')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    budgets = list(Budget.objects.all())
+    for budget in budgets:
+        expenses = Transaction.objects.filter(
+            user_id=budget.user_id, type='EXPENSE', date__range=[budget.start_date, budget.end_date]
+        )
+        if budget.category_id:
+            expenses = expenses.filter(category_id=budget.category_id)
+        budget.spent_total = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    Budget.objects.bulk_update(budgets, ['spent_total'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0002_budget_category_budget_is_active'),
+        ('transactions', '0007_transaction_compact_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent_total',
+            field=transactions.fields.CentsAmountField(db_column='spent_cents', default=0, max_digits=12, verbose_name='Utraceno'),
+        ),
+        migrations.AddIndex(
+            model_name='budget',
+            index=models.Index(fields=['user', 'end_date', 'start_date'], name='budget_user_period'),
+        ),
+        migrations.RunPython(populate_spent_totals, migrations.RunPython.noop),
+    ]
@@ -3,19 +3,105 @@ models.py - Model pro správu rozpočtů aplikace Plutoa
 
 @author Tomáš Holes
 @description Obsahuje:
+    - BudgetQuerySet: Utracené částky všech rozpočtů jedním dotazem (with_spent)
+      a jejich historie po měsících/letech (spent_by_period)
     - Budget: Rozpočet s limitem, obdobím a volitelnou kategorií
+    - BudgetCategoryQuerySet: Čerpání alokací rozpočtů jedním dotazem (spent_by_allocation)
+    - BudgetCategory: Rozdělení limitu rozpočtu mezi kategorie (alokace)
 
 @features
     - Automatický výpočet utracené částky (get_spent_amount)
+    - Udržovaná utracená částka (spent_total) - viz budgets/spending.py
     - Podpora měsíčních, ročních a vlastních období
     - Možnost přiřazení ke konkrétní kategorii
 """
 from django.db import models
 from django.conf import settings
 from django.db.models import Sum
+from transactions.fields import CentsAmountField
 from transactions.models import Category
 import datetime as dt
 
+
+class BudgetQuerySet(models.QuerySet):
+    """QuerySet rozpočtů s výpočtem čerpání pro všechny rozpočty najednou."""
+
+    def with_spent(self, start_date=None, end_date=None):
+        """
+        Anotuje spent_amount - součet výdajů v období rozpočtu (stejně jako get_spent_amount).
+
+        Výdaje se sčítají korelovaným poddotazem nad indexem (user, type, date),
+        takže celý seznam rozpočtů je jeden dotaz bez ohledu na jejich počet.
+
+        Args:
+            start_date: pevný začátek období pro všechny rozpočty (jinak start_date rozpočtu)
+            end_date: pevný konec období pro všechny rozpočty (jinak end_date rozpočtu)
+        """
+        from django.db.models import Case, OuterRef, Subquery, Value, When
+        from django.db.models.functions import Coalesce
+        from transactions.fields import CentsAmountField
+        from transactions.models import Transaction
+
+        expenses = Transaction.objects.filter(
+            user=OuterRef('user'),
+            type='EXPENSE',
+            date__gte=start_date if start_date is not None else OuterRef('start_date'),
+            date__lte=end_date if end_date is not None else OuterRef('end_date')
+        )
+
+        def total(transactions):
+            return Subquery(
+                transactions.order_by().values('user').annotate(total=Sum('amount')).values('total'),
+                output_field=CentsAmountField()
+            )
+
+        # Rozpočet bez kategorie počítá všechny výdaje, jinak jen výdaje své kategorie
+        spent = Case(
+            When(category__isnull=True, then=total(expenses)),
+            default=total(expenses.filter(category=OuterRef('category'))),
+            output_field=CentsAmountField()
+        )
+        return self.annotate(
+            spent_amount=Coalesce(spent, Value(0, output_field=CentsAmountField()))
+        )
+
+    def spent_by_period(self, month_since, year_since):
+        """
+        Výdaje rozpočtů po obdobích - jeden dotaz seskupený podle rozpočtu a období.
+
+        Roční rozpočty se seskupují podle roku (TruncYear), ostatní podle měsíce
+        (TruncMonth). Rozpočet bez kategorie počítá všechny výdaje uživatele.
+
+        Args:
+            month_since: první den nejstaršího měsíce (měsíční a vlastní rozpočty)
+            year_since: první den nejstaršího roku (roční rozpočty)
+
+        Returns:
+            QuerySet: hodnoty {'id', 'bucket', 'spent'}; bucket je první den období
+        """
+        from django.db.models import Case, F, Q, When
+        from django.db.models.functions import TruncMonth, TruncYear
+
+        date = 'user__transaction__date'
+        bucket = Case(
+            When(period='YEARLY', then=TruncYear(date)),
+            default=TruncMonth(date),
+            output_field=models.DateField()
+        )
+        # Podmínky v jednom filter() se vztahují ke stejné transakci (jeden JOIN)
+        return (
+            self.filter(
+                Q(category__isnull=True) | Q(category=F('user__transaction__category')),
+                Q(period='YEARLY', user__transaction__date__gte=year_since)
+                | (~Q(period='YEARLY') & Q(user__transaction__date__gte=month_since)),
+                user__transaction__type='EXPENSE'
+            )
+            .order_by()
+            .values('id', bucket=bucket)
+            .annotate(spent=Sum('user__transaction__amount'))
+        )
+
+
 class Budget(models.Model):
     PERIOD_CHOICES = [
         ('MONTHLY', 'Monthly'),
@@ -31,12 +117,41 @@ class Budget(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # Součet výdajů v období rozpočtu - udržují ho signály transakcí (budgets/spending.py)
+    spent_total = CentsAmountField(max_digits=12, default=0, db_column='spent_cents', verbose_name='Utraceno')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = BudgetQuerySet.as_manager()
+    
+    # Pole, po jejichž změně se spent_total přepočítá z transakcí
+    SPENT_INPUT_FIELDS = ('user_id', 'category_id', 'start_date', 'end_date')
+    
+    class Meta:
+        indexes = [
+            # Výběr rozpočtů, do kterých spadá transakce (uživatel + datum v období)
+            models.Index(fields=['user', 'end_date', 'start_date'], name='budget_user_period'),
+        ]
+    
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        """Při vytvoření nebo změně období/kategorie přepočítá spent_total z transakcí."""
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding:
+            recalculate = True
+        elif update_fields is not None and not {'start_date', 'end_date', 'category', 'user'} & set(update_fields):
+            recalculate = False
+        else:
+            stored = Budget.objects.filter(pk=self.pk).values(*self.SPENT_INPUT_FIELDS).first()
+            recalculate = stored != {field: getattr(self, field) for field in self.SPENT_INPUT_FIELDS}
+        if recalculate:
+            self.spent_total = self.get_spent_amount()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'spent_total'}
+        super().save(*args, **kwargs)
+    
     def get_spent_amount(self, start_date=None, end_date=None):
         """Výpočet utracené částky za dané období"""
         from transactions.models import Transaction
@@ -60,11 +175,42 @@ class Budget(models.Model):
         total_spent = transactions.aggregate(total=Sum('amount'))['total'] or 0
         return total_spent
 
+class BudgetCategoryQuerySet(models.QuerySet):
+    """QuerySet alokací rozpočtu s výpočtem čerpání pro všechny alokace najednou."""
+
+    def spent_by_allocation(self):
+        """
+        Výdaje v kategorii každé alokace za období jejího rozpočtu.
+
+        Jeden dotaz seskupený podle alokace (rozpočet + kategorie) - transakce
+        jsou omezené na alokované kategorie, uživatele a období rozpočtu.
+
+        Returns:
+            dict: {id alokace: utracená částka}; alokace bez výdajů chybí
+        """
+        from django.db.models import F
+
+        rows = (
+            self.filter(
+                category__transaction__type='EXPENSE',
+                category__transaction__user=F('budget__user'),
+                category__transaction__date__gte=F('budget__start_date'),
+                category__transaction__date__lte=F('budget__end_date')
+            )
+            .order_by()
+            .values('id')
+            .annotate(spent=Sum('category__transaction__amount'))
+        )
+        return {row['id']: row['spent'] for row in rows}
+
+
 class BudgetCategory(models.Model):
     budget = models.ForeignKey(Budget, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     allocated_amount = models.DecimalField(max_digits=10, decimal_places=2)
     
+    objects = BudgetCategoryQuerySet.as_manager()
+    
     class Meta:
         verbose_name_plural = 'Budget categories'
         unique_together = ['budget', 'category']
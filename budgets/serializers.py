@@ -1,14 +1,49 @@
 from rest_framework import serializers
+from transactions.models import Category
 from .models import Budget, BudgetCategory
+from .simulation import SIMULATION_MAX_BUDGETS, SIMULATION_MAX_LIMITS, SIMULATION_MAX_MONTHS, SIMULATION_MONTHS
 
 class BudgetCategorySerializer(serializers.ModelSerializer):
+    """Alokace části limitu rozpočtu na kategorii"""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    allocated_amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
     class Meta:
         model = BudgetCategory
-        fields = ['id', 'name', 'description', 'user']
-        read_only_fields = ['user']
+        fields = ['id', 'budget', 'category', 'category_name', 'allocated_amount']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Rozpočty a kategorie pouze aktuálního uživatele
+        request = self.context.get('request')
+        if request and hasattr(request, 'user') and request.user.is_authenticated:
+            self.fields['budget'].queryset = Budget.objects.filter(user=request.user)
+            self.fields['category'].queryset = Category.objects.filter(user=request.user)
 
 class BudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Budget
         fields = ['id', 'name', 'amount', 'start_date', 'end_date', 'period', 'category', 'is_active', 'user', 'created_at', 'updated_at']
-        read_only_fields = ['user', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['user', 'created_at', 'updated_at']
+
+
+class SimulatedBudgetSerializer(serializers.Serializer):
+    """Hypotetický rozpočet - kategorie (bez kategorie = všechny výdaje) a kandidátní limity"""
+    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), allow_null=True, default=None)
+    limits = serializers.ListField(
+        child=serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0),
+        min_length=1,
+        max_length=SIMULATION_MAX_LIMITS
+    )
+
+
+class BudgetSimulationSerializer(serializers.Serializer):
+    """Vstup simulace rozpočtů nad historií výdajů"""
+    months = serializers.IntegerField(min_value=1, max_value=SIMULATION_MAX_MONTHS, default=SIMULATION_MONTHS)
+    budgets = SimulatedBudgetSerializer(many=True, allow_empty=False, max_length=SIMULATION_MAX_BUDGETS)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request:
+            self.fields['budgets'].child.fields['category'].queryset = Category.objects.filter(user=request.user)
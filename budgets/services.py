@@ -1,9 +1,19 @@
 """
 Budget Alert Service
 Automaticky kontroluje rozpočty a vytváří notifikace při překročení prahových hodnot
+
+Při zápisu transakce se vyhodnocují jen dotčené rozpočty (apply_transaction_change),
+check_budget_alerts prochází všechny aktivní rozpočty uživatele. Každé upozornění
+(rozpočet, práh, začátek období, typ) vznikne jen jednou díky unikátnímu indexu.
+
+Rozpočty mezi FORECAST_MIN_PERCENT a prvním prahem se při úplné kontrole
+(check_budget_alerts, příkaz sweep_budget_alerts) navíc porovnají s odhadem útraty
+na konci období (budgets/forecast.py) - upozornění přijde dřív, než útrata dosáhne
+80 %. Zápis transakce odhad nepočítá, aby zůstal nezávislý na historii výdajů.
 """
-from django.db.models import Sum
 from datetime import datetime
+from django.db.models import Q
+from django.utils import timezone
 from .models import Budget
 from notifications.models import Notification
 
@@ -18,6 +28,84 @@ class BudgetAlertService:
         {'percentage': 100, 'severity': 'critical', 'icon': 'close'},
     ]
     
+    # Upozornění na odhadované překročení a od jakého využití se odhad počítá
+    FORECAST = {'percentage': 100, 'severity': 'forecast', 'icon': 'trending_up'}
+    FORECAST_MIN_PERCENT = 50
+    
+    NOTIFICATION_TYPES = {
+        'warning': 'BUDGET_WARNING',
+        'high': 'BUDGET_WARNING',
+        'critical': 'BUDGET_EXCEEDED',
+        'forecast': 'BUDGET_FORECAST',
+    }
+    
+    @staticmethod
+    def apply_transaction_change(previous, current):
+        """
+        Promítne změnu transakce do udržované utracené částky rozpočtů a vytvoří
+        notifikace pro rozpočty, které změna posunula přes některý práh.
+        
+        Args:
+            previous: původní podoba transakce (dict) nebo None u nové transakce
+            current: nová podoba transakce (dict) nebo None u smazané transakce
+        
+        Returns:
+            List of created notifications
+        """
+        from .spending import apply_expense_deltas, expense_deltas
+        
+        deltas = expense_deltas(current) + expense_deltas(previous, sign=-1)
+        thresholds = [threshold['percentage'] for threshold in BudgetAlertService.THRESHOLDS]
+        notifications = []
+        for budget, previous_spent, spent, crossed in apply_expense_deltas(deltas, thresholds):
+            percentage = float(spent / budget.amount * 100)
+            for threshold in BudgetAlertService.THRESHOLDS:
+                if threshold['percentage'] in crossed:
+                    notifications.append(BudgetAlertService._build_budget_notification(
+                        user=budget.user_id,
+                        budget=budget,
+                        spent=float(spent),
+                        percentage=percentage,
+                        threshold=threshold
+                    ))
+        return BudgetAlertService._insert_budget_notifications(notifications)
+    
+    @staticmethod
+    def forecast_notifications(budgets):
+        """
+        Upozornění na odhadované překročení rozpočtu do konce období.
+        
+        Odhad se počítá jen pro rozpočty mezi FORECAST_MIN_PERCENT a prvním
+        prahem (nad ním už upozorňují prahy), pro všechny jedním dotazem.
+        
+        Args:
+            budgets: rozpočty s anotací spent_amount (Budget.objects.with_spent())
+        
+        Returns:
+            List of unsaved notifications
+        """
+        from .forecast import project_budgets
+        
+        first_threshold = BudgetAlertService.THRESHOLDS[0]['percentage']
+        candidates = [
+            budget for budget in budgets
+            if budget.amount > 0
+            and BudgetAlertService.FORECAST_MIN_PERCENT <= budget.spent_amount / budget.amount * 100 < first_threshold
+        ]
+        projections = project_budgets(candidates)
+        notifications = []
+        for budget in candidates:
+            projection = projections[budget.pk]
+            if projection['percent'] >= BudgetAlertService.FORECAST['percentage']:
+                notifications.append(BudgetAlertService._build_budget_notification(
+                    user=budget.user_id,
+                    budget=budget,
+                    spent=float(budget.spent_amount),
+                    percentage=projection['percent'],
+                    threshold=BudgetAlertService.FORECAST
+                ))
+        return notifications
+    
     @staticmethod
     def check_budget_alerts(user, transaction=None):
         """
@@ -30,28 +118,13 @@ class BudgetAlertService:
         Returns:
             List of created notifications
         """
-        from transactions.models import Transaction
-        
-        created_notifications = []
+        notifications = []
         
-        # Získání všech aktivních rozpočtů
-        budgets = Budget.objects.filter(user=user, is_active=True)
+        # Všechny aktivní rozpočty i s utracenou částkou jedním dotazem
+        budgets = Budget.objects.filter(user=user, is_active=True).select_related('category').with_spent()
         
         for budget in budgets:
-            # Získání transakcí pro tento rozpočet
-            transactions = Transaction.objects.filter(
-                user=user,
-                type='EXPENSE',
-                date__range=[budget.start_date, budget.end_date]
-            )
-            
-            # Filtr podle kategorie, pokud je definována
-            if budget.category:
-                transactions = transactions.filter(category=budget.category)
-            
-            # Výpočet utracené částky
-            spent = transactions.aggregate(total=Sum('amount'))['total'] or 0
-            spent = float(spent)
+            spent = float(budget.spent_amount)
             budget_amount = float(budget.amount)
             
             if budget_amount == 0:
@@ -60,36 +133,49 @@ class BudgetAlertService:
             # Výpočet procenta využití
             percentage_used = (spent / budget_amount) * 100
             
-            # Kontrola každé prahové hodnoty
+            # Notifikace pro každou dosaženou prahovou hodnotu - již existující
+            # (stejný rozpočet, práh a období) přeskočí unikátní index
             for threshold in BudgetAlertService.THRESHOLDS:
-                threshold_percentage = threshold['percentage']
-                
-                # Pokud jsme právě překročili prahovou hodnotu
-                if percentage_used >= threshold_percentage:
-                    # Kontrola, zda už notifikace pro tuto úroveň existuje
-                    existing_notification = Notification.objects.filter(
+                if percentage_used >= threshold['percentage']:
+                    notifications.append(BudgetAlertService._build_budget_notification(
                         user=user,
-                        type='BUDGET_ALERT',
-                        related_id=budget.id,
-                        message__contains=f"{threshold_percentage}%"
-                    ).exists()
-                    
-                    # Vytvoř notifikaci pouze pokud ještě neexistuje
-                    if not existing_notification:
-                        notification = BudgetAlertService._create_budget_notification(
-                            user=user,
-                            budget=budget,
-                            spent=spent,
-                            percentage=percentage_used,
-                            threshold=threshold
-                        )
-                        created_notifications.append(notification)
-        
-        return created_notifications
+                        budget=budget,
+                        spent=spent,
+                        percentage=percentage_used,
+                        threshold=threshold
+                    ))
+        
+        # Odhad překročení pro rozpočty pod prvním prahem - jeden dotaz pro všechny
+        notifications.extend(BudgetAlertService.forecast_notifications(budgets))
+        
+        return BudgetAlertService._insert_budget_notifications(notifications)
     
     @staticmethod
-    def _create_budget_notification(user, budget, spent, percentage, threshold):
-        """Vytvoří notifikaci o překročení rozpočtu"""
+    def _insert_budget_notifications(notifications):
+        """
+        Uloží notifikace jedním INSERT ... ON CONFLICT DO NOTHING.
+        
+        Returns:
+            List of created notifications (bez těch, které už existovaly)
+        """
+        if not notifications:
+            return []
+        started = timezone.now()
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+        # bulk_create s ignore_conflicts nevrací, které řádky vznikly
+        keys = Q()
+        for notification in notifications:
+            keys |= Q(
+                related_budget_id=notification.related_budget_id,
+                threshold=notification.threshold,
+                period_start=notification.period_start,
+                type=notification.type
+            )
+        return list(Notification.objects.filter(keys, created_at__gte=started).order_by('id'))
+    
+    @staticmethod
+    def _build_budget_notification(user, budget, spent, percentage, threshold):
+        """Připraví (neuloženou) notifikaci o překročení rozpočtu"""
         
         threshold_percentage = threshold['percentage']
         icon = threshold['icon']
@@ -100,6 +186,8 @@ class BudgetAlertService:
             message = f"{icon} Rozpočet '{budget.name}' dosáhl {threshold_percentage}% využití"
         elif severity == 'high':
             message = f"{icon} POZOR: Rozpočet '{budget.name}' je téměř vyčerpán ({threshold_percentage}%)"
+        elif severity == 'forecast':
+            message = f"{icon} Rozpočet '{budget.name}' bude podle odhadu na konci období čerpán na {percentage:.0f}%"
         else:  # critical
             message = f"{icon} PŘEKROČEN: Rozpočet '{budget.name}' byl překročen!"
         
@@ -107,22 +195,26 @@ class BudgetAlertService:
         category_info = f" (Kategorie: {budget.category.name})" if budget.category else ""
         details = f"Utraceno: {spent:.2f} z {budget.amount:.2f} CZK{category_info}"
         
-        notification = Notification.objects.create(
-            user=user,
-            type='BUDGET_ALERT',
+        return Notification(
+            user_id=getattr(user, 'pk', user),
+            type=BudgetAlertService.NOTIFICATION_TYPES[severity],
             title=f"Upozornění na rozpočet",
             message=f"{message}\n{details}",
-            priority=severity.upper(),
-            related_id=budget.id
+            related_budget=budget,
+            threshold=threshold_percentage,
+            period_start=budget.start_date
         )
-        
-        return notification
     
     @staticmethod
-    def get_budget_status(budget):
+    def get_budget_status(budget, spent=None):
         """
         Vrací aktuální status rozpočtu
         
+        Args:
+            budget: Budget instance
+            spent: Utracená částka (optional) - např. anotace spent_amount z
+                Budget.objects.with_spent(); jinak se spočítá dotazem
+        
         Returns:
             dict: {
                 'spent': float,
@@ -131,18 +223,9 @@ class BudgetAlertService:
                 'status': 'safe'|'warning'|'danger'|'exceeded'
             }
         """
-        from transactions.models import Transaction
-        
-        transactions = Transaction.objects.filter(
-            user=budget.user,
-            type='EXPENSE',
-            date__range=[budget.start_date, budget.end_date]
-        )
-        
-        if budget.category:
-            transactions = transactions.filter(category=budget.category)
-        
-        spent = float(transactions.aggregate(total=Sum('amount'))['total'] or 0)
+        if spent is None:
+            spent = budget.get_spent_amount()
+        spent = float(spent)
         budget_amount = float(budget.amount)
         remaining = budget_amount - spent
         percentage = (spent / budget_amount * 100) if budget_amount > 0 else 0
@@ -169,6 +252,6 @@ class BudgetAlertService:
         """Smaže všechny notifikace pro daný rozpočet"""
         Notification.objects.filter(
             user=user,
-            type='BUDGET_ALERT',
-            related_id=budget_id
+            type__in=['BUDGET_WARNING', 'BUDGET_EXCEEDED', 'BUDGET_FORECAST'],
+            related_budget_id=budget_id
         ).delete()
@@ -0,0 +1,84 @@
+"""
+simulation.py - Simulace hypotetických rozpočtů nad historií výdajů
+
+@author Tomáš Holes
+@description Obsahuje:
+    - monthly_expenses(): výdaje po měsících a kategoriích - jeden seskupený dotaz
+    - evaluate_limits(): počet překročení, průměrné přečerpání a rezerva pro kandidátní limity
+
+@note Měsíční součty jednoho rozpočtu se seřadí a spočítají se prefixové součty.
+      Každý kandidátní limit se pak vyhodnotí binárním vyhledáním (bisect)
+      v O(log N) - desítky limitů v jednom požadavku nestojí další dotazy ani
+      průchody historií. Počítají se jen celé měsíce (bez aktuálního).
+"""
+import datetime as dt
+from bisect import bisect_left
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from transactions.models import Transaction
+
+# Počet měsíců historie (výchozí a maximální) a limity velikosti požadavku
+SIMULATION_MONTHS = 12
+SIMULATION_MAX_MONTHS = 36
+SIMULATION_MAX_BUDGETS = 20
+SIMULATION_MAX_LIMITS = 100
+
+
+def monthly_expenses(user, months, today=None):
+    """
+    Výdaje uživatele za posledních months celých měsíců.
+
+    Returns:
+        tuple: (začátky měsíců, {category_id: [částka po měsících]}, [celkem po měsících])
+    """
+    today = today or dt.date.today()
+    current = today.replace(day=1)
+    starts = [current - relativedelta(months=months - offset) for offset in range(months)]
+    columns = {start: index for index, start in enumerate(starts)}
+
+    rows = (
+        Transaction.objects.filter(user=user, type='EXPENSE', date__gte=starts[0], date__lt=current)
+        .order_by()
+        .values('category_id', month=TruncMonth('date'))
+        .annotate(total=Sum('amount'))
+    )
+    by_category = {}
+    totals = [0.0] * months
+    for row in rows:
+        column = columns[row['month']]
+        amount = float(row['total'])
+        by_category.setdefault(row['category_id'], [0.0] * months)[column] += amount
+        totals[column] += amount
+    return starts, by_category, totals
+
+
+def evaluate_limits(spent, limits):
+    """
+    Vyhodnotí kandidátní limity nad měsíčními útratami.
+
+    Měsíc je překročený, když útrata dosáhne limitu (stejně jako status 'exceeded').
+
+    Returns:
+        dict: seznamy exceeded (počet měsíců), average_overrun (průměrné přečerpání
+              v překročených měsících) a average_slack (průměrná nevyčerpaná částka
+              v ostatních měsících) - jeden prvek pro každý limit
+    """
+    ordered = sorted(spent)
+    prefix = [0.0]
+    for value in ordered:
+        prefix.append(prefix[-1] + value)
+    count = len(ordered)
+
+    result = {'exceeded': [], 'average_overrun': [], 'average_slack': []}
+    for limit in limits:
+        within = bisect_left(ordered, limit)
+        exceeded = count - within
+        overrun = prefix[count] - prefix[within] - limit * exceeded
+        slack = limit * within - prefix[within]
+        result['exceeded'].append(exceeded)
+        result['average_overrun'].append(round(overrun / exceeded, 2) if exceeded else 0.0)
+        result['average_slack'].append(round(slack / within, 2) if within else 0.0)
+    return result
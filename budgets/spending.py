@@ -0,0 +1,119 @@
+"""
+spending.py - Udržovaná utracená částka rozpočtů a upozornění při překročení prahů
+
+@author Tomáš Holes
+@description Obsahuje:
+    - expense_deltas(): změny výdajů, které způsobí jedna podoba transakce
+    - apply_expense_deltas(): přičte změny do Budget.spent_total dotčených rozpočtů
+      a vrátí rozpočty, které změnou překročily některý práh upozornění
+    - refresh_spent_totals(): přepočet spent_total z transakcí (po hromadných změnách)
+
+@note Transakce ovlivní jen rozpočty svého uživatele, jejichž období obsahuje
+      datum transakce a které mají stejnou kategorii (nebo žádnou). Výběr jde
+      přes index (user, end_date, start_date), takže zápis transakce nezávisí na
+      počtu rozpočtů. Upozornění vzniká jen při překročení prahu směrem nahoru.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Value
+
+from transactions.fields import CentsAmountField
+
+from .models import Budget
+
+ZERO = Decimal('0')
+
+
+def expense_deltas(values, sign=1):
+    """
+    Změny výdajů z jedné podoby transakce.
+
+    Args:
+        values: dict s klíči type, amount, date, category_id, user_id (nebo None)
+
+    Returns:
+        list: n-tice (user_id, category_id, date, delta); jen pro výdaje
+    """
+    if not values or values['type'] != 'EXPENSE' or not values['amount']:
+        return []
+    return [(values['user_id'], values['category_id'], values['date'], values['amount'] * sign)]
+
+
+def _matching(user_id, category_id, day):
+    return Q(user_id=user_id, start_date__lte=day, end_date__gte=day) & (
+        Q(category__isnull=True) | Q(category_id=category_id)
+    )
+
+
+def apply_expense_deltas(deltas, thresholds):
+    """
+    Přičte změny výdajů do spent_total všech dotčených rozpočtů.
+
+    Změny se nejdřív sečtou za každý rozpočet (např. přesun transakce mezi
+    kategoriemi nezmění rozpočet bez kategorie), teprve pak se zapíšou.
+
+    Args:
+        deltas: iterable (user_id, category_id, date, delta)
+        thresholds: procenta prahů (např. [80, 90, 100])
+
+    Returns:
+        list: n-tice (budget, původní částka, nová částka, překročené prahy)
+              pro aktivní rozpočty, které změna posunula přes některý práh
+    """
+    deltas = [delta for delta in deltas if delta[3]]
+    if not deltas:
+        return []
+
+    condition = Q()
+    for user_id, category_id, day, _ in deltas:
+        condition |= _matching(user_id, category_id, day)
+
+    crossings = []
+    with db_transaction.atomic():
+        # Zamčené řádky - souběžné zápisy do stejného rozpočtu se seřadí
+        budgets = list(Budget.objects.select_for_update().filter(condition).select_related('category').order_by('pk'))
+        net = defaultdict(Decimal)
+        for budget in budgets:
+            for user_id, category_id, day, delta in deltas:
+                if (
+                    budget.user_id == user_id
+                    and budget.start_date <= day <= budget.end_date
+                    and budget.category_id in (None, category_id)
+                ):
+                    net[budget.pk] += delta
+
+        for budget in budgets:
+            delta = net[budget.pk]
+            if not delta:
+                continue
+            Budget.objects.filter(pk=budget.pk).update(
+                spent_total=F('spent_total') + Value(delta, output_field=CentsAmountField())
+            )
+            previous, budget.spent_total = budget.spent_total, budget.spent_total + delta
+            if delta > 0 and budget.is_active and budget.amount > 0:
+                crossed = [
+                    threshold for threshold in thresholds
+                    if previous * 100 < budget.amount * threshold <= budget.spent_total * 100
+                ]
+                if crossed:
+                    crossings.append((budget, previous, budget.spent_total, crossed))
+    return crossings
+
+
+def refresh_spent_totals(budgets):
+    """
+    Přepočítá spent_total z transakcí (jeden dotaz + hromadný update).
+    Volá se po hromadných změnách transakcí, které nespouští signály.
+
+    Returns:
+        int: počet rozpočtů, jejichž částka se změnila
+    """
+    changed = []
+    for budget in budgets.with_spent():
+        if budget.spent_total != budget.spent_amount:
+            budget.spent_total = budget.spent_amount
+            changed.append(budget)
+    Budget.objects.bulk_update(changed, ['spent_total'], batch_size=500)
+    return len(changed)
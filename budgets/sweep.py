@@ -0,0 +1,134 @@
+"""
+sweep.py - Hromadná kontrola upozornění na rozpočty všech uživatelů
+
+@author Tomáš Holes
+@description Obsahuje:
+    - budget_chunks(): aktivní rozpočty po dávkách i s utracenou částkou (jeden dotaz na dávku)
+    - evaluate_chunk(): vyhodnocení prahů pro dávku (čistý Python, běží v procesu poolu)
+    - sweep_budget_alerts(): dávky -> pool procesů -> hromadné vložení notifikací
+      (včetně upozornění na odhadované překročení, viz budgets/forecast.py)
+
+@note Kontrola při zápisu transakce nezachytí rozpočty, kterým začalo nové
+      období, ani transakce vytvořené hromadně bez signálů. Sweep projde všechny
+      rozpočty, jejichž období ještě neskončilo. Notifikace se vkládají
+      s ignore_conflicts - existující upozornění (rozpočet, práh, období) se
+      přeskočí, sweep proto lze spouštět libovolně často.
+      Procesy poolu nepracují s databází - dostávají jen n-tice čísel, a modul
+      proto importuje modely až uvnitř funkcí (import v procesu poolu nepotřebuje
+      nastavený Django).
+"""
+import datetime as dt
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Výchozí počet rozpočtů v jedné dávce
+CHUNK_SIZE = 1000
+
+
+def budget_chunks(chunk_size=CHUNK_SIZE, today=None):
+    """
+    Aktivní rozpočty (období nekončí před today) po dávkách podle pk.
+
+    Yields:
+        list: rozpočty dávky s anotací spent_amount
+    """
+    from .models import Budget
+
+    today = today or dt.date.today()
+    budgets = Budget.objects.filter(is_active=True, end_date__gte=today).select_related('category')
+    last_pk = 0
+    while True:
+        chunk = list(budgets.filter(pk__gt=last_pk).order_by('pk').with_spent()[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def evaluate_chunk(rows, percentages):
+    """
+    Dosažené prahy pro dávku rozpočtů.
+
+    Args:
+        rows: n-tice (budget_id, limit, utraceno)
+        percentages: procenta prahů (např. [80, 90, 100])
+
+    Returns:
+        list: n-tice (budget_id, procento využití, dosažené prahy)
+    """
+    results = []
+    for budget_id, limit, spent in rows:
+        if limit <= 0:
+            continue
+        percentage = spent / limit * 100
+        reached = [threshold for threshold in percentages if percentage >= threshold]
+        if reached:
+            results.append((budget_id, percentage, reached))
+    return results
+
+
+def _notifications(budgets, results):
+    from .services import BudgetAlertService
+
+    thresholds = {threshold['percentage']: threshold for threshold in BudgetAlertService.THRESHOLDS}
+    notifications = []
+    for budget_id, percentage, reached in results:
+        budget = budgets[budget_id]
+        for threshold in reached:
+            notifications.append(BudgetAlertService._build_budget_notification(
+                user=budget.user_id,
+                budget=budget,
+                spent=float(budget.spent_amount),
+                percentage=percentage,
+                threshold=thresholds[threshold]
+            ))
+    return notifications
+
+
+def sweep_budget_alerts(chunk_size=CHUNK_SIZE, workers=None, today=None):
+    """
+    Vyhodnotí prahy všech aktivních rozpočtů a vloží chybějící upozornění.
+
+    Zatímco pool vyhodnocuje jednu dávku, hlavní proces načítá další. S workers=1
+    se prahy vyhodnocují přímo v hlavním procesu.
+
+    Returns:
+        tuple: (počet zkontrolovaných rozpočtů, počet vytvořených notifikací)
+    """
+    from django.utils import timezone
+    from notifications.models import Notification
+    from .services import BudgetAlertService
+
+    workers = workers or os.cpu_count() or 1
+    percentages = [threshold['percentage'] for threshold in BudgetAlertService.THRESHOLDS]
+    started = timezone.now()
+    checked = 0
+
+    def insert(budgets, results):
+        # Odhad překročení pro rozpočty pod prvním prahem - jeden dotaz na dávku
+        notifications = _notifications(budgets, results) + BudgetAlertService.forecast_notifications(budgets.values())
+        Notification.objects.bulk_create(notifications, ignore_conflicts=True, batch_size=500)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending = []
+    try:
+        for chunk in budget_chunks(chunk_size, today):
+            checked += len(chunk)
+            budgets = {budget.pk: budget for budget in chunk}
+            rows = [(budget.pk, float(budget.amount), float(budget.spent_amount)) for budget in chunk]
+            if executor is None:
+                insert(budgets, evaluate_chunk(rows, percentages))
+                continue
+            pending.append((budgets, executor.submit(evaluate_chunk, rows, percentages)))
+            # Rozpracovaných dávek nejvýše dvakrát tolik co procesů (omezení paměti)
+            while len(pending) >= workers * 2:
+                budgets, future = pending.pop(0)
+                insert(budgets, future.result())
+        for budgets, future in pending:
+            insert(budgets, future.result())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    created = Notification.objects.filter(threshold__isnull=False, created_at__gte=started).count()
+    return checked, created
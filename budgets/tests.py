@@ -4,9 +4,15 @@ tests.py - Unit testy pro modul budgets
 @author Tomáš Holes
 @description Testuje:
     - CRUD operace pro rozpočty
-    - Výpočet utracené částky
-    - Upozornění na překročení rozpočtu
+    - Výpočet utracené částky (i pro všechny rozpočty jedním dotazem)
+    - Upozornění na překročení rozpočtu (jen dotčené rozpočty, při překročení prahu)
+    - Deduplikace upozornění podle rozpočtu, prahu a období
+    - Hromadná kontrola upozornění (příkaz sweep_budget_alerts)
     - Filtrování podle období
+    - Historie čerpání po obdobích (history)
+    - Průběh čerpání, odhad konce období a upozornění na odhad (burndown)
+    - Simulace kandidátních limitů nad historií (simulate)
+    - Čerpání alokací rozpočtu (BudgetCategory) v detailu a přehledu
 """
 from django.test import TestCase
 from django.urls import reverse
@@ -135,6 +141,36 @@ class BudgetModelTests(TestCase):
             date=date.today(), user=self.user
         )
         self.assertEqual(budget.get_spent_amount(), 1000)
+    
+    def test_with_spent_matches_get_spent_amount(self):
+        """Test že anotace with_spent dává stejné částky jako get_spent_amount"""
+        other_category = Category.objects.create(name='Doprava', category_type='EXPENSE', user=self.user)
+        Budget.objects.create(
+            name='Vše', amount=5000, start_date=date.today() - timedelta(days=5),
+            end_date=date.today() + timedelta(days=25), period='MONTHLY', user=self.user
+        )
+        Budget.objects.create(
+            name='Jídlo', amount=3000, start_date=date.today() - timedelta(days=5),
+            end_date=date.today() + timedelta(days=25), period='MONTHLY', category=self.category, user=self.user
+        )
+        Budget.objects.create(
+            name='Prázdný', amount=1000, start_date=date.today() - timedelta(days=5),
+            end_date=date.today() + timedelta(days=25), period='MONTHLY', category=other_category, user=self.user
+        )
+        Transaction.objects.create(amount=500, type='EXPENSE', category=self.category, date=date.today(), user=self.user)
+        Transaction.objects.create(
+            amount=200, type='EXPENSE', category=self.category, date=date.today() - timedelta(days=10), user=self.user
+        )
+        Transaction.objects.create(amount=300, type='EXPENSE', date=date.today(), user=self.user)
+        
+        with self.assertNumQueries(1):
+            budgets = list(Budget.objects.filter(user=self.user).with_spent())
+        for budget in budgets:
+            self.assertEqual(budget.spent_amount, budget.get_spent_amount())
+        self.assertEqual({budget.name: budget.spent_amount for budget in budgets}, {'Vše': 800, 'Jídlo': 500, 'Prázdný': 0})
+        
+        fixed = Budget.objects.with_spent(date.today() - timedelta(days=15), date.today()).get(name='Jídlo')
+        self.assertEqual(fixed.spent_amount, 700)
 
 
 class BudgetAPITests(APITestCase):
@@ -281,6 +317,321 @@ class BudgetAPITests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['name'], 'Aktivní')
+    
+    def test_overview_and_alerts_query_count_independent_of_budgets(self):
+        """Test že přehled a alerty načtou čerpání všech rozpočtů jedním dotazem"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        def create_budgets(count):
+            for index in range(count):
+                Budget.objects.create(
+                    name=f'Rozpočet {index}', amount=100, start_date=date.today().replace(day=1),
+                    end_date=date.today() + timedelta(days=30), period='MONTHLY',
+                    category=self.category, user=self.user
+                )
+        
+        Transaction.objects.create(amount=95, type='EXPENSE', category=self.category, date=date.today(), user=self.user)
+        create_budgets(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('budget-overview'))
+            alerts = self.client.get(reverse('budget-alerts'))
+        self.assertEqual(alerts.data['count'], 2)
+        self.assertEqual(alerts.data['alerts'][0]['status'], 'danger')
+        
+        create_budgets(5)
+        with CaptureQueriesContext(connection) as many:
+            overview = self.client.get(reverse('budget-overview'))
+            self.client.get(reverse('budget-alerts'))
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(overview.data['total_spent'], 95 * 7)
+    
+    def test_history_matrix(self):
+        """Test matice čerpání po obdobích (měsíce i roky) jedním dotazem na výdaje"""
+        from budgets.views import _period_starts
+        today = date.today()
+        months = _period_starts(today, 3, yearly=False)
+        monthly = Budget.objects.create(
+            name='Jídlo', amount=1000, start_date=months[-1], end_date=today,
+            period='MONTHLY', category=self.category, user=self.user
+        )
+        Budget.objects.create(
+            name='Rok', amount=10000, start_date=today.replace(month=1, day=1), end_date=today,
+            period='YEARLY', user=self.user
+        )
+        Transaction.objects.create(amount=500, type='EXPENSE', category=self.category, date=months[0], user=self.user)
+        Transaction.objects.create(amount=250, type='EXPENSE', category=self.category, date=months[-1], user=self.user)
+        Transaction.objects.create(amount=100, type='EXPENSE', date=months[-1], user=self.user)
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('budget-history'), {'periods': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['monthly']['periods'], [month.isoformat()[:7] for month in months])
+        self.assertEqual(data['monthly']['id'], [monthly.id])
+        self.assertEqual(data['monthly']['spent'], [[500.0, 0.0, 250.0]])
+        self.assertEqual(data['monthly']['percent'], [[50.0, 0.0, 25.0]])
+        yearly_spent = 850.0 if months[0].year == today.year else 350.0
+        self.assertEqual(data['yearly']['spent'][0][-1], yearly_spent)
+        self.assertEqual(self.client.get(reverse('budget-history'), {'periods': 'x'}).status_code, 400)
+    
+    def test_simulate_candidate_limits(self):
+        """Test simulace limitů nad měsíčními výdaji (bez aktuálního měsíce)"""
+        from dateutil.relativedelta import relativedelta
+        current = date.today().replace(day=1)
+        other = Category.objects.create(name='Doprava', category_type='EXPENSE', user=self.user)
+        for months_ago, amount in ((1, 6000), (2, 4000), (3, 5000)):
+            Transaction.objects.create(
+                amount=amount, type='EXPENSE', category=self.category, date=current - relativedelta(months=months_ago), user=self.user
+            )
+        Transaction.objects.create(amount=1000, type='EXPENSE', category=other, date=current - relativedelta(months=1), user=self.user)
+        Transaction.objects.create(amount=9999, type='EXPENSE', category=self.category, date=current, user=self.user)
+        
+        url = reverse('budget-simulate')
+        data = {'months': 3, 'budgets': [
+            {'category': self.category.id, 'limits': [4500, 5000, 7000]},
+            {'category': None, 'limits': [6500]},
+        ]}
+        with self.assertNumQueries(2):
+            response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        food, overall = response.data['results']
+        self.assertEqual(food['spent'], [5000.0, 4000.0, 6000.0])
+        self.assertEqual(food['exceeded'], [2, 2, 0])
+        self.assertEqual(food['average_overrun'], [1000.0, 500.0, 0.0])
+        self.assertEqual(food['average_slack'], [500.0, 1000.0, 2000.0])
+        self.assertEqual((overall['spent'][-1], overall['exceeded']), (7000.0, [1]))
+        
+        # Cizí kategorie a prázdné limity jsou neplatné
+        foreign = Category.objects.create(name='Cizí', user=User.objects.create_user(username='other', password='TestPass123!'))
+        for budgets in ([{'category': foreign.id, 'limits': [1]}], [{'category': None, 'limits': []}]):
+            response = self.client.post(url, {'budgets': budgets}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_allocations_breakdown(self):
+        """Test čerpání alokací v detailu a přehledu rozpočtu"""
+        transport = Category.objects.create(name='Doprava', category_type='EXPENSE', user=self.user)
+        budget = Budget.objects.create(
+            name='Domácnost', amount=3000, start_date=date.today() - timedelta(days=5),
+            end_date=date.today() + timedelta(days=25), period='MONTHLY', user=self.user
+        )
+        response = self.client.post(
+            reverse('budget-category-list'),
+            {'budget': budget.id, 'category': self.category.id, 'allocated_amount': '2000'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        BudgetCategory.objects.create(budget=budget, category=transport, allocated_amount=1000)
+        Transaction.objects.create(amount=1200, type='EXPENSE', category=self.category, date=date.today(), user=self.user)
+        # Mimo období rozpočtu
+        Transaction.objects.create(
+            amount=500, type='EXPENSE', category=self.category, date=date.today() - timedelta(days=10), user=self.user
+        )
+        
+        expected = [
+            {'id': budget.budgetcategory_set.get(category=transport).id, 'category': transport.id,
+             'category_name': 'Doprava', 'allocated': 1000.0, 'spent': 0.0, 'remaining': 1000.0},
+            {'id': response.data['id'], 'category': self.category.id,
+             'category_name': 'Jídlo', 'allocated': 2000.0, 'spent': 1200.0, 'remaining': 800.0},
+        ]
+        detail = self.client.get(reverse('budget-detail', args=[budget.id]))
+        self.assertEqual(detail.data['allocations'], expected)
+        overview = self.client.get(reverse('budget-overview'))
+        self.assertEqual(overview.data['budgets'][0]['allocations'], expected)
+        
+        # Cizí rozpočet nelze alokovat
+        other = User.objects.create_user(username='other', password='TestPass123!')
+        foreign = Budget.objects.create(
+            name='Cizí', amount=100, start_date=date.today(), end_date=date.today(), period='MONTHLY', user=other
+        )
+        response = self.client.post(
+            reverse('budget-category-list'),
+            {'budget': foreign.id, 'category': self.category.id, 'allocated_amount': '10'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class BudgetSpendingTests(APITestCase):
+    """Testy udržované utracené částky a upozornění při zápisu transakce"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.food = Category.objects.create(name='Jídlo', category_type='EXPENSE', user=self.user)
+        self.transport = Category.objects.create(name='Doprava', category_type='EXPENSE', user=self.user)
+        self.budget = self._budget('Jídlo', self.food)
+        self.client.force_authenticate(user=self.user)
+    
+    def _budget(self, name, category=None, amount=1000):
+        return Budget.objects.create(
+            name=name, amount=amount, start_date=date.today() - timedelta(days=5),
+            end_date=date.today() + timedelta(days=25), period='MONTHLY', category=category, user=self.user
+        )
+    
+    def test_spent_total_follows_transaction_writes(self):
+        """Test přičtení, přesunu mezi kategoriemi a smazání výdaje"""
+        overall = self._budget('Vše')
+        expense = Transaction.objects.create(amount=300, type='EXPENSE', category=self.food, date=date.today(), user=self.user)
+        Transaction.objects.create(amount=999, type='INCOME', category=self.food, date=date.today(), user=self.user)
+        self.budget.refresh_from_db()
+        overall.refresh_from_db()
+        self.assertEqual((self.budget.spent_total, overall.spent_total), (300, 300))
+        
+        expense.category = self.transport
+        expense.save()
+        self.budget.refresh_from_db()
+        overall.refresh_from_db()
+        self.assertEqual((self.budget.spent_total, overall.spent_total), (0, 300))
+        
+        expense.delete()
+        overall.refresh_from_db()
+        self.assertEqual(overall.spent_total, 0)
+        
+        # Změna období rozpočtu přepočítá částku z transakcí
+        Transaction.objects.create(
+            amount=50, type='EXPENSE', category=self.food, date=date.today() - timedelta(days=20), user=self.user
+        )
+        self.budget.start_date = date.today() - timedelta(days=30)
+        self.budget.save()
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_total, 50)
+    
+    def test_transaction_with_string_date(self):
+        """Test zápisu transakce s datem jako řetězcem do období rozpočtu"""
+        Transaction.objects.create(
+            amount=100, type='EXPENSE', category=self.food, date=date.today().isoformat(), user=self.user
+        )
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent_total, 100)
+    
+    def test_alert_only_when_threshold_crossed(self):
+        """Test vytvoření notifikace jen při překročení prahu"""
+        from notifications.models import Notification
+        url = reverse('transaction-list')
+        data = {'amount': '850', 'type': 'EXPENSE', 'category_id': self.food.pk, 'date': str(date.today())}
+        self.assertEqual(self.client.post(url, data, format='json').status_code, status.HTTP_201_CREATED)
+        alerts = Notification.objects.filter(related_budget=self.budget)
+        self.assertEqual(list(alerts.values_list('type', flat=True)), ['BUDGET_WARNING'])
+        
+        # 850 -> 880: žádný další práh nepřekročen
+        self.client.post(url, {**data, 'amount': '30'}, format='json')
+        self.assertEqual(alerts.count(), 1)
+        # 880 -> 1080: překročeny prahy 90 % i 100 %
+        self.client.post(url, {**data, 'amount': '200'}, format='json')
+        self.assertEqual(alerts.filter(type='BUDGET_EXCEEDED').count(), 1)
+        self.assertEqual(alerts.count(), 3)
+
+    def test_alert_created_once_per_threshold_and_period(self):
+        """Test že opakovaná kontrola ani pokles a nový růst nevytvoří duplicitní upozornění"""
+        from budgets.services import BudgetAlertService
+        from notifications.models import Notification
+        expense = Transaction.objects.create(amount=850, type='EXPENSE', category=self.food, date=date.today(), user=self.user)
+        self.assertEqual(BudgetAlertService.check_budget_alerts(self.user), [])
+
+        # 850 -> 0 -> 850: práh 80 % překročen znovu ve stejném období
+        expense.delete()
+        Transaction.objects.create(amount=850, type='EXPENSE', category=self.food, date=date.today(), user=self.user)
+        alerts = Notification.objects.filter(related_budget=self.budget)
+        self.assertEqual(list(alerts.values_list('threshold', 'period_start')), [(80, self.budget.start_date)])
+
+        # Nové období rozpočtu = nový klíč upozornění
+        self.budget.start_date -= timedelta(days=1)
+        self.budget.save()
+        created = BudgetAlertService.check_budget_alerts(self.user)
+        self.assertEqual([(n.threshold, n.period_start) for n in created], [(80, self.budget.start_date)])
+        self.assertEqual(alerts.count(), 2)
+
+    def test_sweep_creates_missing_alerts(self):
+        """Test příkazu sweep_budget_alerts pro transakce vložené bez signálů"""
+        from io import StringIO
+        from django.core.management import call_command
+        from notifications.models import Notification
+        other = User.objects.create_user(username='other', password='TestPass123!')
+        ended = self._budget('Minulý', self.food)
+        ended.end_date = date.today() - timedelta(days=1)
+        ended.save()
+        Budget.objects.create(
+            name='Cizí', amount=100, start_date=date.today() - timedelta(days=5),
+            end_date=date.today() + timedelta(days=25), period='MONTHLY', user=other
+        )
+        Transaction.objects.bulk_create([
+            Transaction(amount=950, type='EXPENSE', category=self.food, date=date.today(), user=self.user),
+            Transaction(amount=100, type='EXPENSE', date=date.today(), user=other),
+        ])
+
+        for workers in ('1', '2'):
+            call_command('sweep_budget_alerts', '--chunk-size', '1', '--workers', workers, stdout=StringIO())
+            alerts = Notification.objects.order_by('related_budget__name', 'threshold')
+            self.assertEqual(
+                list(alerts.values_list('related_budget__name', 'threshold')),
+                [('Cizí', 80), ('Cizí', 90), ('Cizí', 100), ('Jídlo', 80), ('Jídlo', 90)]
+            )
+
+    def test_burndown_projection_from_prior_periods(self):
+        """Test kumulativního čerpání a odhadu konce období z předchozích měsíců"""
+        from budgets.forecast import burndown
+        budget = Budget.objects.create(
+            name='Březen', amount=500, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31),
+            period='MONTHLY', category=self.food, user=self.user
+        )
+        for month in (1, 2):
+            Transaction.objects.create(amount=100, type='EXPENSE', category=self.food, date=date(2025, month, 5), user=self.user)
+            Transaction.objects.create(amount=200, type='EXPENSE', category=self.food, date=date(2025, month, 25), user=self.user)
+        Transaction.objects.create(amount=150, type='EXPENSE', category=self.food, date=date(2025, 3, 2), user=self.user)
+        Transaction.objects.create(amount=999, type='EXPENSE', category=self.transport, date=date(2025, 3, 3), user=self.user)
+        
+        with self.assertNumQueries(1):
+            data = burndown(budget, today=date(2025, 3, 10))
+        self.assertEqual(len(data['days']), 31)
+        self.assertEqual(data['actual'], [0.0] + [150.0] * 9)
+        self.assertEqual(data['ideal'][-1], 500.0)
+        self.assertEqual(data['projection'], {
+            'spent': 350.0, 'low': 350.0, 'high': 350.0, 'percent': 70.0, 'method': 'history', 'periods': 2
+        })
+        
+        response = self.client.get(reverse('budget-burndown', args=[budget.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['projection']['method'], 'actual')
+    
+    def test_forecast_alert_before_first_threshold(self):
+        """Test upozornění na odhadované překročení dřív, než útrata dosáhne 80 %"""
+        from io import StringIO
+        from django.core.management import call_command
+        from budgets.services import BudgetAlertService
+        from notifications.models import Notification
+        Transaction.objects.create(
+            amount=900, type='EXPENSE', category=self.food, date=self.budget.start_date - timedelta(days=2), user=self.user
+        )
+        Transaction.objects.create(amount=600, type='EXPENSE', category=self.food, date=date.today(), user=self.user)
+        alerts = Notification.objects.filter(related_budget=self.budget)
+        # Zápis transakce odhad nepočítá
+        self.assertFalse(alerts.exists())
+        
+        # Odhad pro všechny rozpočty jedním dotazem (počet dotazů nezávisí na počtu rozpočtů)
+        self._budget('Vše', amount=1200)
+        with self.assertNumQueries(4):
+            created = BudgetAlertService.check_budget_alerts(self.user)
+        self.assertEqual([(n.type, n.threshold) for n in created], [('BUDGET_FORECAST', 100)] * 2)
+        
+        # Odhad se v jednom období neopakuje (ani ze sweepu)
+        call_command('sweep_budget_alerts', '--workers', '1', stdout=StringIO())
+        self.assertEqual(list(alerts.values_list('type', 'threshold')), [('BUDGET_FORECAST', 100)])
+    
+    def test_write_cost_independent_of_unrelated_budgets(self):
+        """Test že počet dotazů při zápisu výdaje nezávisí na počtu ostatních rozpočtů"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        def create_expense():
+            with CaptureQueriesContext(connection) as queries:
+                Transaction.objects.create(amount=10, type='EXPENSE', category=self.food, date=date.today(), user=self.user)
+            return len(queries)
+        
+        few = create_expense()
+        for index in range(10):
+            self._budget(f'Doprava {index}', self.transport)
+        self.assertEqual(create_expense(), few)
 
 
 class BudgetCategoryTests(TestCase):
@@ -4,8 +4,11 @@ views.py - ViewSety pro aplikaci Budgets
 @author Tomáš Holes
 @description Obsahuje logiku pro:
     - Správu rozpočtů (CRUD, aktivní/neaktivní)
-    - Kategorie rozpočtů (BudgetCategory)
+    - Kategorie rozpočtů (BudgetCategory) a čerpání alokací v detailu a přehledu
     - Přehledy (overview) a výpočty čerpání rozpočtu
+    - Historie čerpání za posledních N období (history)
+    - Průběh čerpání a odhad konce období (burndown)
+    - Simulace kandidátních limitů nad historií výdajů (simulate)
     - Budget Alerts (kontrola překročení, notifikace)
 
 @note Spolupracuje s BudgetAlertService pro výpočty a notifikace
@@ -15,10 +18,51 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Sum, Q
-from datetime import datetime, timedelta
+from datetime import date as dt_date, datetime, timedelta
 from .models import Budget, BudgetCategory
-from .serializers import BudgetSerializer, BudgetCategorySerializer
+from .serializers import BudgetSerializer, BudgetCategorySerializer, BudgetSimulationSerializer
 from .services import BudgetAlertService
+from . import forecast
+from .simulation import evaluate_limits, monthly_expenses
+
+# Počet období v historii čerpání (výchozí a maximální)
+HISTORY_PERIODS = 12
+HISTORY_MAX_PERIODS = 36
+
+
+def _period_starts(today, count, yearly):
+    """Začátky posledních count měsíců (nebo let) od nejstaršího, včetně aktuálního."""
+    if yearly:
+        return [dt_date(today.year - offset, 1, 1) for offset in range(count - 1, -1, -1)]
+    months = today.year * 12 + today.month - 1
+    return [
+        dt_date((months - offset) // 12, (months - offset) % 12 + 1, 1)
+        for offset in range(count - 1, -1, -1)
+    ]
+
+
+def _allocation_breakdown(budget_ids):
+    """
+    Alokace rozpočtů s čerpáním - dva dotazy bez ohledu na počet rozpočtů a alokací.
+    
+    Returns:
+        dict: {id rozpočtu: [{'id', 'category', 'category_name', 'allocated', 'spent', 'remaining'}]}
+    """
+    allocations = BudgetCategory.objects.filter(budget_id__in=budget_ids)
+    spent_by_allocation = allocations.spent_by_allocation()
+    breakdown = {}
+    for allocation in allocations.select_related('category').order_by('category__name', 'id'):
+        spent = spent_by_allocation.get(allocation.id, 0)
+        breakdown.setdefault(allocation.budget_id, []).append({
+            'id': allocation.id,
+            'category': allocation.category_id,
+            'category_name': allocation.category.name,
+            'allocated': float(allocation.allocated_amount),
+            'spent': float(spent),
+            'remaining': float(allocation.allocated_amount - spent),
+        })
+    return breakdown
+
 
 class BudgetCategoryViewSet(viewsets.ModelViewSet):
     """
@@ -28,10 +72,7 @@ class BudgetCategoryViewSet(viewsets.ModelViewSet):
     serializer_class = BudgetCategorySerializer
 
     def get_queryset(self):
-        return BudgetCategory.objects.filter(user=self.request.user)
-
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        return BudgetCategory.objects.filter(budget__user=self.request.user).select_related('category')
 
 
 class BudgetViewSet(viewsets.ModelViewSet):
@@ -46,27 +87,40 @@ class BudgetViewSet(viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
 
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        queryset = Budget.objects.filter(user=self.request.user)
+        if self.action == 'status':
+            # Utracená částka se načte spolu s rozpočtem
+            queryset = queryset.select_related('category').with_spent()
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """Detail rozpočtu včetně čerpání jednotlivých alokací (allocations)"""
+        budget = self.get_object()
+        data = self.get_serializer(budget).data
+        data['allocations'] = _allocation_breakdown([budget.id]).get(budget.id, [])
+        return Response(data)
+
     @action(detail=False, methods=['get'])
     def overview(self, request):
         """Přehled rozpočtů a jejich využití"""
         user = request.user
         
-        # Získání všech aktivních rozpočtů uživatele
-        budgets = Budget.objects.filter(user=user, is_active=True)
+        # Všechny aktivní rozpočty s utracenou částkou od začátku aktuálního měsíce - jeden dotaz
+        current_month = datetime.now().date().replace(day=1)
+        budgets = Budget.objects.filter(user=user, is_active=True).select_related('category').with_spent(current_month)
         
         budget_data = []
         total_budget = 0
         total_spent = 0
         
+        budgets = list(budgets)
+        allocations = _allocation_breakdown([budget.id for budget in budgets])
+        
         for budget in budgets:
-            # Výpočet utracené částky za aktuální měsíc
-            current_month = datetime.now().replace(day=1)
-            spent_amount = budget.get_spent_amount(current_month)
+            spent_amount = budget.spent_amount
             
             budget_info = {
                 'id': budget.id,
@@ -81,7 +135,8 @@ class BudgetViewSet(viewsets.ModelViewSet):
                 'period': budget.period,
                 'start_date': budget.start_date.isoformat() if budget.start_date else None,
                 'end_date': budget.end_date.isoformat() if budget.end_date else None,
-                'is_active': budget.is_active
+                'is_active': budget.is_active,
+                'allocations': allocations.get(budget.id, [])
             }
             
             budget_data.append(budget_info)
@@ -96,11 +151,65 @@ class BudgetViewSet(viewsets.ModelViewSet):
             'overall_percentage': (total_spent / total_budget * 100) if total_budget > 0 else 0
         })
     
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        """
+        Čerpání rozpočtů za posledních N období (matice rozpočty × období).
+        
+        Parametry:
+        - periods: počet období (výchozí 12, max. 36)
+        
+        Roční rozpočty mají jako období roky, ostatní měsíce. Data jsou po
+        sloupcích - spent[i][j] je čerpání rozpočtu id[i] v období periods[j].
+        Výdaje všech rozpočtů se načtou jedním seskupeným dotazem.
+        """
+        try:
+            count = min(max(int(request.query_params.get('periods', HISTORY_PERIODS)), 1), HISTORY_MAX_PERIODS)
+        except ValueError:
+            return Response({'error': 'Neplatný parametr periods'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        today = datetime.now().date()
+        matrices = {}
+        for key, yearly in (('monthly', False), ('yearly', True)):
+            starts = _period_starts(today, count, yearly)
+            matrices[key] = {
+                'periods': [start.isoformat()[:4 if yearly else 7] for start in starts],
+                'columns': {start: index for index, start in enumerate(starts)},
+                'id': [], 'name': [], 'limit': [], 'spent': [], 'percent': []
+            }
+        
+        budgets = self.get_queryset().order_by('name', 'id')
+        rows = {}
+        for budget in budgets.values('id', 'name', 'amount', 'period'):
+            matrix = matrices['yearly' if budget['period'] == 'YEARLY' else 'monthly']
+            matrix['id'].append(budget['id'])
+            matrix['name'].append(budget['name'])
+            matrix['limit'].append(float(budget['amount']))
+            matrix['spent'].append([0.0] * count)
+            rows[budget['id']] = (matrix, len(matrix['id']) - 1)
+        
+        month_since = dt_date.fromisoformat(matrices['monthly']['periods'][0] + '-01')
+        year_since = dt_date(int(matrices['yearly']['periods'][0]), 1, 1)
+        for row in budgets.spent_by_period(month_since, year_since):
+            matrix, index = rows[row['id']]
+            column = matrix['columns'].get(row['bucket'])
+            if column is not None:
+                matrix['spent'][index][column] = float(row['spent'])
+        
+        for matrix in matrices.values():
+            del matrix['columns']
+            matrix['percent'] = [
+                [round(spent / limit * 100, 1) if limit > 0 else 0 for spent in row]
+                for limit, row in zip(matrix['limit'], matrix['spent'])
+            ]
+        
+        return Response({'count': count, **matrices})
+    
     @action(detail=True, methods=['get'])
     def status(self, request, pk=None):
         """Získá detailní status rozpočtu včetně alert informací"""
         budget = self.get_object()
-        status_data = BudgetAlertService.get_budget_status(budget)
+        status_data = BudgetAlertService.get_budget_status(budget, budget.spent_amount)
         
         return Response({
             'budget_id': budget.id,
@@ -110,15 +219,63 @@ class BudgetViewSet(viewsets.ModelViewSet):
             **status_data
         })
     
+    @action(detail=True, methods=['get'])
+    def burndown(self, request, pk=None):
+        """
+        Čerpání rozpočtu po dnech proti ideálnímu lineárnímu průběhu
+        a odhad útraty na konci období s pásmem nejistoty.
+        """
+        budget = self.get_object()
+        return Response({
+            'budget_id': budget.id,
+            'name': budget.name,
+            'amount': float(budget.amount),
+            'start_date': budget.start_date.isoformat(),
+            'end_date': budget.end_date.isoformat(),
+            **forecast.burndown(budget)
+        })
+    
+    @action(detail=False, methods=['post'])
+    def simulate(self, request):
+        """
+        Kolikrát by hypotetické rozpočty byly překročeny za posledních N měsíců.
+        
+        Vstup: {"months": 12, "budgets": [{"category": 5, "limits": [5000, 6000]}, ...]}
+        Pro každý rozpočet vrací měsíční útraty a pro každý limit počet
+        překročených měsíců, průměrné přečerpání a průměrnou rezervu.
+        Historie se načte jedním dotazem seskupeným podle měsíce a kategorie.
+        """
+        serializer = BudgetSimulationSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        
+        starts, by_category, totals = monthly_expenses(request.user, serializer.validated_data['months'])
+        results = []
+        for budget in serializer.validated_data['budgets']:
+            category = budget['category']
+            spent = totals if category is None else by_category.get(category.id, [0.0] * len(starts))
+            limits = [float(limit) for limit in budget['limits']]
+            results.append({
+                'category': category.id if category else None,
+                'category_name': category.name if category else None,
+                'spent': [round(value, 2) for value in spent],
+                'limits': limits,
+                **evaluate_limits(spent, limits)
+            })
+        
+        return Response({
+            'months': [start.isoformat()[:7] for start in starts],
+            'results': results
+        })
+    
     @action(detail=False, methods=['get'])
     def alerts(self, request):
         """Vrací všechny rozpočty s jejich alert statusy"""
         user = request.user
-        budgets = Budget.objects.filter(user=user, is_active=True)
+        budgets = Budget.objects.filter(user=user, is_active=True).select_related('category').with_spent()
         
         alerts = []
         for budget in budgets:
-            status_data = BudgetAlertService.get_budget_status(budget)
+            status_data = BudgetAlertService.get_budget_status(budget, budget.spent_amount)
             
             # Přidej pouze rozpočty, které mají warning nebo horší
             if status_data['status'] in ['warning', 'danger', 'exceeded']:
@@ -147,7 +304,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
                 {
                     'title': n.title,
                     'message': n.message,
-                    'priority': n.priority
+                    'type': n.type
                 } for n in notifications
             ]
         })
@@ -0,0 +1,178 @@
+"""
+media.py - Servírování nahraných souborů (MEDIA_ROOT)
+
+@author Tomáš Holes
+@description Obsahuje:
+    - is_immutable(): soubor s hashem obsahu v názvu (varianty avatarů)
+    - parse_range(): rozbor hlavičky Range (jeden rozsah bajtů)
+    - serve_media(): view pro veřejné soubory (avatary), přenos podle MEDIA_SERVE_MODE
+
+@note Režimy MEDIA_SERVE_MODE:
+      - 'x-accel': odpověď s X-Accel-Redirect, soubor posílá nginx (interní location)
+      - 'x-sendfile': odpověď s X-Sendfile (Apache mod_xsendfile, lighttpd)
+      - 'python': soubor posílá Django - s ETag, Last-Modified (304) a Range (206)
+      Soubory s hashem obsahu v názvu se nikdy nemění (nový obsah = nový
+      název), proto dostanou Cache-Control s platností jeden rok a immutable.
+      View nekontroluje přihlášení ani vlastníka - obrázky v <img> se načítají
+      bez JWT. Proto vydává jen soubory pod PUBLIC_MEDIA_PREFIXES, ostatní
+      obsah MEDIA_ROOT vrací 404.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+
+# Varianty avatarů: avatars/<user_id>/<hash>_<velikost>.<přípona>
+IMMUTABLE_PATTERN = re.compile(r'^avatars/\d+/[0-9a-f]{16}_\d+\.(webp|jpg)$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=300, must-revalidate'
+
+MEDIA_SERVE_MODES = ('python', 'x-accel', 'x-sendfile')
+
+# Adresáře v MEDIA_ROOT, jejichž soubory jsou veřejné (bez kontroly oprávnění)
+PUBLIC_MEDIA_PREFIXES = ('avatars/',)
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def is_immutable(path):
+    return bool(IMMUTABLE_PATTERN.match(path))
+
+
+def parse_range(header, size):
+    """
+    Rozebere hlavičku Range s jedním rozsahem.
+
+    Returns:
+        tuple | None | False: (start, end) včetně; None = hlavičku ignorovat
+        (chybí, více rozsahů, neznámá jednotka); False = rozsah mimo soubor (416)
+    """
+    match = RANGE_PATTERN.match((header or '').strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-N: posledních N bajtů
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _resolve(path):
+    """Absolutní cesta k veřejnému souboru v MEDIA_ROOT (bez možnosti opustit adresář)."""
+    # Prefix se kontroluje až po normalizaci (avatars/../soubor vede mimo veřejný adresář)
+    if not posixpath.normpath(path).startswith(PUBLIC_MEDIA_PREFIXES):
+        raise Http404('Soubor neexistuje.')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Soubor neexistuje.')
+    if not os.path.isfile(full_path):
+        raise Http404('Soubor neexistuje.')
+    return full_path
+
+
+def _etag(stat):
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def _not_modified(request, etag, mtime):
+    """Podmíněný GET - If-None-Match má přednost před If-Modified-Since (RFC 9110)."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _read_range(full_path, start, end):
+    with open(full_path, 'rb') as handle:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _serve_python(request, full_path):
+    stat = os.stat(full_path)
+    etag = _etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        for name, value in headers.items():
+            response[name] = value
+        return response
+
+    byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    # If-Range: rozsah platí jen pro stejnou verzi souboru, jinak celý soubor
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range != etag and if_range != headers['Last-Modified']:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range:
+        start, end = byte_range
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        response = StreamingHttpResponse(_read_range(full_path, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(full_path, 'rb'))
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def serve_media(request, path):
+    """
+    Vrátí veřejný soubor z MEDIA_ROOT (viz PUBLIC_MEDIA_PREFIXES).
+
+    Django zkontroluje jen cestu (veřejný adresář, soubor existuje, nevede mimo
+    MEDIA_ROOT) a nastaví Cache-Control; oprávnění uživatele se neověřují.
+    Samotný přenos podle MEDIA_SERVE_MODE provede webový server, nebo Django
+    s podporou podmíněných a částečných požadavků.
+    """
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'python')
+    if mode not in MEDIA_SERVE_MODES:
+        raise ImproperlyConfigured(f'MEDIA_SERVE_MODE musí být jedno z {MEDIA_SERVE_MODES}.')
+    full_path = _resolve(path)
+
+    if mode == 'x-accel':
+        # nginx si sám nastaví Content-Type, ETag, Last-Modified a vyřídí Range i 304
+        response = HttpResponse()
+        del response['Content-Type']
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/'))
+    elif mode == 'x-sendfile':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['X-Sendfile'] = full_path
+    else:
+        response = _serve_python(request, full_path)
+
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if is_immutable(path) else DEFAULT_CACHE_CONTROL
+    return response
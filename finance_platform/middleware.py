@@ -0,0 +1,38 @@
+"""
+middleware.py - Middleware projektu Plutoa
+
+@author Tomáš Holes
+@description Obsahuje:
+    - ApiSessionMiddleware: SessionMiddleware, který pro požadavky s hlavičkou
+      Authorization (Bearer/Token) session vůbec nenačítá
+
+@note API klient (React frontend) se autentizuje JWT v hlavičce a session
+      nepotřebuje. Takový požadavek dostane prázdnou session bez klíče - její
+      čtení nejde do cache ani do databáze a odpověď nenastavuje session cookie.
+      Admin a browsable API (cookie bez hlavičky Authorization) fungují beze změny.
+"""
+from django.contrib.sessions.middleware import SessionMiddleware
+
+# Schémata hlavičky Authorization, u kterých se session přeskočí
+HEADER_AUTH_PREFIXES = ('Bearer ', 'Token ')
+
+
+def uses_header_auth(request):
+    return request.headers.get('Authorization', '').startswith(HEADER_AUTH_PREFIXES)
+
+
+class ApiSessionMiddleware(SessionMiddleware):
+    """SessionMiddleware s rychlou cestou pro požadavky autentizované hlavičkou."""
+
+    def process_request(self, request):
+        if uses_header_auth(request):
+            # Prázdná session bez klíče - AuthenticationMiddleware z ní přečte anonymního uživatele
+            request.session = self.SessionStore(None)
+            request.skip_session = True
+            return
+        super().process_request(request)
+
+    def process_response(self, request, response):
+        if getattr(request, 'skip_session', False):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,46 @@
+"""
+sessions.py - Session engine s cache a zápisem do databáze
+
+@author Tomáš Holes
+@description Obsahuje:
+    - SessionStore: cached_db session, jejíž záznam v cache žije nejvýše SESSION_CACHE_TTL sekund
+
+@note Čtení session jde z cache (bez dotazu na django_session), každý zápis se
+      propíše do databáze i do cache (write-through). Výchozí cache je lokální
+      v procesu - odhlášení v jednom workeru by ostatní workery bez omezení
+      platnosti viděly až po vypršení session. Proto se doba v cache omezuje
+      na SESSION_CACHE_TTL; se sdílenou cache (Redis) lze hodnotu zvýšit.
+"""
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+# Výchozí maximální doba session v cache (sekundy)
+SESSION_CACHE_TTL = 60
+
+
+class SessionStore(CachedDBStore):
+    """cached_db SessionStore s omezenou dobou záznamu v cache."""
+
+    def _cache_timeout(self, expiry_age):
+        return min(expiry_age, getattr(settings, 'SESSION_CACHE_TTL', SESSION_CACHE_TTL))
+
+    def load(self):
+        try:
+            data = self._cache.get(self.cache_key)
+        except Exception:
+            data = None
+        if data is None:
+            session = self._get_session_from_db()
+            if session:
+                data = self.decode(session.session_data)
+                self._cache.set(
+                    self.cache_key, data, self._cache_timeout(self.get_expiry_age(expiry=session.expire_date))
+                )
+            else:
+                data = {}
+        return data
+
+    def save(self, must_create=False):
+        # DBStore.save zapíše do databáze, cache se nastaví až potom
+        super(CachedDBStore, self).save(must_create)
+        self._cache.set(self.cache_key, self._session, self._cache_timeout(self.get_expiry_age()))
@@ -16,6 +16,8 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/topics/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -64,6 +66,7 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',  # Rotované refresh tokeny (BLACKLIST_AFTER_ROTATION)
     'corsheaders',
     
     # Local apps
@@ -77,7 +80,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Session se nenačítá pro požadavky s hlavičkou Authorization - viz finance_platform/middleware.py
+    'finance_platform.middleware.ApiSessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # Add CORS middleware
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,6 +92,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'finance_platform.urls'
 
+# Cache (lokální v procesu; pro více workerů lze nahradit sdílenou cache, např. Redis)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'plutoa-default',
+    }
+}
+
+# Session - čtení z cache, zápis do cache i databáze (write-through)
+# Expirované session maže `python manage.py clear_expired_sessions` (po dávkách)
+SESSION_ENGINE = 'finance_platform.sessions'
+SESSION_CACHE_TTL = 60  # Max. doba session v cache lokální v procesu (sekundy)
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -166,19 +183,29 @@ AUTH_USER_MODEL = 'accounts.User'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Avatary - výchozí velikosti variant a limity jsou v accounts/avatars.py
+# (AVATAR_SIZES, AVATAR_DEFAULT_SIZE, AVATAR_MAX_UPLOAD_SIZE lze zde přepsat)
+
+# Servírování media - 'python' (Django, Range/ETag/304), 'x-accel' (nginx), 'x-sendfile'
+# V produkci nginx posílá soubory z interní location MEDIA_ACCEL_PREFIX - viz frontend/nginx.conf
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'python')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication',  # Kept for backward compatibility
+        # Uživatel se načítá z krátkodobé cache v procesu - viz accounts/authentication.py
+        'accounts.authentication.CachedJWTAuthentication',
+        'accounts.authentication.CachedTokenAuthentication',  # Kept for backward compatibility
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        # Počítadla sdílená všemi workery (klouzavé okno v SQLite) - viz finance_platform/throttling.py
+        'finance_platform.throttling.SharedAnonRateThrottle',
+        'finance_platform.throttling.SharedUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',  # Anonymous users: 100 requests per hour
@@ -187,6 +214,19 @@ REST_FRAMEWORK = {
     }
 }
 
+# Soubor s počítadly throttlingu - musí být společný pro všechny workery serveru
+THROTTLE_STORE_PATH = os.environ.get(
+    'THROTTLE_STORE_PATH', os.path.join(tempfile.gettempdir(), 'plutoa-throttle.sqlite3')
+)
+
+# Testy používají throttling v paměti, počítadla se tak mezi běhy nepřenášejí
+# (jiný runner než manage.py test: THROTTLE_STORE_PATH=':memory:' v prostředí)
+TEST_RUNNER = 'finance_platform.test_runner.TestRunner'
+
+# Cache uživatelů pro autentizaci API (sekundy, max. počet uživatelů v procesu)
+USER_CACHE_TTL = 30
+USER_CACHE_SIZE = 1024
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 CORS_ALLOW_CREDENTIALS = True
@@ -218,6 +258,11 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For developm
 # EMAIL_HOST_USER = 'your-email@example.com'
 # EMAIL_HOST_PASSWORD = 'your-email-password'
 
+# Fronta odchozích emailů - odesílá `python manage.py send_queued_emails --loop`
+EMAIL_OUTBOX_BATCH_SIZE = 50  # Emailů na jedno SMTP spojení
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # První odstup v sekundách, dále se zdvojnásobuje
+
 # Site URL for verification links
 SITE_URL = 'http://localhost:3000'  # Frontend URL
 
@@ -236,6 +281,11 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
 }
 
+# Bloom filtr zneplatněných refresh tokenů (accounts/tokens.py) - intervaly v sekundách
+JWT_BLOOM_REBUILD_INTERVAL = 300  # Úplné přestavění filtru
+JWT_BLOOM_SYNC_INTERVAL = 2       # Dotažení tokenů zneplatněných jinými procesy
+JWT_BLOOM_ERROR_RATE = 0.001
+
 # Password validation - Enhanced security
 AUTH_PASSWORD_VALIDATORS = [
     {
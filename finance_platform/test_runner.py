@@ -0,0 +1,25 @@
+"""
+test_runner.py - Spouštění testů projektu
+
+@author Tomáš Holes
+@description Obsahuje:
+    - TestRunner: DiscoverRunner s počítadly throttlingu v paměti
+
+@note Výchozí THROTTLE_STORE_PATH je soubor sdílený workery serveru - testy
+      by v něm sčítaly požadavky napříč běhy a narážely na limity.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """DiscoverRunner, který pro běh testů přepne throttling do paměti."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._throttle_override = override_settings(THROTTLE_STORE_PATH=':memory:')
+        self._throttle_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._throttle_override.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,154 @@
+"""
+throttling.py - Omezení počtu požadavků sdílené mezi workery
+
+@author Tomáš Holes
+@description Obsahuje:
+    - SlidingWindowStore: počítadla v souboru SQLite sdíleném všemi procesy serveru
+    - get_throttle_store(): úložiště podle THROTTLE_STORE_PATH
+    - SlidingWindowThrottleMixin: allow_request() nad klouzavým oknem místo historie časů
+    - SharedAnonRateThrottle / SharedUserRateThrottle: náhrada throttlů DRF
+
+@note Klouzavé okno s pevnou velikostí: pro každý klíč se drží jen číslo okna,
+      počet požadavků v aktuálním a v předchozím okně. Odhad počtu požadavků za
+      poslední dobu okna je previous * (podíl předchozího okna, který ještě leží
+      v klouzavém okně) + current. Kontrola je jedna transakce nad jedním řádkem -
+      O(1) v paměti i čase bez ohledu na limit (DRF drží seznam všech časů).
+      Zápis probíhá v BEGIN IMMEDIATE, takže souběžné workery se nepřepíší.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+# Jak často (počet kontrol v procesu) mazat řádky s dávno uplynulým oknem
+PRUNE_EVERY = 1000
+BUSY_TIMEOUT = 5.0
+
+
+class SlidingWindowStore:
+    """Počítadla klouzavého okna v SQLite (soubor sdílený procesy na jednom serveru)."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+        self._hits = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # isolation_level=None - transakce řídíme sami (BEGIN IMMEDIATE)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_counter ('
+                'key TEXT PRIMARY KEY, window_index INTEGER NOT NULL, current_count INTEGER NOT NULL, '
+                'previous_count INTEGER NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, limit, duration, now=None):
+        """
+        Zaznamená požadavek, pokud nepřekročí limit za posledních duration sekund.
+
+        Returns:
+            tuple: (povoleno, počet sekund do dalšího povoleného požadavku)
+        """
+        now = time.time() if now is None else now
+        window = int(now // duration)
+        elapsed = (now % duration) / duration
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT window_index, current_count, previous_count FROM throttle_counter WHERE key = ?', (key,)
+            ).fetchone()
+            current = previous = 0
+            if row:
+                stored_window, stored_current, stored_previous = row
+                if stored_window == window:
+                    current, previous = stored_current, stored_previous
+                elif stored_window == window - 1:
+                    previous = stored_current
+
+            estimate = previous * (1 - elapsed) + current
+            allowed = estimate + 1 <= limit
+            if allowed:
+                current += 1
+                connection.execute(
+                    'INSERT INTO throttle_counter (key, window_index, current_count, previous_count, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET '
+                    'window_index = excluded.window_index, current_count = excluded.current_count, '
+                    'previous_count = excluded.previous_count, expires_at = excluded.expires_at',
+                    (key, window, current, previous, (window + 2) * duration)
+                )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        self._hits += 1
+        if self._hits % PRUNE_EVERY == 0:
+            self.prune(now)
+        return allowed, 0.0 if allowed else self._wait(limit, duration, current, previous, elapsed)
+
+    @staticmethod
+    def _wait(limit, duration, current, previous, elapsed):
+        """Doba, za kterou odhad klesne pod limit (jen odtékáním předchozího okna)."""
+        if current + 1 > limit or not previous:
+            # Stačit může až začátek dalšího okna (pak se current stane previous)
+            return (1 - elapsed) * duration
+        # previous * (1 - elapsed - t/duration) + current + 1 <= limit
+        needed = 1 - elapsed - (limit - current - 1) / previous
+        return max(needed, 0) * duration
+
+    def prune(self, now=None):
+        """Smaže počítadla, jejichž okna už nemají na odhad vliv."""
+        now = time.time() if now is None else now
+        self._connection().execute('DELETE FROM throttle_counter WHERE expires_at < ?', (now,))
+
+    def reset(self):
+        self._connection().execute('DELETE FROM throttle_counter')
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_throttle_store():
+    path = str(settings.THROTTLE_STORE_PATH)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SlidingWindowStore(path)
+        return _stores[path]
+
+
+class SlidingWindowThrottleMixin:
+    """
+    allow_request() pro SimpleRateThrottle nad sdíleným úložištěm.
+    Klíč (get_cache_key), rate a scope zůstávají stejné jako u DRF.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_throttle_store().hit(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return math.ceil(self._wait) if self._wait else None
+
+
+class SharedAnonRateThrottle(SlidingWindowThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SlidingWindowThrottleMixin, UserRateThrottle):
+    pass
@@ -75,6 +75,7 @@ const Notifications: React.FC = () => {
     switch (type) {
       case 'BUDGET_EXCEEDED':
       case 'BUDGET_WARNING':
+      case 'BUDGET_FORECAST':
         return <Target {...props} />;
       case 'GOAL_ACHIEVED':
       case 'GOAL_PROGRESS':
@@ -93,6 +94,7 @@ const Notifications: React.FC = () => {
       case 'BUDGET_EXCEEDED':
         return '#EF4444';
       case 'BUDGET_WARNING':
+      case 'BUDGET_FORECAST':
         return '#F59E0B';
       case 'GOAL_ACHIEVED':
         return '#10B981';
@@ -0,0 +1,115 @@
+"""
+mail.py - Fronta odchozích emailů
+
+@author Tomáš Holes
+@description Obsahuje:
+    - queue_email(): zařazení emailu do fronty (volá se z požadavku, bez SMTP)
+    - send_queued_emails(): odeslání jedné dávky přes jedno SMTP spojení
+    - retry_delay(): odstup dalšího pokusu (exponenciální, s horní mezí)
+
+@note Dávka se "zamkne" posunutím next_attempt_at o EMAIL_OUTBOX_LEASE sekund.
+      Souběžný worker ji tak nevybere a pokud worker během odesílání spadne,
+      emaily se po uplynutí lhůty odešlou znovu. Na PostgreSQL výběr dávky
+      navíc používá SELECT ... FOR UPDATE SKIP LOCKED.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+# Výchozí velikost dávky, počet pokusů a odstupy (sekundy)
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 60
+RETRY_MAX_DELAY = 6 * 60 * 60
+LEASE = 300
+
+
+def queue_email(to_email, subject, body, user=None):
+    """Zařadí email do fronty - odešle ho až příkaz send_queued_emails."""
+    return OutboundEmail.objects.create(
+        user=user,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        next_attempt_at=timezone.now()
+    )
+
+
+def retry_delay(attempts):
+    """Odstup po attempts neúspěšných pokusech: 1, 2, 4, ... minut (max. 6 hodin)."""
+    base = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', RETRY_BASE_DELAY)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), RETRY_MAX_DELAY))
+
+
+def _claim_batch(batch_size):
+    """Vybere splatné emaily a posune jim next_attempt_at o lhůtu zpracování."""
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE', LEASE))
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(next_attempt_at=now + lease)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def _record_failure(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)[:1000]
+    if email.attempts >= max_attempts:
+        email.status = 'FAILED'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_queued_emails(batch_size=None, max_attempts=None):
+    """
+    Odešle jednu dávku splatných emailů přes jedno spojení s EMAIL_BACKEND.
+
+    Returns:
+        tuple: (počet odeslaných, počet neúspěšných pokusů)
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', BATCH_SIZE)
+    max_attempts = max_attempts or getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', MAX_ATTEMPTS)
+    emails = _claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        # Spojení se nepodařilo - pokus se počítá celé dávce
+        for email in emails:
+            _record_failure(email, error, max_attempts)
+        failed = len(emails)
+    else:
+        try:
+            for email in emails:
+                try:
+                    EmailMessage(email.subject, email.body, to=[email.to_email], connection=connection).send()
+                except Exception as error:
+                    _record_failure(email, error, max_attempts)
+                    failed += 1
+                else:
+                    email.status = 'SENT'
+                    email.attempts += 1
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent, failed
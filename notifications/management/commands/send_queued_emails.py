@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.mail import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Odešle emaily z fronty OutboundEmail po dávkách (s --loop běží jako worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Počet emailů odeslaných přes jedno spojení')
+        parser.add_argument('--max-attempts', type=int, default=None, help='Počet pokusů, po kterých je email FAILED')
+        parser.add_argument('--loop', action='store_true', help='Běžet trvale a frontu kontrolovat každých --interval sekund')
+        parser.add_argument('--interval', type=float, default=5, help='Prodleva mezi kontrolami prázdné fronty (s --loop)')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_emails(options['batch_size'], options['max_attempts'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'Odesláno {sent}, neúspěšně {failed}')
+                continue
+            # Fronta je prázdná (nebo zbývají jen emaily čekající na další pokus)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Hotovo: odesláno {total_sent}, neúspěšných pokusů {total_failed}'))
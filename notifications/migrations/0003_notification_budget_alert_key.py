@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0003_budget_spent_total'),
+        ('goals', '0002_alter_financialgoal_icon'),
+        ('notifications', '0002_outboundemail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='period_start',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='threshold',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('related_budget__isnull', False), ('threshold__isnull', False)), fields=('related_budget', 'threshold', 'period_start'), name='notification_budget_alert_unique'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budgets', '0003_budget_spent_total'),
+        ('goals', '0002_alter_financialgoal_icon'),
+        ('notifications', '0003_notification_budget_alert_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='notification',
+            name='notification_budget_alert_unique',
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='type',
+            field=models.CharField(choices=[('BUDGET_EXCEEDED', 'Překročení rozpočtu'), ('BUDGET_WARNING', 'Varování o rozpočtu'), ('BUDGET_FORECAST', 'Odhad překročení rozpočtu'), ('RECURRING_DUE', 'Pravidelná platba'), ('GOAL_ACHIEVED', 'Dosažení cíle'), ('GOAL_PROGRESS', 'Pokrok v cíli'), ('MONTHLY_SUMMARY', 'Měsíční souhrn')], max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('related_budget__isnull', False), ('threshold__isnull', False)), fields=('related_budget', 'threshold', 'period_start', 'type'), name='notification_budget_alert_unique'),
+        ),
+    ]
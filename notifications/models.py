@@ -4,10 +4,16 @@ models.py - Model pro systém notifikací aplikace Plutoa
 @author Tomáš Holes
 @description Obsahuje:
     - Notification: Notifikace pro uživatele (rozpočty, cíle, pravidelné platby)
+    - OutboundEmail: Fronta odchozích emailů (odesílá příkaz send_queued_emails)
+
+@note Upozornění na rozpočet nesou strukturovaný klíč (related_budget, threshold,
+      period_start, type) s unikátním indexem - stejné upozornění v jednom období
+      vznikne jen jednou (INSERT ... ON CONFLICT DO NOTHING).
 
 @types
     - BUDGET_EXCEEDED: Překročení rozpočtu
     - BUDGET_WARNING: Varování o blížícím se limitu
+    - BUDGET_FORECAST: Odhad překročení rozpočtu do konce období
     - RECURRING_DUE: Blížící se pravidelná platba
     - GOAL_ACHIEVED: Dosažení finančního cíle
     - GOAL_PROGRESS: Pokrok v cíli
@@ -23,6 +29,7 @@ class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('BUDGET_EXCEEDED', 'Překročení rozpočtu'),
         ('BUDGET_WARNING', 'Varování o rozpočtu'),
+        ('BUDGET_FORECAST', 'Odhad překročení rozpočtu'),
         ('RECURRING_DUE', 'Pravidelná platba'),
         ('GOAL_ACHIEVED', 'Dosažení cíle'),
         ('GOAL_PROGRESS', 'Pokrok v cíli'),
@@ -51,9 +58,61 @@ class Notification(models.Model):
         null=True,
         blank=True
     )
+    # Klíč upozornění na rozpočet: práh v procentech a začátek období rozpočtu
+    threshold = models.PositiveSmallIntegerField(null=True, blank=True)
+    period_start = models.DateField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['related_budget', 'threshold', 'period_start', 'type'],
+                condition=models.Q(related_budget__isnull=False, threshold__isnull=False),
+                name='notification_budget_alert_unique'
+            ),
+        ]
         
     def __str__(self):
         return f"{self.user.username} - {self.title}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email čekající na odeslání.
+
+    Požadavek email jen zapíše do fronty, odesílá ho příkaz send_queued_emails
+    po dávkách přes jedno SMTP spojení. Neúspěšné pokusy se opakují s rostoucím
+    odstupem (next_attempt_at), po MAX_ATTEMPTS pokusech je email FAILED.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Čeká na odeslání'),
+        ('SENT', 'Odesláno'),
+        ('FAILED', 'Selhalo'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbound_emails'
+    )
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            # Výběr dávky: WHERE status = 'PENDING' AND next_attempt_at <= now ORDER BY next_attempt_at
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.status})"
@@ -7,8 +7,14 @@ tests.py - Unit testy pro modul notifications
     - Označení notifikace jako přečtené
     - Filtrování nepřečtených notifikací
     - Hromadné označení jako přečtené
+    - Frontu odchozích emailů (dávky, opakování s odstupem)
 """
-from django.test import TestCase
+from io import StringIO
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -16,7 +22,8 @@ from datetime import date, timedelta
 from accounts.models import User
 from budgets.models import Budget
 from goals.models import FinancialGoal
-from .models import Notification
+from .mail import queue_email, send_queued_emails
+from .models import Notification, OutboundEmail
 
 
 class NotificationModelTests(TestCase):
@@ -249,3 +256,65 @@ class NotificationAPITests(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Notification.objects.filter(pk=notification.pk).exists())
+
+
+
+class CountingEmailBackend(LocmemEmailBackend):
+    """Locmem backend, který počítá otevřená spojení."""
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class FailingEmailBackend(LocmemEmailBackend):
+    """Backend simulující nedostupný SMTP server."""
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP server nedostupný')
+
+
+class OutboundEmailTests(APITestCase):
+    """Testy fronty odchozích emailů"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='mailuser', password='TestPass123!', email='mail@example.com')
+        CountingEmailBackend.opened = 0
+    
+    def test_password_reset_queues_email(self):
+        """Test, že požadavek email jen zařadí do fronty"""
+        response = self.client.post(reverse('password-reset-request'), {'username': 'mailuser'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to_email, 'mail@example.com')
+        self.assertIn(response.data['token'], queued.body)
+    
+    @override_settings(EMAIL_BACKEND='notifications.tests.CountingEmailBackend')
+    def test_batch_sent_over_one_connection(self):
+        """Test odeslání dávky přes jedno spojení"""
+        for index in range(5):
+            queue_email(f'user{index}@example.com', 'Předmět', 'Text')
+        call_command('send_queued_emails', batch_size=10, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(OutboundEmail.objects.filter(status='SENT').count(), 5)
+    
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingEmailBackend', EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failed_send_is_retried_with_backoff(self):
+        """Test odložení dalšího pokusu a stavu FAILED po vyčerpání pokusů"""
+        email = queue_email('mail@example.com', 'Předmět', 'Text')
+        self.assertEqual(send_queued_emails(max_attempts=2), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'PENDING')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Dokud odstup neuplyne, email se znovu nezkouší
+        self.assertEqual(send_queued_emails(max_attempts=2), (0, 0))
+        
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        send_queued_emails(max_attempts=2)
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'FAILED')
+        self.assertIn('nedostupný', email.last_error)
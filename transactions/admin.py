@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Transaction
+from .models import Category, Transaction, CategoryRule
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -14,3 +14,9 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ['description']
     date_hierarchy = 'date'
     ordering = ['-date', '-created_at']
+
+@admin.register(CategoryRule)
+class CategoryRuleAdmin(admin.ModelAdmin):
+    list_display = ['keyword', 'category', 'transaction_type', 'min_amount', 'max_amount', 'priority', 'is_active', 'user']
+    list_filter = ['is_active', 'transaction_type', 'user']
+    search_fields = ['keyword', 'category__name']
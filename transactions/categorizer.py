@@ -0,0 +1,278 @@
+"""
+categorizer.py - Automatická kategorizace transakcí
+
+@author Tomáš Holes
+@description Obsahuje:
+    - TransactionCategorizer: multinomiální naivní Bayes nad tokeny popisu
+      a pásmem částky, trénovaný z již kategorizovaných transakcí uživatele
+    - get_categorizer(): cache natrénovaných modelů pro jednotlivé uživatele
+    - suggest_category(): návrh kategorie pro jednu transakci
+
+@note Model je v paměti procesu a je platný pro konkrétní verzi dat uživatele
+      (počet, max. id a max. updated_at kategorizovaných transakcí). Pokud
+      přibyly pouze nové transakce, model se dotrénuje inkrementálně,
+      jinak se přetrénuje celý.
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+
+from django.db.models import Count, Max
+
+from .models import Category, Transaction
+
+TOKEN_RE = re.compile(r'[a-z]{2,}')
+
+# Hranice pásem částek (CZK) - částka se do modelu dostává jako jeden token
+AMOUNT_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000]
+
+# Které typy kategorií připadají v úvahu pro daný typ transakce
+COMPATIBLE_CATEGORY_TYPES = {
+    'EXPENSE': ('EXPENSE', 'BOTH'),
+    'INCOME': ('INCOME', 'BOTH'),
+}
+
+
+def tokenize(description):
+    """Převede popis na tokeny - malá písmena bez diakritiky, bez čísel."""
+    if not description:
+        return []
+    normalized = unicodedata.normalize('NFKD', description.lower())
+    ascii_text = normalized.encode('ascii', 'ignore').decode('ascii')
+    return TOKEN_RE.findall(ascii_text)
+
+
+def extract_features(description, amount):
+    """Vrátí seznam příznaků transakce (tokeny popisu + pásmo částky)."""
+    features = tokenize(description)
+    if amount is not None:
+        features.append(f'__amount_{bisect_right(AMOUNT_BUCKETS, float(amount))}')
+    return features
+
+
+class TransactionCategorizer:
+    """
+    Multinomiální naivní Bayes pro návrh kategorie transakce.
+
+    Model drží pouze četnosti (počty dokumentů a příznaků v kategoriích),
+    takže jej lze dotrénovat přičtením nových transakcí. Pro predikci se
+    četnosti zkompilují do tabulek logaritmických pravděpodobností a celá
+    dávka se vyhodnotí v jednom průchodu.
+    """
+
+    # Laplaceovo vyhlazování
+    ALPHA = 1.0
+    # Minimální jistota pro automatické přiřazení kategorie
+    MIN_CONFIDENCE = 0.6
+
+    def __init__(self):
+        self.class_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.category_types = {}
+        self.version = None
+        self._tables = None
+
+    def copy(self):
+        """Vrátí nezávislou kopii modelu (pro inkrementální dotrénování)."""
+        clone = TransactionCategorizer()
+        clone.class_counts = Counter(self.class_counts)
+        clone.feature_counts = defaultdict(Counter, {
+            category_id: Counter(counts)
+            for category_id, counts in self.feature_counts.items()
+        })
+        clone.category_types = dict(self.category_types)
+        clone.version = self.version
+        return clone
+
+    def partial_fit(self, rows):
+        """
+        Přičte do modelu další trénovací data.
+
+        Args:
+            rows: iterable n-tic (category_id, category_type, description, amount)
+        """
+        for category_id, category_type, description, amount in rows:
+            self.class_counts[category_id] += 1
+            self.category_types[category_id] = category_type
+            self.feature_counts[category_id].update(extract_features(description, amount))
+        self._tables = None
+        return self
+
+    def _compile(self):
+        """Předpočítá log-pravděpodobnosti pro rychlé dávkové skórování."""
+        vocabulary = set()
+        for counts in self.feature_counts.values():
+            vocabulary.update(counts)
+        vocabulary_size = max(len(vocabulary), 1)
+        total_documents = sum(self.class_counts.values())
+
+        log_prior = {}
+        log_default = {}
+        log_likelihood = defaultdict(dict)
+        for category_id, documents in self.class_counts.items():
+            counts = self.feature_counts[category_id]
+            denominator = sum(counts.values()) + self.ALPHA * vocabulary_size
+            log_prior[category_id] = math.log(documents / total_documents)
+            log_default[category_id] = math.log(self.ALPHA / denominator)
+            for feature, count in counts.items():
+                # Ukládáme jen rozdíl proti nevidenému příznaku - matice je řídká
+                log_likelihood[feature][category_id] = (
+                    math.log((count + self.ALPHA) / denominator) - log_default[category_id]
+                )
+
+        self._tables = (log_prior, log_default, dict(log_likelihood))
+        return self._tables
+
+    def predict_many(self, items, top=1):
+        """
+        Ohodnotí dávku transakcí v jednom průchodu.
+
+        Args:
+            items: iterable n-tic (description, amount, transaction_type)
+            top: počet nejlepších kategorií vrácených pro každou položku
+
+        Returns:
+            list: pro každou položku seznam (category_id, confidence) seřazený
+                  od nejpravděpodobnější kategorie (prázdný, pokud nelze určit)
+        """
+        if not self.class_counts:
+            return [[] for _ in items]
+
+        log_prior, log_default, log_likelihood = self._tables or self._compile()
+        candidates_by_type = {
+            transaction_type: [
+                category_id for category_id, category_type in self.category_types.items()
+                if category_type in allowed_types
+            ]
+            for transaction_type, allowed_types in COMPATIBLE_CATEGORY_TYPES.items()
+        }
+
+        results = []
+        for description, amount, transaction_type in items:
+            candidates = candidates_by_type.get(transaction_type)
+            if not candidates:
+                results.append([])
+                continue
+
+            features = extract_features(description, amount)
+            scores = {
+                category_id: log_prior[category_id] + len(features) * log_default[category_id]
+                for category_id in candidates
+            }
+            for feature in features:
+                for category_id, delta in log_likelihood.get(feature, {}).items():
+                    if category_id in scores:
+                        scores[category_id] += delta
+
+            # Softmax přes kandidáty -> jistota predikce
+            best_score = max(scores.values())
+            weights = {category_id: math.exp(score - best_score) for category_id, score in scores.items()}
+            normalizer = sum(weights.values())
+            ranked = sorted(weights.items(), key=lambda item: item[1], reverse=True)[:top]
+            results.append([(category_id, weight / normalizer) for category_id, weight in ranked])
+
+        return results
+
+
+# Cache natrénovaných modelů: user_id -> TransactionCategorizer (LRU)
+CACHE_SIZE = 256
+_models = OrderedDict()
+_models_lock = threading.Lock()
+
+
+def _training_queryset(user):
+    """Transakce, ze kterých se model učí (kategorizované příjmy a výdaje)."""
+    return Transaction.objects.filter(
+        user=user,
+        category__isnull=False,
+        type__in=COMPATIBLE_CATEGORY_TYPES.keys()
+    )
+
+
+def _data_version(user):
+    """Verze trénovacích dat - změní se při přidání, úpravě i odebrání transakce."""
+    stats = _training_queryset(user).aggregate(
+        count=Count('id'),
+        max_id=Max('id'),
+        max_updated=Max('updated_at')
+    )
+    return (stats['count'], stats['max_id'], stats['max_updated'])
+
+
+def _training_rows(queryset):
+    return queryset.values_list(
+        'category_id', 'category__category_type', 'description', 'amount'
+    ).order_by().iterator(chunk_size=2000)
+
+
+def _train(user, cached, version):
+    """Dotrénuje model z cache, pokud přibyly jen nové transakce, jinak trénuje znovu."""
+    if cached is not None and cached.version[0] and version[0] > cached.version[0]:
+        cached_count, cached_max_id, cached_max_updated = cached.version
+        changed = list(
+            _training_queryset(user).filter(updated_at__gt=cached_max_updated).values_list(
+                'id', 'category_id', 'category__category_type', 'description', 'amount'
+            )
+        )
+        only_appended = (
+            cached_count + len(changed) == version[0]
+            and all(row[0] > cached_max_id for row in changed)
+        )
+        if only_appended:
+            model = cached.copy().partial_fit(row[1:] for row in changed)
+            model.version = version
+            return model
+
+    model = TransactionCategorizer().partial_fit(_training_rows(_training_queryset(user)))
+    model.version = version
+    return model
+
+
+def get_categorizer(user):
+    """Vrátí model pro uživatele - z cache, dotrénovaný, nebo nově natrénovaný."""
+    version = _data_version(user)
+
+    with _models_lock:
+        cached = _models.get(user.pk)
+        if cached is not None:
+            _models.move_to_end(user.pk)
+    if cached is not None and cached.version == version:
+        return cached
+
+    model = _train(user, cached, version)
+    with _models_lock:
+        _models[user.pk] = model
+        _models.move_to_end(user.pk)
+        while len(_models) > CACHE_SIZE:
+            _models.popitem(last=False)
+    return model
+
+
+def invalidate_categorizer(user_id=None):
+    """Zahodí model uživatele (nebo všechny modely) z cache."""
+    with _models_lock:
+        if user_id is None:
+            _models.clear()
+        else:
+            _models.pop(user_id, None)
+
+
+def suggest_category(user, description, amount, transaction_type, min_confidence=None):
+    """
+    Navrhne kategorii pro jednu transakci.
+
+    Returns:
+        Category nebo None, pokud model není dostatečně jistý
+    """
+    if transaction_type not in COMPATIBLE_CATEGORY_TYPES:
+        return None
+    if min_confidence is None:
+        min_confidence = TransactionCategorizer.MIN_CONFIDENCE
+
+    prediction = get_categorizer(user).predict_many([(description, amount, transaction_type)])[0]
+    if not prediction or prediction[0][1] < min_confidence:
+        return None
+    return Category.objects.filter(user=user, pk=prediction[0][0]).first()
@@ -0,0 +1,228 @@
+"""
+dedup.py - Vyhledání a sloučení duplicitních transakcí
+
+@author Tomáš Holes
+@description Obsahuje:
+    - description_similarity(): levné porovnání popisů (difflib)
+    - find_duplicate_groups(): skupiny pravděpodobných duplicit uživatele
+    - resolve_duplicates(): hromadné sloučení nebo smazání duplicit
+
+@note Transakce se načtou seřazené podle (typ, částka, datum) a porovnávají se
+      jen se sousedy se stejnou částkou v okně DATE_WINDOW_DAYS dní. Místo
+      porovnání každé dvojice (O(n²)) tak stačí řazení a jeden průchod.
+"""
+from collections import deque
+from difflib import SequenceMatcher
+
+from django.db import transaction as db_transaction
+from django.utils import timezone
+
+from accounts.balances import apply_deltas, transaction_deltas
+from budgets.models import Budget
+from budgets.spending import refresh_spent_totals
+
+from .models import RecurringTransactionHistory, Transaction
+from .rules import normalize_text
+
+# Maximální rozdíl dat dvou duplicit (dny)
+DATE_WINDOW_DAYS = 2
+
+# Minimální skóre dvojice (podobnost popisu × blízkost data)
+MIN_SCORE = 0.6
+
+# Penalizace za každý den rozdílu v datu
+DAY_PENALTY = 0.1
+
+
+def description_similarity(first, second):
+    """Podobnost dvou normalizovaných popisů v rozsahu 0-1."""
+    if first == second:
+        return 1.0
+    if not first or not second:
+        # Jeden popis chybí (typicky ruční zadání vs. import) - nerozhoduje
+        return 0.7
+    if first in second or second in first:
+        return 0.9
+    matcher = SequenceMatcher(None, first, second)
+    if matcher.real_quick_ratio() < MIN_SCORE or matcher.quick_ratio() < MIN_SCORE:
+        return 0.0
+    return matcher.ratio()
+
+
+def _find_pairs(rows, window_days, min_score):
+    """
+    Průchod řádky seřazenými podle (type, amount, date).
+
+    Yields:
+        (id, id, score) pro každou podezřelou dvojici
+    """
+    window = deque()
+    for row in rows:
+        pk, day, amount, transaction_type, description, account_id = row
+        key = (transaction_type, amount)
+        normalized_description = normalize_text(description)
+        # Okno drží jen řádky se stejnou částkou a typem v povoleném rozsahu dat
+        while window and (window[0][0] != key or (day - window[0][1][1]).days > window_days):
+            window.popleft()
+        for _, other, normalized in window:
+            other_account = other[5]
+            if account_id and other_account and account_id != other_account:
+                continue
+            distance = (day - other[1]).days
+            score = description_similarity(normalized, normalized_description) * (1 - DAY_PENALTY * distance)
+            if score >= min_score:
+                yield other[0], pk, round(score, 3)
+        window.append((key, row, normalized_description))
+
+
+def find_duplicate_groups(user, window_days=DATE_WINDOW_DAYS, min_score=MIN_SCORE, queryset=None):
+    """
+    Najde skupiny pravděpodobných duplicit.
+
+    Returns:
+        list: slovníky {'ids': [...], 'keep_id': id, 'score': float} seřazené od
+              nejjistějších; keep_id je transakce, kterou je vhodné ponechat
+    """
+    queryset = queryset if queryset is not None else Transaction.objects.filter(user=user)
+    rows = queryset.order_by('type', 'amount', 'date', 'id').values_list(
+        'id', 'date', 'amount', 'type', 'description', 'account_id'
+    ).iterator(chunk_size=5000)
+
+    # Union-find - dvojice se spojí do skupin (A~B, B~C => {A, B, C})
+    parent = {}
+    best_score = {}
+
+    def find(pk):
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for first, second, score in _find_pairs(rows, window_days, min_score):
+        parent.setdefault(first, first)
+        parent.setdefault(second, second)
+        root_first, root_second = find(first), find(second)
+        if root_first != root_second:
+            parent[root_second] = root_first
+            best_score[root_first] = max(best_score.get(root_first, 0), best_score.pop(root_second, 0))
+        best_score[root_first] = max(best_score.get(root_first, 0), score)
+
+    members = {}
+    for pk in parent:
+        members.setdefault(find(pk), []).append(pk)
+    if not members:
+        return []
+
+    keep = _choose_keep(members)
+    groups = [
+        {'ids': sorted(ids), 'keep_id': keep[root], 'score': best_score[root]}
+        for root, ids in members.items()
+    ]
+    groups.sort(key=lambda group: (-group['score'], group['ids'][0]))
+    return groups
+
+
+def _choose_keep(members):
+    """
+    Vybere v každé skupině transakci k ponechání: napojenou na opakovanou
+    platbu, pak s kategorií, pak s účtem, pak nejstarší.
+    """
+    all_ids = [pk for ids in members.values() for pk in ids]
+    recurring_ids = set(
+        RecurringTransactionHistory.objects.filter(transaction_id__in=all_ids).values_list('transaction_id', flat=True)
+    )
+    info = {
+        row[0]: row
+        for row in Transaction.objects.filter(pk__in=all_ids).values_list('id', 'category_id', 'account_id')
+    }
+
+    return {
+        root: min(ids, key=lambda pk: (
+            pk not in recurring_ids,
+            info[pk][1] is None,
+            info[pk][2] is None,
+            pk,
+        ))
+        for root, ids in members.items()
+    }
+
+
+# Pole, která se při sloučení doplní do ponechané transakce, pokud v ní chybí
+MERGE_FIELDS = ['category_id', 'account_id', 'to_account_id', 'description']
+
+
+def resolve_duplicates(user, groups, mode='merge'):
+    """
+    Hromadně vyřeší duplicity v jedné databázové transakci.
+
+    Args:
+        groups: iterable slovníků {'keep': id, 'remove': [id, ...]}
+        mode: 'merge' doplní chybějící údaje do ponechané transakce a převede
+              na ni historii opakovaných plateb; 'delete' odstraněné jen smaže
+
+    Returns:
+        dict: počty {'kept': int, 'deleted': int}
+
+    Raises:
+        ValueError: transakce je ve více skupinách (např. ponechaná v jedné
+                    a odstraňovaná v jiné)
+        Transaction.DoesNotExist: transakce neexistuje nebo nepatří uživateli
+    """
+    groups = [
+        (int(group['keep']), {int(pk) for pk in group['remove']} - {int(group['keep'])})
+        for group in groups
+    ]
+    # Každá transakce smí být jen v jedné skupině - jinak by se smazala i ponechaná
+    seen = set()
+    for keep, remove in groups:
+        members = remove | {keep}
+        if members & seen:
+            raise ValueError('Transakce se nesmí opakovat ve více skupinách')
+        seen |= members
+    all_ids = seen
+    owned = Transaction.objects.filter(user=user, pk__in=all_ids).in_bulk()
+    if len(owned) != len(all_ids):
+        raise Transaction.DoesNotExist('Některé transakce neexistují nebo nepatří uživateli')
+
+    with db_transaction.atomic():
+        to_delete = set()
+        to_update = []
+        balance_deltas = []
+        for keep_id, remove_ids in groups:
+            kept = owned[keep_id]
+            if mode == 'merge':
+                changed = False
+                previous_deltas = transaction_deltas(
+                    kept.type, kept.amount, kept.account_id, kept.to_account_id, kept.date, sign=-1
+                )
+                for removed_id in sorted(remove_ids):
+                    removed = owned[removed_id]
+                    for field in MERGE_FIELDS:
+                        if not getattr(kept, field) and getattr(removed, field):
+                            setattr(kept, field, getattr(removed, field))
+                            changed = True
+                if changed:
+                    to_update.append(kept)
+                    # bulk_update nevolá signály - změnu účtů promítneme do zůstatků ručně
+                    balance_deltas += previous_deltas + transaction_deltas(
+                        kept.type, kept.amount, kept.account_id, kept.to_account_id, kept.date
+                    )
+                # Historie opakovaných plateb se přesune na ponechanou transakci
+                RecurringTransactionHistory.objects.filter(transaction_id__in=remove_ids).update(
+                    transaction_id=keep_id
+                )
+            to_delete |= remove_ids
+
+        if to_update:
+            now = timezone.now()
+            for kept in to_update:
+                kept.updated_at = now
+            Transaction.objects.bulk_update(to_update, MERGE_FIELDS + ['updated_at'])
+            apply_deltas(balance_deltas)
+            # Doplněná kategorie mění čerpání rozpočtů
+            refresh_spent_totals(Budget.objects.filter(user=user))
+        deleted = Transaction.objects.filter(user=user, pk__in=to_delete).delete()[1].get(
+            Transaction._meta.label, 0
+        )
+
+    return {'kept': len(groups), 'deleted': deleted}
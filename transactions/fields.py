@@ -0,0 +1,119 @@
+"""
+fields.py - Kompaktní databázová pole pro transakce
+
+@author Tomáš Holes
+@description Obsahuje:
+    - CentsAmountField: částka uložená jako celé číslo v haléřích (BIGINT),
+      v Pythonu se chová jako Decimal se dvěma desetinnými místy
+    - TransactionTypeField: typ transakce uložený jako malé celé číslo,
+      v Pythonu zůstává řetězec ('EXPENSE', 'INCOME', 'TRANSFER')
+    - raw_cents(): výraz pro načtení částky přímo v haléřích bez převodu na Decimal
+
+@note Filtry, agregace (Sum, Avg) i serializace pracují se stejnými hodnotami
+      jako dříve - převod probíhá v get_prep_value/from_db_value.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django import forms
+from django.core import exceptions
+from django.db import models
+from django.db.models import ExpressionWrapper, F
+
+CENT = Decimal('0.01')
+
+
+class CentsAmountField(models.Field):
+    """Peněžní částka uložená v haléřích jako BIGINT."""
+
+    description = 'Částka v haléřích'
+
+    def __init__(self, *args, max_digits=10, **kwargs):
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits != 10:
+            kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        # Vlastní název - Django by jinak výsledky agregací (Avg) převáděl na int
+        return 'CentsAmountField'
+
+    def db_type(self, connection):
+        return models.BigIntegerField().db_type(connection)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal) and value == value.quantize(CENT):
+            return value
+        try:
+            return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+        except (ArithmeticError, ValueError):
+            raise exceptions.ValidationError(
+                'Hodnota "%(value)s" není platná částka.',
+                code='invalid',
+                params={'value': value},
+            )
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None:
+            return None
+        return int((self.to_python(value) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        # Avg vrací v SQLite float, Sum celé číslo
+        return (Decimal(str(value)) / 100).quantize(CENT, rounding=ROUND_HALF_UP)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': 2,
+            **kwargs,
+        })
+
+
+class TransactionTypeField(models.Field):
+    """Typ transakce uložený jako SMALLINT, v Pythonu řetězec z choices."""
+
+    description = 'Typ transakce'
+
+    # Kódy jsou uložené v databázi - neměnit, pouze přidávat
+    CODES = {
+        'EXPENSE': 1,
+        'INCOME': 2,
+        'TRANSFER': 3,
+    }
+    NAMES = {code: name for name, code in CODES.items()}
+
+    def get_internal_type(self):
+        return 'SmallIntegerField'
+
+    def to_python(self, value):
+        if isinstance(value, int):
+            return self.NAMES.get(value)
+        return value
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, int):
+            return value
+        # Neznámý typ se převede na NULL - filtr pak nic nenajde
+        return self.CODES.get(value)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return None
+        return self.NAMES.get(value)
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': forms.CharField, **kwargs})
+
+
+def raw_cents(field_name='amount'):
+    """Částka přímo v haléřích (int) - pro hromadné exporty bez převodu na Decimal."""
+    return ExpressionWrapper(F(field_name), output_field=models.BigIntegerField())
@@ -0,0 +1,135 @@
+"""
+bench_transaction_storage.py - Benchmark původního a kompaktního schématu transakcí
+
+@author Tomáš Holes
+@description Porovná na syntetických datech (výchozí 1 000 000 řádků):
+    - původní schéma: amount DECIMAL + type VARCHAR(10)
+    - kompaktní schéma: amount_cents BIGINT + type_code SMALLINT
+    Měří velikost indexu (user, type, date), dobu SUM s filtrem na typ,
+    seskupení podle (typ, den) a načtení částek do Pythonu.
+
+@note Běží nad dočasnou SQLite databází, aplikační databázi nemění.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+TYPES = ['EXPENSE', 'INCOME', 'TRANSFER']
+TYPE_CODES = {'EXPENSE': 1, 'INCOME': 2, 'TRANSFER': 3}
+
+SCHEMAS = {
+    'legacy': {
+        'table': 'CREATE TABLE legacy (id integer PRIMARY KEY, user_id bigint, date date, '
+                 'amount decimal NOT NULL, type varchar(10) NOT NULL)',
+        'index': 'CREATE INDEX legacy_user_type_date ON legacy (user_id, type, date)',
+        'insert': 'INSERT INTO legacy (user_id, date, amount, type) VALUES (?, ?, ?, ?)',
+        'sum': "SELECT SUM(amount) FROM legacy WHERE type = 'EXPENSE'",
+        'group': 'SELECT type, date, SUM(amount) FROM legacy GROUP BY type, date',
+        'fetch': "SELECT amount FROM legacy WHERE type = 'EXPENSE'",
+    },
+    'compact': {
+        'table': 'CREATE TABLE compact (id integer PRIMARY KEY, user_id bigint, date date, '
+                 'amount_cents bigint NOT NULL, type_code smallint NOT NULL)',
+        'index': 'CREATE INDEX compact_user_type_date ON compact (user_id, type_code, date)',
+        'insert': 'INSERT INTO compact (user_id, date, amount_cents, type_code) VALUES (?, ?, ?, ?)',
+        'sum': 'SELECT SUM(amount_cents) FROM compact WHERE type_code = 1',
+        'group': 'SELECT type_code, date, SUM(amount_cents) FROM compact GROUP BY type_code, date',
+        'fetch': 'SELECT amount_cents FROM compact WHERE type_code = 1',
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Porovná velikost indexu a rychlost agregací pro původní a kompaktní schéma transakcí'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Počet syntetických transakcí')
+        parser.add_argument('--users', type=int, default=1000, help='Počet uživatelů')
+        parser.add_argument('--repeat', type=int, default=3, help='Počet opakování každého měření')
+
+    def handle(self, *args, **options):
+        rows = self._generate(options['rows'], options['users'])
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        try:
+            connection = sqlite3.connect(path)
+            results = {name: self._measure(connection, name, schema, rows, options['repeat'])
+                       for name, schema in SCHEMAS.items()}
+            connection.close()
+        finally:
+            os.remove(path)
+
+        self.stdout.write(f"\n{'':28}{'legacy':>14}{'compact':>14}{'poměr':>10}")
+        for metric, unit in [('table_kb', 'kB'), ('index_kb', 'kB'), ('sum_ms', 'ms'),
+                             ('group_ms', 'ms'), ('fetch_ms', 'ms')]:
+            legacy, compact = results['legacy'][metric], results['compact'][metric]
+            ratio = compact / legacy if legacy else 0
+            self.stdout.write(f'{metric + " (" + unit + ")":28}{legacy:>14.1f}{compact:>14.1f}{ratio:>10.2f}')
+        self.stdout.write(self.style.SUCCESS(f"\nŘádků: {options['rows']}"))
+
+    def _generate(self, count, users):
+        """Deterministická syntetická data: (user_id, date, Decimal částka, typ)."""
+        generator = random.Random(42)
+        start = date(2023, 1, 1)
+        return [
+            (
+                generator.randrange(users),
+                (start + timedelta(days=generator.randrange(730))).isoformat(),
+                Decimal(generator.randrange(100, 5_000_000)) / 100,
+                generator.choices(TYPES, weights=[80, 15, 5])[0],
+            )
+            for _ in range(count)
+        ]
+
+    def _measure(self, connection, name, schema, rows, repeat):
+        self.stdout.write(f'Plním tabulku {name}...')
+        pages_before = self._pages(connection)
+        connection.execute(schema['table'])
+        if name == 'legacy':
+            # Django na SQLite ukládá DecimalField jako text převedený na číslo
+            values = ((user, day, str(amount), kind) for user, day, amount, kind in rows)
+        else:
+            values = ((user, day, int(amount * 100), TYPE_CODES[kind]) for user, day, amount, kind in rows)
+        connection.executemany(schema['insert'], values)
+        connection.commit()
+
+        table_pages = self._pages(connection) - pages_before
+        connection.execute(schema['index'])
+        connection.commit()
+        index_pages = self._pages(connection) - pages_before - table_pages
+        page_kb = connection.execute('PRAGMA page_size').fetchone()[0] / 1024
+
+        def timed(sql, consume):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                consume(connection.execute(sql))
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            return best
+
+        # Načtení do Pythonu včetně převodu, který dělá ORM (Decimal vs. int)
+        if name == 'legacy':
+            def fetch(cursor):
+                return sum((Decimal(str(value)) for value, in cursor), Decimal('0'))
+        else:
+            def fetch(cursor):
+                return sum(value for value, in cursor)
+
+        return {
+            'table_kb': table_pages * page_kb,
+            'index_kb': index_pages * page_kb,
+            'sum_ms': timed(schema['sum'], lambda cursor: cursor.fetchall()),
+            'group_ms': timed(schema['group'], lambda cursor: cursor.fetchall()),
+            'fetch_ms': timed(schema['fetch'], fetch),
+        }
+
+    @staticmethod
+    def _pages(connection):
+        return connection.execute('PRAGMA page_count').fetchone()[0]
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from transactions.models import RecurringTransaction
+from transactions.recurring_detection import MIN_CONFIDENCE, detect_recurring_for_all
+
+
+class Command(BaseCommand):
+    help = 'Vyhledá pravidelné platby v historii transakcí (všichni uživatelé nebo jeden)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='ID uživatele')
+        parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE,
+                            help='Minimální jistota návrhu (0-1)')
+        parser.add_argument('--create', action='store_true',
+                            help='Vytvořit nalezené platby jako RecurringTransaction (bez automatického vytváření transakcí)')
+
+    def handle(self, *args, **options):
+        user_ids = [options['user_id']] if options.get('user_id') else None
+        min_confidence = options['min_confidence']
+
+        users_count = 0
+        found_count = 0
+        to_create = []
+        for user_id, suggestions in detect_recurring_for_all(user_ids=user_ids):
+            suggestions = [item for item in suggestions if item['confidence'] >= min_confidence]
+            if not suggestions:
+                continue
+            users_count += 1
+            found_count += len(suggestions)
+            self.stdout.write(f'Uživatel {user_id}: {len(suggestions)} pravidelných plateb')
+            for item in suggestions:
+                self.stdout.write(
+                    f"  {item['name']} - {item['amount']} ({item['frequency']}, "
+                    f"jistota {item['confidence']:.2f}, výskytů {item['occurrences']})"
+                )
+                if options['create']:
+                    to_create.append(RecurringTransaction(
+                        user_id=user_id,
+                        name=item['name'] or item['frequency'],
+                        amount=item['amount'],
+                        type=item['type'],
+                        category_id=item['category_id'],
+                        frequency=item['frequency'],
+                        start_date=item['start_date'],
+                        next_due_date=item['next_due_date'],
+                        auto_create=False,
+                    ))
+
+        if to_create:
+            RecurringTransaction.objects.bulk_create(to_create, batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\nNalezeno {found_count} pravidelných plateb u {users_count} uživatelů'
+            + (f', vytvořeno {len(to_create)}' if options['create'] else '')
+        ))
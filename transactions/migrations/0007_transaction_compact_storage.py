@@ -0,0 +1,114 @@
+# Převod transakcí na kompaktní úložiště: částka v haléřích (BIGINT)
+# a typ jako SMALLINT. Migrace je vratná (migrate transactions 0006).
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Cast, Round
+
+import transactions.fields
+
+TYPE_CODES = {'EXPENSE': 1, 'INCOME': 2, 'TRANSFER': 3}
+
+
+def copy_to_compact(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Transaction.objects.update(
+        amount_cents=Cast(Round(F('amount') * 100), models.BigIntegerField()),
+        type_code=Case(
+            *[When(type=name, then=Value(code)) for name, code in TYPE_CODES.items()],
+            output_field=models.SmallIntegerField()
+        ),
+    )
+
+
+def copy_from_compact(apps, schema_editor):
+    Transaction = apps.get_model('transactions', 'Transaction')
+    names = {code: name for name, code in TYPE_CODES.items()}
+    batch = []
+    for transaction in Transaction.objects.only('id', 'amount_cents', 'type_code').iterator(chunk_size=2000):
+        transaction.amount = Decimal(transaction.amount_cents) / 100
+        transaction.type = names[transaction.type_code]
+        batch.append(transaction)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['amount', 'type'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['amount', 'type'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0006_categoryrule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Původní sloupce dočasně nullable, aby šla migrace vrátit
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='type',
+            field=models.CharField(choices=[('EXPENSE', 'Expense'), ('INCOME', 'Income'), ('TRANSFER', 'Transfer')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='amount_cents',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='type_code',
+            field=models.SmallIntegerField(null=True),
+        ),
+        migrations.RunPython(copy_to_compact, copy_from_compact),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='amount',
+        ),
+        migrations.RemoveField(
+            model_name='transaction',
+            name='type',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount_cents',
+            field=models.BigIntegerField(db_column='amount_cents'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='type_code',
+            field=models.SmallIntegerField(db_column='type_code'),
+        ),
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='amount_cents',
+            new_name='amount',
+        ),
+        migrations.RenameField(
+            model_name='transaction',
+            old_name='type_code',
+            new_name='type',
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='amount',
+            field=transactions.fields.CentsAmountField(db_column='amount_cents'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='type',
+            field=transactions.fields.TransactionTypeField(choices=[('EXPENSE', 'Expense'), ('INCOME', 'Income'), ('TRANSFER', 'Transfer')], db_column='type_code'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'date'], name='transaction_user_type_date'),
+        ),
+    ]
@@ -5,14 +5,20 @@ models.py - Modely pro správu transakcí aplikace Plutoa
 @description Obsahuje:
     - Category: Kategorie transakcí (příjmy/výdaje)
     - Transaction: Finanční transakce s vazbou na účet a kategorii
+    - CategoryRule: Pravidlo pro automatickou kategorizaci podle klíčového slova
 
 @note Transakce podporují typy: EXPENSE (výdaj), INCOME (příjem), TRANSFER (převod)
 @note Při mazání kategorie se transakce zachová (SET_NULL)
+@note Částka je uložena v haléřích a typ jako malé celé číslo (sloupce amount_cents, type_code)
+@note Transaction.save() běží v transakci, aby signály udržující zůstatky četly
+      původní stav pod zámkem řádku (souběžné úpravy se serializují)
 """
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.conf import settings
 from datetime import timedelta
+from dateutil.relativedelta import relativedelta
 from django.utils import timezone
+from .fields import CentsAmountField, TransactionTypeField
 
 class Category(models.Model):
     CATEGORY_TYPES = [
@@ -42,8 +48,9 @@ class Transaction(models.Model):
         ('TRANSFER', 'Transfer')
     ]
     
-    amount = models.DecimalField(max_digits=10, decimal_places=2)
-    type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
+    # Částka v haléřích (BIGINT) a typ jako SMALLINT - viz fields.py
+    amount = CentsAmountField(db_column='amount_cents')
+    type = TransactionTypeField(choices=TRANSACTION_TYPES, db_column='type_code')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     date = models.DateField()
     description = models.TextField(blank=True)
@@ -69,8 +76,57 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Agregace pro dashboard a analytiku filtrují podle uživatele, typu a data
+            models.Index(fields=['user', 'type', 'date'], name='transaction_user_type_date'),
+        ]
+    
     def __str__(self):
         return f'{self.type}: {self.amount} - {self.category}'
+    
+    def save(self, *args, **kwargs):
+        # Snímek původního stavu (pre_save, se zámkem řádku) a přepočet zůstatků
+        # (post_save) musí proběhnout v jedné DB transakci - viz signals.py
+        with db_transaction.atomic(using=kwargs.get('using'), savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class CategoryRule(models.Model):
+    """
+    Pravidlo pro automatickou kategorizaci - "popis obsahuje X -> kategorie Y".
+    Volitelně omezené typem transakce a rozsahem částky.
+    """
+    TRANSACTION_TYPES = [
+        ('EXPENSE', 'Výdaj'),
+        ('INCOME', 'Příjem'),
+    ]
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='category_rules'
+    )
+    keyword = models.CharField(max_length=100, verbose_name='Klíčové slovo')
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='rules'
+    )
+    # Prázdný typ = pravidlo platí pro příjmy i výdaje
+    transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES, blank=True)
+    min_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    priority = models.IntegerField(default=0, verbose_name='Priorita')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-priority', 'id']
+    
+    def __str__(self):
+        return f'"{self.keyword}" -> {self.category}'
 
 
 class RecurringTransaction(models.Model):
@@ -138,25 +194,13 @@ class RecurringTransaction(models.Model):
             return current_date + timedelta(weeks=1)
         elif self.frequency == 'BIWEEKLY':
             return current_date + timedelta(weeks=2)
+        # relativedelta zkrátí den na konec měsíce (31. 1. -> 28. 2., 29. 2. -> 28. 2. dalšího roku)
         elif self.frequency == 'MONTHLY':
-            month = current_date.month + 1
-            year = current_date.year
-            if month > 12:
-                month = 1
-                year += 1
-            try:
-                return current_date.replace(year=year, month=month)
-            except ValueError:
-                return current_date.replace(year=year, month=month, day=1) + timedelta(days=27)
+            return current_date + relativedelta(months=1)
         elif self.frequency == 'QUARTERLY':
-            month = current_date.month + 3
-            year = current_date.year
-            while month > 12:
-                month -= 12
-                year += 1
-            return current_date.replace(year=year, month=month)
+            return current_date + relativedelta(months=3)
         elif self.frequency == 'YEARLY':
-            return current_date.replace(year=current_date.year + 1)
+            return current_date + relativedelta(years=1)
         
         return current_date
     
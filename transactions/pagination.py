@@ -0,0 +1,20 @@
+"""
+pagination.py - Stránkování výpisů transakcí
+
+@author Tomáš Holes
+@description Obsahuje:
+    - LedgerCursorPagination: kurzorové stránkování výpisu účtu se zůstatkem po řádku
+
+@note Kurzor drží pozici v pořadí (date, id), takže stránka se načte jedním
+      dotazem s LIMIT bez ohledu na to, jak hluboko ve výpisu je.
+"""
+from rest_framework.pagination import CursorPagination
+
+
+class LedgerCursorPagination(CursorPagination):
+    """Kurzorové stránkování výpisu účtu (nejnovější nahoře, nebo ordering=date)."""
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-date', '-id')
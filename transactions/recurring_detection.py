@@ -0,0 +1,234 @@
+"""
+recurring_detection.py - Detekce pravidelných plateb v historii transakcí
+
+@author Tomáš Holes
+@description Obsahuje:
+    - normalize_description(): klíč popisu bez čísel, dat a variabilních symbolů
+    - detect_patterns(): vyhledání pravidelných plateb v řádcích jednoho uživatele
+    - detect_recurring(): návrhy RecurringTransaction pro uživatele
+    - detect_recurring_for_all(): dávkový režim přes všechny uživatele
+
+@note Transakce se seskupí podle typu a normalizovaného popisu, uvnitř skupiny
+      podle částky (tolerance AMOUNT_TOLERANCE). Pro každý shluk se spočítají
+      rozestupy mezi daty (ordinály) a medián se porovná se známými periodami.
+      Vše je jeden dotaz a jeden průchod daty - i roky historie trvají milisekundy.
+"""
+import re
+from collections import Counter, defaultdict
+from decimal import Decimal
+from itertools import groupby
+from statistics import median
+
+from django.utils import timezone
+
+from .models import RecurringTransaction, Transaction
+from .rules import normalize_text
+
+# Periody: frekvence -> (očekávaný rozestup ve dnech, tolerance ve dnech)
+PERIODS = {
+    'WEEKLY': (7, 1),
+    'BIWEEKLY': (14, 2),
+    'MONTHLY': (30.44, 3.5),
+    'QUARTERLY': (91.31, 7),
+    'YEARLY': (365.25, 10),
+}
+
+# Relativní tolerance částky v rámci jedné pravidelné platby
+AMOUNT_TOLERANCE = Decimal('0.10')
+
+# Minimální počet výskytů (roční platbě se stejnou částkou stačí dva)
+MIN_OCCURRENCES = 3
+MIN_OCCURRENCES_YEARLY = 2
+
+# Podíl rozestupů, které musí odpovídat periodě (vynechaná platba nevadí)
+MIN_REGULARITY = 0.7
+
+# Návrhy pod touto jistotou se nevrací
+MIN_CONFIDENCE = 0.5
+
+TOKEN_RE = re.compile(r'[a-z]+')
+
+
+def normalize_description(description):
+    """Klíč pro seskupení - slova popisu bez čísel a interpunkce."""
+    tokens = [token for token in TOKEN_RE.findall(normalize_text(description)) if len(token) > 1]
+    return ' '.join(tokens[:5])
+
+
+def _amount_clusters(rows):
+    """Rozdělí řádky seřazené podle částky na shluky s podobnou částkou."""
+    clusters = []
+    current = []
+    for row in rows:
+        if current and row[2] > current[0][2] * (1 + AMOUNT_TOLERANCE):
+            clusters.append(current)
+            current = []
+        current.append(row)
+    if current:
+        clusters.append(current)
+    return clusters
+
+
+def _classify(ordinals):
+    """
+    Určí periodu podle rozestupů mezi daty.
+
+    Returns:
+        (frequency, regularity) nebo (None, 0) pokud rozestupy neodpovídají
+    """
+    gaps = [later - earlier for earlier, later in zip(ordinals, ordinals[1:])]
+    if not gaps:
+        return None, 0
+    typical_gap = median(gaps)
+    for frequency, (period, tolerance) in PERIODS.items():
+        if abs(typical_gap - period) <= tolerance:
+            regular = sum(1 for gap in gaps if abs(gap - period) <= tolerance)
+            return frequency, regular / len(gaps)
+    return None, 0
+
+
+def _next_due_date(frequency, last_date, today):
+    """Další splatnost po posledním výskytu (stejná logika jako RecurringTransaction)."""
+    helper = RecurringTransaction(frequency=frequency, next_due_date=last_date)
+    next_date = helper.calculate_next_due_date()
+    while next_date <= today:
+        helper.next_due_date = next_date
+        next_date = helper.calculate_next_due_date()
+    return next_date
+
+
+def detect_patterns(rows, today=None, existing=()):
+    """
+    Najde pravidelné platby v transakcích jednoho uživatele.
+
+    Args:
+        rows: iterable n-tic (date, description, amount, type, category_id)
+        today: referenční datum (výchozí dnešek)
+        existing: množina (type, klíč popisu) již evidovaných opakovaných plateb
+
+    Returns:
+        list: návrhy seřazené podle jistoty (slovníky kompatibilní
+              s RecurringTransactionSerializer + occurrences, confidence)
+    """
+    today = today or timezone.now().date()
+    groups = defaultdict(list)
+    for day, description, amount, transaction_type, category_id in rows:
+        key = normalize_description(description)
+        if key and (transaction_type, key) not in existing:
+            groups[(transaction_type, key)].append((day, description, amount, category_id))
+
+    suggestions = []
+    for (transaction_type, key), items in groups.items():
+        if len(items) < MIN_OCCURRENCES_YEARLY:
+            continue
+        items.sort(key=lambda item: item[2])
+        for cluster in _amount_clusters(items):
+            suggestion = _evaluate(cluster, transaction_type, today)
+            if suggestion:
+                suggestions.append(suggestion)
+
+    suggestions.sort(key=lambda item: item['confidence'], reverse=True)
+    return suggestions
+
+
+def _evaluate(cluster, transaction_type, today):
+    """Ohodnotí jeden shluk transakcí - vrátí návrh nebo None."""
+    cluster.sort(key=lambda item: item[0])
+    # Více plateb ve stejný den (např. dvě jízdenky) se bere jako jeden výskyt
+    ordinals = sorted({item[0].toordinal() for item in cluster})
+    frequency, regularity = _classify(ordinals)
+    if frequency is None or regularity < MIN_REGULARITY:
+        return None
+
+    minimum = MIN_OCCURRENCES_YEARLY if frequency == 'YEARLY' else MIN_OCCURRENCES
+    if len(ordinals) < minimum:
+        return None
+
+    amounts = [item[2] for item in cluster]
+    typical_amount = median(amounts)
+    spread = (max(amounts) - min(amounts)) / typical_amount if typical_amount else Decimal('1')
+    # Dva roční výskyty jsou snadno náhoda - připustíme je jen při stejné částce
+    if len(ordinals) < MIN_OCCURRENCES and spread:
+        return None
+    amount_stability = max(0.0, 1 - float(spread) / float(AMOUNT_TOLERANCE) / 2)
+
+    # Platba, která už dlouho nepřišla, je pravděpodobně zrušená
+    period = PERIODS[frequency][0]
+    overdue = (today.toordinal() - ordinals[-1]) / period
+    recency = 1.0 if overdue <= 1.5 else max(0.0, 1 - (overdue - 1.5) / 2)
+
+    support = min(1.0, len(ordinals) / 6)
+    confidence = (0.55 * regularity + 0.25 * amount_stability + 0.2 * support) * recency
+    if confidence < MIN_CONFIDENCE:
+        return None
+
+    last_date = cluster[-1][0]
+    name = Counter(item[1] for item in cluster).most_common(1)[0][0]
+    category_id = Counter(item[3] for item in cluster if item[3]).most_common(1)
+    return {
+        'name': (name or '').strip()[:200],
+        'amount': typical_amount.quantize(Decimal('0.01')),
+        'type': transaction_type,
+        'category_id': category_id[0][0] if category_id else None,
+        'frequency': frequency,
+        'start_date': cluster[0][0],
+        'next_due_date': _next_due_date(frequency, last_date, today),
+        'last_date': last_date,
+        'occurrences': len(ordinals),
+        'confidence': round(confidence, 3),
+    }
+
+
+def _history_rows(queryset):
+    """Řádky pro detekci - jen příjmy a výdaje, které nevznikly z opakované platby."""
+    return queryset.filter(
+        type__in=['INCOME', 'EXPENSE'],
+        recurring_source__isnull=True
+    ).order_by()
+
+
+def _existing_keys(recurring_rows):
+    return {(transaction_type, normalize_description(name)) for transaction_type, name in recurring_rows}
+
+
+def detect_recurring(user, today=None, min_confidence=None):
+    """Návrhy pravidelných plateb pro jednoho uživatele."""
+    rows = _history_rows(Transaction.objects.filter(user=user)).values_list(
+        'date', 'description', 'amount', 'type', 'category_id'
+    )
+    existing = _existing_keys(
+        RecurringTransaction.objects.filter(user=user).values_list('type', 'name')
+    )
+    suggestions = detect_patterns(rows.iterator(chunk_size=5000), today=today, existing=existing)
+    if min_confidence is not None:
+        suggestions = [item for item in suggestions if item['confidence'] >= min_confidence]
+    return suggestions
+
+
+def detect_recurring_for_all(user_ids=None, today=None):
+    """
+    Dávkový režim - jeden průchod transakcemi všech uživatelů seřazenými podle uživatele.
+
+    Yields:
+        (user_id, suggestions)
+    """
+    transactions = Transaction.objects.all()
+    recurring = RecurringTransaction.objects.all()
+    if user_ids is not None:
+        transactions = transactions.filter(user_id__in=user_ids)
+        recurring = recurring.filter(user_id__in=user_ids)
+
+    existing = defaultdict(list)
+    for user_id, transaction_type, name in recurring.values_list('user_id', 'type', 'name'):
+        existing[user_id].append((transaction_type, name))
+
+    rows = _history_rows(transactions).order_by('user_id').values_list(
+        'user_id', 'date', 'description', 'amount', 'type', 'category_id'
+    ).iterator(chunk_size=5000)
+    for user_id, user_rows in groupby(rows, key=lambda row: row[0]):
+        suggestions = detect_patterns(
+            (row[1:] for row in user_rows),
+            today=today,
+            existing=_existing_keys(existing.get(user_id, ()))
+        )
+        yield user_id, suggestions
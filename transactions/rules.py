@@ -0,0 +1,199 @@
+"""
+rules.py - Kompilovaná pravidla pro kategorizaci transakcí
+
+@author Tomáš Holes
+@description Obsahuje:
+    - KeywordAutomaton: Aho-Corasick automat nad klíčovými slovy všech pravidel
+    - CompiledRuleSet: pravidla uživatele zkompilovaná do jednoho automatu
+      s predikáty na typ a rozsah částky
+    - get_rule_set(): cache zkompilovaných pravidel pro jednotlivé uživatele
+    - match_category_rule(): kategorie podle pravidel pro jednu transakci
+
+@note Popis se projde automatem jednou bez ohledu na počet pravidel, takže
+      import tisíců řádků proti desítkám pravidel nestojí řádky × pravidla.
+      Porovnání je bez ohledu na velikost písmen a diakritiku.
+"""
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+
+from django.db.models import Count, Max
+
+from .models import Category, CategoryRule
+
+
+def normalize_text(text):
+    """Malá písmena bez diakritiky - stejně pro klíčová slova i popisy."""
+    if not text:
+        return ''
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return normalized.encode('ascii', 'ignore').decode('ascii')
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automat - najde všechna klíčová slova v textu v jednom průchodu.
+    """
+
+    def __init__(self, keywords):
+        # Stav 0 je kořen; goto[stav] = {znak: další stav}
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for index, keyword in enumerate(keywords):
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(index)
+
+        # Fail odkazy se počítají po vrstvách (BFS)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, text):
+        """Vrátí množinu indexů klíčových slov obsažených v textu."""
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            if self.output[state]:
+                found.update(self.output[state])
+        return found
+
+
+class CompiledRuleSet:
+    """
+    Aktivní pravidla uživatele zkompilovaná pro rychlé vyhodnocení.
+
+    Při shodě více pravidel vyhrává vyšší priorita, pak delší klíčové slovo
+    (je specifičtější) a nakonec starší pravidlo.
+    """
+
+    def __init__(self, rules):
+        keywords = []
+        self.rules_by_keyword = []
+        keyword_index = {}
+        for rule in rules:
+            keyword = normalize_text(rule['keyword']).strip()
+            if not keyword:
+                continue
+            if keyword not in keyword_index:
+                keyword_index[keyword] = len(keywords)
+                keywords.append(keyword)
+                self.rules_by_keyword.append([])
+            self.rules_by_keyword[keyword_index[keyword]].append(rule)
+
+        for bucket in self.rules_by_keyword:
+            bucket.sort(key=lambda rule: (-rule['priority'], rule['id']))
+        self.automaton = KeywordAutomaton(keywords)
+        self.keywords = keywords
+        self.version = None
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.rules_by_keyword)
+
+    def match(self, description, amount, transaction_type):
+        """Vrátí ID kategorie podle nejlepšího odpovídajícího pravidla, nebo None."""
+        if transaction_type not in ('INCOME', 'EXPENSE') or not self.keywords:
+            return None
+
+        best = None
+        best_key = None
+        for index in self.automaton.find(normalize_text(description)):
+            for rule in self.rules_by_keyword[index]:
+                if rule['transaction_type'] and rule['transaction_type'] != transaction_type:
+                    continue
+                if amount is not None:
+                    if rule['min_amount'] is not None and amount < rule['min_amount']:
+                        continue
+                    if rule['max_amount'] is not None and amount > rule['max_amount']:
+                        continue
+                key = (-rule['priority'], -len(self.keywords[index]), rule['id'])
+                if best_key is None or key < best_key:
+                    best, best_key = rule, key
+                # Pravidla u slova jsou seřazená podle priority - první vyhovující stačí
+                break
+
+        return best['category_id'] if best else None
+
+    def match_many(self, items):
+        """Vyhodnotí dávku n-tic (description, amount, transaction_type)."""
+        return [self.match(description, amount, transaction_type)
+                for description, amount, transaction_type in items]
+
+
+# Cache zkompilovaných pravidel: user_id -> CompiledRuleSet (LRU)
+CACHE_SIZE = 256
+_rule_sets = OrderedDict()
+_rule_sets_lock = threading.Lock()
+
+
+def _rules_version(user):
+    """Verze pravidel - změní se při přidání, úpravě i smazání pravidla."""
+    stats = CategoryRule.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        max_updated=Max('updated_at')
+    )
+    return (stats['count'], stats['max_updated'])
+
+
+def get_rule_set(user):
+    """Vrátí zkompilovaná pravidla uživatele - z cache, nebo je zkompiluje."""
+    version = _rules_version(user)
+
+    with _rule_sets_lock:
+        cached = _rule_sets.get(user.pk)
+        if cached is not None:
+            _rule_sets.move_to_end(user.pk)
+    if cached is not None and cached.version == version:
+        return cached
+
+    rules = CategoryRule.objects.filter(user=user, is_active=True).values(
+        'id', 'keyword', 'category_id', 'transaction_type',
+        'min_amount', 'max_amount', 'priority'
+    )
+    rule_set = CompiledRuleSet(rules)
+    rule_set.version = version
+    with _rule_sets_lock:
+        _rule_sets[user.pk] = rule_set
+        _rule_sets.move_to_end(user.pk)
+        while len(_rule_sets) > CACHE_SIZE:
+            _rule_sets.popitem(last=False)
+    return rule_set
+
+
+def invalidate_rule_set(user_id=None):
+    """Zahodí zkompilovaná pravidla uživatele (nebo všech uživatelů) z cache."""
+    with _rule_sets_lock:
+        if user_id is None:
+            _rule_sets.clear()
+        else:
+            _rule_sets.pop(user_id, None)
+
+
+def match_category_rule(user, description, amount, transaction_type):
+    """Vrátí kategorii podle pravidel uživatele, nebo None."""
+    category_id = get_rule_set(user).match(description, amount, transaction_type)
+    if category_id is None:
+        return None
+    return Category.objects.filter(user=user, pk=category_id).first()
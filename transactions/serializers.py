@@ -4,11 +4,13 @@ serializers.py - Serializery pro aplikaci Transactions
 @author Tomáš Holes
 @description Obsahuje serializery pro:
     - Transakce (vytváření, výpis, validace)
+    - Výpis účtu se zůstatkem po každém řádku
     - Kategorie (vytváření, validace)
     - Opakující se transakce
+    - Pravidla pro automatickou kategorizaci
 """
 from rest_framework import serializers
-from .models import Category, Transaction, RecurringTransaction, RecurringTransactionHistory
+from .models import Category, Transaction, RecurringTransaction, RecurringTransactionHistory, CategoryRule
 from accounts.models import FinancialAccount
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -29,6 +31,8 @@ class AccountSimpleSerializer(serializers.ModelSerializer):
 
 
 class TransactionSerializer(serializers.ModelSerializer):
+    # Model ukládá částku v haléřích - navenek zůstává desetinné číslo
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2)
     category = CategorySerializer(read_only=True, allow_null=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(),
@@ -75,6 +79,14 @@ class TransactionSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class LedgerTransactionSerializer(TransactionSerializer):
+    """Transakce ve výpisu účtu - navíc zůstatek účtu po této transakci."""
+    running_balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta(TransactionSerializer.Meta):
+        fields = TransactionSerializer.Meta.fields + ['running_balance']
+
+
 class RecurringTransactionSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -123,3 +135,40 @@ class RecurringTransactionHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = RecurringTransactionHistory
         fields = ['id', 'transaction', 'created_at', 'was_auto_created']
+
+
+class CategoryRuleSerializer(serializers.ModelSerializer):
+    category = CategorySerializer(read_only=True)
+    category_id = serializers.PrimaryKeyRelatedField(
+        queryset=Category.objects.all(),
+        source='category',
+        write_only=True
+    )
+    
+    class Meta:
+        model = CategoryRule
+        fields = [
+            'id', 'keyword', 'category', 'category_id', 'transaction_type',
+            'min_amount', 'max_amount', 'priority', 'is_active',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['created_at', 'updated_at']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Filtrujeme kategorie pouze pro aktuálního uživatele
+        request = self.context.get('request')
+        if request and hasattr(request, 'user') and request.user.is_authenticated:
+            self.fields['category_id'].queryset = Category.objects.filter(user=request.user)
+    
+    def validate_keyword(self, value):
+        if not value.strip():
+            raise serializers.ValidationError('Klíčové slovo nesmí být prázdné.')
+        return value.strip()
+    
+    def validate(self, attrs):
+        min_amount = attrs.get('min_amount', getattr(self.instance, 'min_amount', None))
+        max_amount = attrs.get('max_amount', getattr(self.instance, 'max_amount', None))
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise serializers.ValidationError({'max_amount': 'Maximální částka musí být větší než minimální.'})
+        return attrs
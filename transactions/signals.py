@@ -0,0 +1,95 @@
+"""
+signals.py - Udržování zůstatků účtů a čerpání rozpočtů při změnách transakcí
+
+@author Tomáš Holes
+@description Obsahuje:
+    - remember_previous_state(): před uložením si zapamatuje původní částku, typ, účty, kategorii a datum
+    - remember_deleted_state(): před smazáním načte uložený stav mazané transakce
+    - update_balances_on_save(): odečte původní a přičte novou podobu transakce
+    - update_balances_on_delete(): odečte smazanou transakci
+
+@note Hromadné operace (bulk_create, bulk_update, QuerySet.update) signály
+      nevolají - po nich je nutné zavolat accounts.balances.apply_deltas
+      nebo repair příkazem verify_account_balances a budgets.spending.refresh_spent_totals.
+@note Původní stav se čte se select_for_update() ve stejné DB transakci jako
+      uložení (Transaction.save() i mazání běží v atomic bloku). Dvě souběžné
+      úpravy téže transakce se tak serializují a druhá odečte už stav po první -
+      jinak by obě odečetly stejný "původní" stav a zůstatky by se rozešly.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.balances import apply_deltas, transaction_deltas
+from budgets.services import BudgetAlertService
+
+from .models import Transaction
+
+# Pole, na kterých závisí zůstatek účtů
+BALANCE_FIELDS = ('type', 'amount', 'account_id', 'to_account_id', 'date')
+# Pole, na kterých závisí čerpání rozpočtů
+BUDGET_FIELDS = ('type', 'amount', 'date', 'category_id', 'user_id')
+SNAPSHOT_FIELDS = tuple(dict.fromkeys(BALANCE_FIELDS + BUDGET_FIELDS))
+
+
+def _normalized(values):
+    # Instance může po create() držet hodnoty tak, jak byly předány (např. datum jako řetězec)
+    amount_field = Transaction._meta.get_field('amount')
+    date_field = Transaction._meta.get_field('date')
+    return {
+        **values,
+        'amount': amount_field.to_python(values['amount']),
+        'date': date_field.to_python(values['date']),
+    }
+
+
+def _locked_state(pk):
+    # Zamkne řádek do konce DB transakce a vrátí jeho uložený stav (SQLite zámky nepodporuje a ignoruje je)
+    return Transaction.objects.select_for_update().filter(pk=pk).values(*SNAPSHOT_FIELDS).first()
+
+
+def _deltas(values, sign=1):
+    return transaction_deltas(
+        values['type'], values['amount'], values['account_id'], values['to_account_id'], values['date'], sign
+    )
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_state(sender, instance, **kwargs):
+    instance._balance_previous = None
+    if instance.pk and not instance._state.adding:
+        instance._balance_previous = _locked_state(instance.pk)
+
+
+def _changed(previous, current, fields):
+    return previous is None or any(previous[field] != current[field] for field in fields)
+
+
+@receiver(post_save, sender=Transaction)
+def update_balances_on_save(sender, instance, created, **kwargs):
+    current = _normalized({field: getattr(instance, field) for field in SNAPSHOT_FIELDS})
+    previous = getattr(instance, '_balance_previous', None)
+    if previous:
+        previous = _normalized(previous)
+    if _changed(previous, current, BALANCE_FIELDS):
+        deltas = _deltas(current)
+        if previous:
+            deltas += _deltas(previous, sign=-1)
+        apply_deltas(deltas)
+    if _changed(previous, current, BUDGET_FIELDS):
+        BudgetAlertService.apply_transaction_change(previous, current)
+
+
+@receiver(pre_delete, sender=Transaction)
+def remember_deleted_state(sender, instance, **kwargs):
+    # Instance v paměti může být zastaralá vůči souběžné úpravě
+    instance._balance_previous = _locked_state(instance.pk)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_balances_on_delete(sender, instance, **kwargs):
+    if instance._balance_previous is None:
+        # Řádek mezitím smazala souběžná operace - její změnu už započetla
+        return
+    values = _normalized(instance._balance_previous)
+    apply_deltas(_deltas(values, sign=-1))
+    BudgetAlertService.apply_transaction_change(values, None)
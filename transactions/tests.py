@@ -7,6 +7,7 @@ tests.py - Unit testy pro modul transactions
     - CRUD operace pro kategorie
     - Opakující se transakce
     - Filtry a statistiky
+    - Výpis účtu se zůstatkem po řádku
 """
 from django.test import TestCase
 from django.urls import reverse
@@ -15,7 +16,7 @@ from rest_framework import status
 from decimal import Decimal
 from datetime import date, timedelta
 from accounts.models import User, FinancialAccount
-from .models import Category, Transaction, RecurringTransaction
+from .models import Category, Transaction, RecurringTransaction, RecurringTransactionHistory
 
 
 class CategoryModelTests(TestCase):
@@ -321,3 +322,455 @@ class RecurringTransactionTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
+
+
+class CategorizerTests(APITestCase):
+    """Testy pro automatickou kategorizaci transakcí"""
+    
+    def setUp(self):
+        from .categorizer import invalidate_categorizer
+        invalidate_categorizer()
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.food = Category.objects.create(name='Jídlo', category_type='EXPENSE', user=self.user)
+        self.transport = Category.objects.create(name='Doprava', category_type='EXPENSE', user=self.user)
+        self.salary = Category.objects.create(name='Mzda', category_type='INCOME', user=self.user)
+        for description in ['Nákup Lidl', 'Lidl potraviny', 'Albert nákup', 'Lidl']:
+            Transaction.objects.create(
+                amount=350, type='EXPENSE', category=self.food,
+                description=description, date=date.today(), user=self.user
+            )
+        for description in ['Jízdenka MHD', 'Benzín Shell', 'MHD kupón']:
+            Transaction.objects.create(
+                amount=600, type='EXPENSE', category=self.transport,
+                description=description, date=date.today(), user=self.user
+            )
+        Transaction.objects.create(
+            amount=45000, type='INCOME', category=self.salary,
+            description='Výplata', date=date.today(), user=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def test_predict_by_description(self):
+        """Test predikce kategorie podle popisu"""
+        from .categorizer import get_categorizer
+        predictions = get_categorizer(self.user).predict_many([
+            ('lidl', 300, 'EXPENSE'),
+            ('mhd', 600, 'EXPENSE'),
+        ])
+        self.assertEqual(predictions[0][0][0], self.food.pk)
+        self.assertEqual(predictions[1][0][0], self.transport.pk)
+    
+    def test_income_only_matches_income_categories(self):
+        """Test že příjem nedostane výdajovou kategorii"""
+        from .categorizer import get_categorizer
+        prediction = get_categorizer(self.user).predict_many([('Lidl', 300, 'INCOME')])[0]
+        self.assertEqual(prediction[0][0], self.salary.pk)
+    
+    def test_model_cached_and_incrementally_updated(self):
+        """Test že model se drží v cache a po přidání transakce se dotrénuje"""
+        from .categorizer import get_categorizer
+        model = get_categorizer(self.user)
+        self.assertIs(get_categorizer(self.user), model)
+        
+        Transaction.objects.create(
+            amount=150, type='EXPENSE', category=self.food,
+            description='Pekárna', date=date.today(), user=self.user
+        )
+        updated = get_categorizer(self.user)
+        self.assertIsNot(updated, model)
+        self.assertEqual(updated.class_counts[self.food.pk], 5)
+    
+    def test_suggest_category_endpoint(self):
+        """Test endpointu pro návrh kategorie"""
+        url = reverse('transaction-suggest-category')
+        response = self.client.get(url, {'description': 'Lidl', 'amount': '300'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['suggestions'][0]['category']['id'], self.food.pk)
+    
+    def test_suggest_category_only_own_categories(self):
+        """Test že návrh nikdy nevrátí kategorii jiného uživatele"""
+        from unittest import mock
+        other = User.objects.create_user(username='other', password='TestPass123!')
+        foreign = Category.objects.create(name='Cizí', category_type='EXPENSE', user=other)
+        categorizer = mock.Mock()
+        categorizer.predict_many.return_value = [[(foreign.pk, 0.9), (self.food.pk, 0.1)]]
+        with mock.patch('transactions.views.get_categorizer', return_value=categorizer):
+            response = self.client.get(reverse('transaction-suggest-category'), {'description': 'Lidl'})
+        self.assertEqual([s['category']['id'] for s in response.data['suggestions']], [self.food.pk])
+    
+    def test_create_without_category_is_categorized(self):
+        """Test automatické kategorizace při vytvoření transakce bez kategorie"""
+        url = reverse('transaction-list')
+        data = {
+            'amount': '320.00',
+            'type': 'EXPENSE',
+            'date': str(date.today()),
+            'description': 'Lidl nákup'
+        }
+        response = self.client.post(url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['category']['id'], self.food.pk)
+    
+    def test_import_csv_categorizes_rows(self):
+        """Test automatické kategorizace řádků CSV bez kategorie"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = 'Datum,Popis,Kategorie,Typ,Částka\n2024-01-15,Lidl,,Výdaj,280\n'
+        upload = SimpleUploadedFile('import.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(reverse('transaction-import-csv'), {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['auto_categorized'], 1)
+        imported = Transaction.objects.get(user=self.user, date=date(2024, 1, 15))
+        self.assertEqual(imported.category, self.food)
+
+
+class CategoryRuleTests(APITestCase):
+    """Testy pro pravidla automatické kategorizace"""
+    
+    def setUp(self):
+        from .rules import invalidate_rule_set
+        from .models import CategoryRule
+        invalidate_rule_set()
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.food = Category.objects.create(name='Jídlo a nápoje', category_type='EXPENSE', user=self.user)
+        self.fuel = Category.objects.create(name='Doprava', category_type='EXPENSE', user=self.user)
+        CategoryRule.objects.create(user=self.user, keyword='Lidl', category=self.food)
+        CategoryRule.objects.create(user=self.user, keyword='Shell', category=self.fuel, min_amount=500)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def test_automaton_finds_overlapping_keywords(self):
+        """Test Aho-Corasick automatu na překrývajících se slovech"""
+        from .rules import KeywordAutomaton
+        automaton = KeywordAutomaton(['he', 'she', 'his', 'hers'])
+        self.assertEqual(automaton.find('ushers'), {0, 1, 3})
+    
+    def test_match_ignores_case_and_diacritics(self):
+        """Test shody bez ohledu na velikost písmen a diakritiku"""
+        from .rules import get_rule_set
+        rule_set = get_rule_set(self.user)
+        self.assertEqual(rule_set.match('NÁKUP LIDL Praha', Decimal('250'), 'EXPENSE'), self.food.pk)
+        self.assertIsNone(rule_set.match('Kavárna', Decimal('80'), 'EXPENSE'))
+    
+    def test_amount_range_predicate(self):
+        """Test omezení pravidla rozsahem částky"""
+        from .rules import get_rule_set
+        rule_set = get_rule_set(self.user)
+        self.assertIsNone(rule_set.match('Shell káva', Decimal('60'), 'EXPENSE'))
+        self.assertEqual(rule_set.match('Shell benzín', Decimal('1200'), 'EXPENSE'), self.fuel.pk)
+    
+    def test_rule_set_recompiled_after_change(self):
+        """Test že cache pravidel se zneplatní po změně pravidel"""
+        from .rules import get_rule_set
+        from .models import CategoryRule
+        rule_set = get_rule_set(self.user)
+        self.assertIs(get_rule_set(self.user), rule_set)
+        CategoryRule.objects.create(user=self.user, keyword='Albert', category=self.food)
+        self.assertEqual(get_rule_set(self.user).match('Albert', Decimal('100'), 'EXPENSE'), self.food.pk)
+    
+    def test_reapply_rules_to_history(self):
+        """Test zpětné aplikace pravidel na historii"""
+        for description in ['Lidl', 'lidl nákup', 'Kino']:
+            Transaction.objects.create(
+                amount=200, type='EXPENSE', description=description,
+                date=date.today(), user=self.user
+            )
+        response = self.client.post(reverse('category-rule-reapply'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user, category=self.food).count(), 2)
+        self.assertEqual(Transaction.objects.filter(user=self.user, category__isnull=True).count(), 1)
+    
+    def test_import_csv_applies_rules(self):
+        """Test použití pravidel při importu CSV"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = 'Datum,Popis,Kategorie,Typ,Částka\n2024-02-01,LIDL Brno,,Výdaj,310\n'
+        upload = SimpleUploadedFile('import.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post(reverse('transaction-import-csv'), {'file': upload}, format='multipart')
+        self.assertEqual(response.data['auto_categorized'], 1)
+        self.assertEqual(Transaction.objects.get(user=self.user, date=date(2024, 2, 1)).category, self.food)
+
+
+class CompactStorageTests(APITestCase):
+    """Testy kompaktního uložení částky (haléře) a typu (malé celé číslo)"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+    
+    def test_stored_as_integers(self):
+        """Test že se do databáze ukládají celá čísla a model vrací Decimal"""
+        transaction = Transaction.objects.create(
+            user=self.user, amount=Decimal('123.45'), type='INCOME', date=date.today()
+        )
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT amount_cents, type_code FROM transactions_transaction WHERE id = %s',
+                [transaction.pk]
+            )
+            self.assertEqual(cursor.fetchone(), (12345, 2))
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.amount, Decimal('123.45'))
+        self.assertEqual(transaction.type, 'INCOME')
+        self.assertEqual(transaction.get_type_display(), 'Income')
+    
+    def test_filters_and_aggregates(self):
+        """Test filtrování a agregací nad převedenými sloupci"""
+        from django.db.models import Avg, Sum
+        for amount in ('10.10', '20.25'):
+            Transaction.objects.create(user=self.user, amount=Decimal(amount), type='EXPENSE', date=date.today())
+        Transaction.objects.create(user=self.user, amount=Decimal('5'), type='INCOME', date=date.today())
+        
+        expenses = Transaction.objects.filter(user=self.user, type='EXPENSE')
+        self.assertEqual(expenses.aggregate(total=Sum('amount'))['total'], Decimal('30.35'))
+        self.assertEqual(expenses.aggregate(avg=Avg('amount'))['avg'], Decimal('15.18'))
+        self.assertEqual(expenses.filter(amount__gte=Decimal('20')).count(), 1)
+        self.assertEqual(Transaction.objects.filter(type='UNKNOWN').count(), 0)
+    
+    def test_api_and_export_unchanged(self):
+        """Test že API i export vrací částky ve stejném formátu jako dříve"""
+        Transaction.objects.create(user=self.user, amount=Decimal('99.90'), type='EXPENSE', date=date.today())
+        response = self.client.get(reverse('transaction-list'))
+        item = response.data['results'][0] if isinstance(response.data, dict) else response.data[0]
+        self.assertEqual(item['amount'], '99.90')
+        self.assertEqual(item['type'], 'EXPENSE')
+        
+        response = self.client.get(reverse('transaction-export-csv'))
+        self.assertIn('99.9', response.content.decode('utf-8'))
+
+
+class RecurringDetectionTests(APITestCase):
+    """Testy detekce pravidelných plateb z historie"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.category = Category.objects.create(name='Předplatné', category_type='EXPENSE', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+        # Netflix každý měsíc posledních 8 měsíců, s mírně kolísající částkou a variabilním symbolem
+        for months_ago in range(8):
+            Transaction.objects.create(
+                user=self.user, amount=Decimal('299') + months_ago % 2, type='EXPENSE',
+                category=self.category, date=self.today - timedelta(days=30 * months_ago + 2),
+                description=f'NETFLIX.COM {1000 + months_ago}'
+            )
+        # Nepravidelné nákupy se nesmí objevit mezi návrhy
+        for days_ago in (3, 11, 40, 41, 95):
+            Transaction.objects.create(
+                user=self.user, amount=Decimal('450'), type='EXPENSE',
+                date=self.today - timedelta(days=days_ago), description='Albert'
+            )
+    
+    def test_detects_monthly_subscription(self):
+        """Test nalezení měsíčního předplatného"""
+        from .recurring_detection import detect_recurring
+        suggestions = detect_recurring(self.user)
+        self.assertEqual(len(suggestions), 1)
+        suggestion = suggestions[0]
+        self.assertEqual(suggestion['frequency'], 'MONTHLY')
+        self.assertEqual(suggestion['category_id'], self.category.pk)
+        self.assertEqual(suggestion['occurrences'], 8)
+        self.assertGreater(suggestion['next_due_date'], self.today)
+        self.assertGreaterEqual(suggestion['confidence'], 0.8)
+    
+    def test_existing_recurring_is_skipped(self):
+        """Test že již evidovaná opakovaná platba se znovu nenavrhuje"""
+        RecurringTransaction.objects.create(
+            user=self.user, name='Netflix.com', amount=299, type='EXPENSE',
+            frequency='MONTHLY', start_date=self.today, next_due_date=self.today
+        )
+        response = self.client.get(reverse('recurring-transaction-suggestions'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_suggestion_can_be_created(self):
+        """Test že návrh z API lze rovnou uložit jako opakující se platbu"""
+        response = self.client.get(reverse('recurring-transaction-suggestions'))
+        suggestion = response.data['suggestions'][0]
+        self.assertEqual(suggestion['category']['name'], 'Předplatné')
+        
+        response = self.client.post(reverse('recurring-transaction-list'), suggestion, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['frequency'], 'MONTHLY')
+    
+    def test_next_due_date_clamped_to_month_end(self):
+        """Test další splatnosti čtvrtletní platby končící 31. a roční platby z 29. února"""
+        from .recurring_detection import detect_patterns
+        quarterly = [
+            (day, 'POJISTENI', Decimal('1200'), 'EXPENSE', None)
+            for day in (date(2025, 11, 30), date(2026, 2, 28), date(2026, 5, 31))
+        ]
+        suggestions = detect_patterns(quarterly, today=date(2026, 10, 19))
+        self.assertEqual(suggestions[0]['frequency'], 'QUARTERLY')
+        # 31. 5. -> 31. 8. -> 30. 11.
+        self.assertEqual(suggestions[0]['next_due_date'], date(2026, 11, 30))
+        
+        yearly = [
+            (day, 'DOMENA', Decimal('350'), 'EXPENSE', None)
+            for day in (date(2022, 3, 1), date(2023, 3, 1), date(2024, 2, 29))
+        ]
+        suggestions = detect_patterns(yearly, today=date(2024, 3, 10))
+        self.assertEqual(suggestions[0]['frequency'], 'YEARLY')
+        self.assertEqual(suggestions[0]['next_due_date'], date(2025, 2, 28))
+
+
+class DuplicateDetectionTests(APITestCase):
+    """Testy vyhledání a sloučení duplicitních transakcí"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.category = Category.objects.create(name='Jídlo', category_type='EXPENSE', user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        today = date.today()
+        # Ruční zadání a import téže platby o den později
+        self.manual = Transaction.objects.create(
+            user=self.user, amount=Decimal('349.90'), type='EXPENSE',
+            date=today - timedelta(days=1), description='Albert'
+        )
+        self.imported = Transaction.objects.create(
+            user=self.user, amount=Decimal('349.90'), type='EXPENSE', category=self.category,
+            date=today, description='ALBERT VAM DEKUJE'
+        )
+        # Stejná částka, ale jiný obchod a týden jindy - není duplicita
+        Transaction.objects.create(
+            user=self.user, amount=Decimal('349.90'), type='EXPENSE',
+            date=today - timedelta(days=9), description='Lékárna'
+        )
+    
+    def test_finds_duplicate_group(self):
+        """Test nalezení skupiny duplicit s doporučenou transakcí k ponechání"""
+        response = self.client.get(reverse('transaction-duplicates'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        group = response.data['groups'][0]
+        self.assertEqual({item['id'] for item in group['transactions']}, {self.manual.pk, self.imported.pk})
+        # Ponechává se transakce s kategorií
+        self.assertEqual(group['keep_id'], self.imported.pk)
+    
+    def test_merge_moves_recurring_history(self):
+        """Test sloučení - doplnění údajů a převod historie opakované platby"""
+        recurring = RecurringTransaction.objects.create(
+            user=self.user, name='Albert', amount=Decimal('349.90'), type='EXPENSE',
+            frequency='WEEKLY', start_date=date.today(), next_due_date=date.today()
+        )
+        RecurringTransactionHistory.objects.create(recurring_transaction=recurring, transaction=self.manual)
+        
+        response = self.client.post(reverse('transaction-merge-duplicates'), {
+            'mode': 'merge',
+            'groups': [{'keep': self.manual.pk, 'remove': [self.imported.pk]}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], 1)
+        self.manual.refresh_from_db()
+        self.assertEqual(self.manual.category, self.category)
+        self.assertFalse(Transaction.objects.filter(pk=self.imported.pk).exists())
+        self.assertTrue(RecurringTransactionHistory.objects.filter(transaction=self.manual).exists())
+    
+    def test_cannot_delete_foreign_transactions(self):
+        """Test že nelze smazat transakce jiného uživatele"""
+        other = User.objects.create_user(username='other', password='Pass123!')
+        foreign = Transaction.objects.create(
+            user=other, amount=Decimal('10'), type='EXPENSE', date=date.today()
+        )
+        response = self.client.post(reverse('transaction-merge-duplicates'), {
+            'mode': 'delete',
+            'groups': [{'keep': self.manual.pk, 'remove': [foreign.pk]}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Transaction.objects.filter(pk=foreign.pk).exists())
+    
+    def test_rejects_transaction_in_multiple_groups(self):
+        """Test že transakce ponechaná v jedné skupině nesmí být odstraněna v jiné"""
+        third = Transaction.objects.create(
+            user=self.user, amount=Decimal('349.90'), type='EXPENSE', date=date.today()
+        )
+        response = self.client.post(reverse('transaction-merge-duplicates'), {
+            'mode': 'delete',
+            'groups': [
+                {'keep': self.manual.pk, 'remove': [self.imported.pk]},
+                {'keep': third.pk, 'remove': [self.manual.pk]},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Transaction.objects.filter(pk__in=[self.manual.pk, self.imported.pk, third.pk]).count(), 3)
+        # Stejná transakce odstraňovaná ve dvou skupinách
+        response = self.client.post(reverse('transaction-merge-duplicates'), {
+            'mode': 'delete',
+            'groups': [
+                {'keep': self.manual.pk, 'remove': [self.imported.pk]},
+                {'keep': third.pk, 'remove': [self.imported.pk]},
+            ]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Transaction.objects.filter(pk=self.imported.pk).exists())
+
+
+class LedgerRunningBalanceTests(APITestCase):
+    """Testy výpisu účtu se zůstatkem po každém řádku"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='TestPass123!')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.account = FinancialAccount.objects.create(user=self.user, name='Běžný', initial_balance=1000)
+        savings = FinancialAccount.objects.create(user=self.user, name='Spořicí')
+        rows = [
+            (date(2026, 1, 3), 'INCOME', '500', self.account, None),
+            (date(2026, 1, 3), 'EXPENSE', '120', self.account, None),
+            (date(2026, 1, 3), 'EXPENSE', '30', self.account, None),
+            (date(2026, 1, 20), 'TRANSFER', '200', self.account, savings),
+            (date(2026, 2, 2), 'TRANSFER', '50', savings, self.account),
+            (date(2026, 2, 2), 'EXPENSE', '10', self.account, None),
+            (date(2026, 3, 1), 'EXPENSE', '99.99', self.account, None),
+        ]
+        for day, kind, amount, account, to_account in rows:
+            Transaction.objects.create(user=self.user, date=day, type=kind, amount=Decimal(amount),
+                                       account=account, to_account=to_account)
+        # Zůstatek po každém řádku v chronologickém pořadí (date, id)
+        self.expected = {}
+        balance = Decimal('1000')
+        for transaction in Transaction.objects.order_by('date', 'id'):
+            if transaction.account_id == self.account.pk:
+                balance += transaction.amount if transaction.type == 'INCOME' else -transaction.amount
+            else:
+                balance += transaction.amount
+            self.expected[transaction.pk] = balance
+    
+    def fetch_all(self, **params):
+        """Projde všechny stránky výpisu přes kurzor."""
+        url = reverse('transaction-list')
+        params = {'account': self.account.pk, 'running_balance': 'true', 'page_size': 3, **params}
+        rows = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            rows += response.data['results']
+            if not response.data['next']:
+                return rows
+            response = self.client.get(response.data['next'])
+    
+    def test_running_balance_across_pages(self):
+        """Test zůstatku po řádku přes stránky v obou směrech řazení i s kontrolními body"""
+        from accounts.balances import rebuild_checkpoints
+        rebuild_checkpoints([self.account.pk], date(2026, 2, 28))
+        for ordering in ('-date', 'date'):
+            rows = self.fetch_all(ordering=ordering)
+            self.assertEqual(len(rows), 7)
+            self.assertEqual(
+                {row['id']: Decimal(row['running_balance']) for row in rows},
+                self.expected
+            )
+    
+    def test_rejects_unsupported_filters(self):
+        """Test že running_balance nelze kombinovat s filtry, které vynechají řádky"""
+        response = self.client.get(reverse('transaction-list'), {
+            'account': self.account.pk, 'running_balance': 'true', 'type': 'EXPENSE'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        # Bez running_balance zůstává výpis beze změny
+        response = self.client.get(reverse('transaction-list'), {'account': self.account.pk})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
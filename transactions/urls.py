@@ -1,10 +1,11 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, CategoryViewSet, RecurringTransactionViewSet, generate_demo_data, delete_all_data
+from .views import TransactionViewSet, CategoryViewSet, CategoryRuleViewSet, RecurringTransactionViewSet, generate_demo_data, delete_all_data
 
 router = DefaultRouter()
 router.register('transactions', TransactionViewSet, basename='transaction')
 router.register('categories', CategoryViewSet, basename='category')
+router.register('category-rules', CategoryRuleViewSet, basename='category-rule')
 router.register('recurring', RecurringTransactionViewSet, basename='recurring-transaction')
 
 urlpatterns = [
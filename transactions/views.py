@@ -7,6 +7,7 @@ views.py - ViewSety pro aplikaci Transactions
     - Dashboard statistiky (výpočty zůstatků, grafy, KPI)
     - Správu kategorií
     - Import a export dat (CSV, JSON)
+    - Automatickou kategorizaci transakcí (pravidla, návrhy kategorií)
     - Opakující se platby (generování, historie)
 
 @note Dashboard statistiky obsahují komplexní výpočty pro frontend grafy
@@ -18,14 +19,24 @@ from rest_framework.response import Response
 from django.db.models import Sum, Q, Count
 from django.utils import timezone
 from django.http import HttpResponse
+from django.core.exceptions import ValidationError as DjangoValidationError
 from datetime import timedelta, datetime
 from dateutil.relativedelta import relativedelta
 import csv
 import json
-from .models import Transaction, Category, RecurringTransaction, RecurringTransactionHistory
-from .serializers import TransactionSerializer, CategorySerializer, RecurringTransactionSerializer, RecurringTransactionHistorySerializer
+from .models import Transaction, Category, CategoryRule, RecurringTransaction, RecurringTransactionHistory
+from .serializers import TransactionSerializer, LedgerTransactionSerializer, CategorySerializer, CategoryRuleSerializer, RecurringTransactionSerializer, RecurringTransactionHistorySerializer
+from .categorizer import get_categorizer, suggest_category as suggest_transaction_category, TransactionCategorizer
+from .rules import get_rule_set, match_category_rule, invalidate_rule_set
+from .fields import raw_cents
+from .pagination import LedgerCursorPagination
+from .recurring_detection import detect_recurring
+from .dedup import DATE_WINDOW_DAYS, MIN_SCORE, find_duplicate_groups, resolve_duplicates
+from accounts.balances import balance_delta_expression, set_running_balances
+from accounts.currency import CurrencyConverter
+from budgets.models import Budget
+from budgets.spending import refresh_spent_totals
 from notifications.models import Notification
-from budgets.services import BudgetAlertService
 
 class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -77,6 +88,77 @@ class CategoryViewSet(viewsets.ModelViewSet):
             'total_categories': Category.objects.filter(user=user).count()
         }, status=status.HTTP_201_CREATED)
 
+class CategoryRuleViewSet(viewsets.ModelViewSet):
+    """
+    ViewSet pro pravidla automatické kategorizace.
+    Pravidla se používají při importu CSV a při zpětném přepočtu historie.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = CategoryRuleSerializer
+
+    def get_queryset(self):
+        return CategoryRule.objects.filter(user=self.request.user).select_related('category')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+        invalidate_rule_set(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_rule_set(self.request.user.pk)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_rule_set(self.request.user.pk)
+
+    @action(detail=False, methods=['post'])
+    def reapply(self, request):
+        """
+        Aplikuje pravidla na historii transakcí.
+        
+        Parametry:
+        - only_uncategorized: pouze transakce bez kategorie (výchozí true)
+        
+        Transakce se seskupí podle cílové kategorie a každá skupina se
+        aktualizuje jedním hromadným UPDATE.
+        """
+        only_uncategorized = str(request.data.get('only_uncategorized', 'true')).lower() not in ('false', '0')
+        rule_set = get_rule_set(request.user)
+        
+        transactions = Transaction.objects.filter(
+            user=request.user,
+            type__in=['INCOME', 'EXPENSE']
+        )
+        if only_uncategorized:
+            transactions = transactions.filter(category__isnull=True)
+        
+        ids_by_category = {}
+        if len(rule_set):
+            rows = transactions.values_list('id', 'description', 'amount', 'type', 'category_id')
+            for pk, description, amount, transaction_type, current_category in rows.order_by().iterator(chunk_size=2000):
+                category_id = rule_set.match(description, amount, transaction_type)
+                if category_id is not None and category_id != current_category:
+                    ids_by_category.setdefault(category_id, []).append(pk)
+        
+        now = timezone.now()
+        updated_count = 0
+        for category_id, ids in ids_by_category.items():
+            # updated_at nastavujeme ručně - hromadný update nevolá auto_now
+            updated_count += Transaction.objects.filter(pk__in=ids).update(
+                category_id=category_id,
+                updated_at=now
+            )
+        if updated_count:
+            # Hromadný update nevolá signály - čerpání rozpočtů přepočítáme
+            refresh_spent_totals(Budget.objects.filter(user=request.user))
+        
+        return Response({
+            'message': f'Pravidla aplikována na {updated_count} transakcí',
+            'updated': updated_count,
+            'categories': len(ids_by_category)
+        })
+
+
 class TransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = TransactionSerializer
@@ -92,8 +174,11 @@ class TransactionViewSet(viewsets.ModelViewSet):
         - date_from: datum od (YYYY-MM-DD)
         - date_to: datum do (YYYY-MM-DD)
         - ordering: řazení (-date, date, -amount, amount)
+        - running_balance: s parametrem account vrátí výpis účtu se zůstatkem po každém řádku
         """
         queryset = Transaction.objects.filter(user=self.request.user)
+        if self.action == 'list' and self._ledger_account() is not None:
+            return self._ledger_queryset(queryset)
         
         # Vyhledávání v popisu
         search = self.request.query_params.get('search', None)
@@ -144,27 +229,214 @@ class TransactionViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    # Filtry, se kterými výpis se zůstatkem zůstává souvislým úsekem historie účtu
+    LEDGER_PARAMS = {'account', 'running_balance', 'date_from', 'date_to', 'ordering', 'cursor', 'page_size'}
+
+    def _ledger_account(self):
+        """Účet pro výpis se zůstatkem (running_balance=true a account), jinak None."""
+        params = self.request.query_params
+        if params.get('running_balance', '').lower() not in ('true', '1') or not params.get('account', '').isdigit():
+            return None
+        if not hasattr(self, '_ledger_account_cache'):
+            from accounts.models import FinancialAccount
+            self._ledger_account_cache = FinancialAccount.objects.filter(
+                user=self.request.user, pk=params['account']
+            ).first()
+        return self._ledger_account_cache
+
+    def _ledger_queryset(self, queryset):
+        """
+        Řádky výpisu účtu (včetně příchozích převodů) se změnou zůstatku
+        a okenním součtem těchto změn v pořadí stránkování.
+        """
+        from django.db.models import F, Window
+        account = self._ledger_account()
+        queryset = queryset.filter(Q(account=account) | Q(to_account=account, type='TRANSFER'))
+        date_from = self.request.query_params.get('date_from')
+        date_to = self.request.query_params.get('date_to')
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+        descending = self.request.query_params.get('ordering', '-date') != 'date'
+        order = [F('date').desc(), F('id').desc()] if descending else [F('date').asc(), F('id').asc()]
+        return queryset.select_related('category', 'account', 'to_account').annotate(
+            balance_delta=balance_delta_expression(account),
+            cumulative_delta=Window(Sum(balance_delta_expression(account)), order_by=order),
+        )
+
+    def list(self, request, *args, **kwargs):
+        """Výpis transakcí; s running_balance=true a account výpis účtu s kurzorovým stránkováním."""
+        if request.query_params.get('running_balance', '').lower() not in ('true', '1'):
+            return super().list(request, *args, **kwargs)
+        account = self._ledger_account()
+        if account is None:
+            return Response(
+                {'error': 'running_balance vyžaduje parametr account s vlastním účtem'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        unsupported = set(request.query_params) - self.LEDGER_PARAMS
+        if unsupported:
+            return Response(
+                {'error': f'running_balance nelze kombinovat s filtry: {", ".join(sorted(unsupported))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        descending = request.query_params.get('ordering', '-date') != 'date'
+        paginator = LedgerCursorPagination()
+        paginator.ordering = ('-date', '-id') if descending else ('date', 'id')
+        try:
+            rows = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        except (ValueError, DjangoValidationError):
+            return Response({'error': 'Neplatné datum'}, status=status.HTTP_400_BAD_REQUEST)
+        set_running_balances(account, rows, descending=descending)
+        serializer = LedgerTransactionSerializer(rows, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
     def perform_create(self, serializer):
-        """Uložení transakce a kontrola budget alerts"""
-        transaction = serializer.save(user=self.request.user)
+        """Uložení transakce a automatická kategorizace"""
+        data = serializer.validated_data
+        extra = {}
+        # Kategorii navrhujeme jen pokud ji klient vůbec neposlal;
+        # uživatelská pravidla mají přednost před naučeným modelem
+        if 'category' not in data:
+            extra['category'] = match_category_rule(
+                self.request.user,
+                data.get('description', ''),
+                data.get('amount'),
+                data.get('type')
+            ) or suggest_transaction_category(
+                self.request.user,
+                data.get('description', ''),
+                data.get('amount'),
+                data.get('type')
+            )
+        # Čerpání dotčených rozpočtů a notifikace při překročení prahu řeší signál
+        # transakce (BudgetAlertService.apply_transaction_change) - jen dotčené rozpočty
+        serializer.save(user=self.request.user, **extra)
+
+    @action(detail=False, methods=['get'])
+    def suggest_category(self, request):
+        """
+        Navrhne kategorie pro transakci podle popisu a částky.
+
+        Query parametry:
+        - description: popis transakce
+        - amount: částka (volitelná)
+        - type: INCOME nebo EXPENSE (výchozí EXPENSE)
+        """
+        description = request.query_params.get('description', '')
+        transaction_type = request.query_params.get('type', 'EXPENSE')
+        amount = request.query_params.get('amount')
+        try:
+            amount = float(amount.replace(',', '.')) if amount else None
+        except ValueError:
+            return Response(
+                {'error': 'Neplatná částka'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        prediction = get_categorizer(request.user).predict_many(
+            [(description, amount, transaction_type)], top=3
+        )[0]
+        # Jen kategorie uživatele - model ani pravidla nesmí prozradit cizí kategorii
+        categories = Category.objects.filter(user=request.user).in_bulk(
+            [category_id for category_id, _ in prediction]
+        )
+
+        return Response({
+            'suggestions': [
+                {
+                    'category': CategorySerializer(categories[category_id]).data,
+                    'confidence': round(confidence, 4)
+                }
+                for category_id, confidence in prediction
+                if category_id in categories
+            ]
+        })
+
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """
+        Vrátí skupiny pravděpodobně duplicitních transakcí ke kontrole.
+        
+        Parametry:
+        - window_days: max. rozdíl dat v jedné skupině (výchozí 2)
+        - min_score: minimální skóre podobnosti 0-1 (výchozí 0.6)
+        """
+        try:
+            window_days = min(int(request.query_params.get('window_days', DATE_WINDOW_DAYS)), 7)
+            min_score = float(request.query_params.get('min_score', MIN_SCORE))
+        except ValueError:
+            return Response(
+                {'error': 'Neplatné parametry window_days nebo min_score'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        groups = find_duplicate_groups(request.user, window_days=window_days, min_score=min_score)
+        transactions = Transaction.objects.filter(
+            user=request.user,
+            pk__in=[pk for group in groups for pk in group['ids']]
+        ).select_related('category', 'account', 'to_account').in_bulk()
         
-        # Kontrola rozpočtů a vytvoření notifikací při překročení
-        if transaction.type == 'EXPENSE':
-            BudgetAlertService.check_budget_alerts(self.request.user, transaction)
+        return Response({
+            'groups': [
+                {
+                    'keep_id': group['keep_id'],
+                    'score': group['score'],
+                    'transactions': self.get_serializer(
+                        [transactions[pk] for pk in group['ids']], many=True
+                    ).data
+                }
+                for group in groups
+            ],
+            'count': len(groups)
+        })
     
-    def perform_update(self, serializer):
-        """Aktualizace transakce a kontrola budget alerts"""
-        transaction = serializer.save()
+    @action(detail=False, methods=['post'])
+    def merge_duplicates(self, request):
+        """
+        Hromadně vyřeší duplicity.
+        
+        Tělo požadavku:
+        - mode: 'merge' (doplní údaje a převede historii na ponechanou transakci) nebo 'delete'
+        - groups: [{'keep': id, 'remove': [id, ...]}, ...]
+        - all: true = vyřeší všechny nalezené skupiny s doporučenou transakcí k ponechání
+        """
+        mode = request.data.get('mode', 'merge')
+        if mode not in ('merge', 'delete'):
+            return Response(
+                {'error': 'mode musí být merge nebo delete'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if str(request.data.get('all', '')).lower() in ('true', '1'):
+            groups = [
+                {'keep': group['keep_id'], 'remove': group['ids']}
+                for group in find_duplicate_groups(request.user)
+            ]
+        else:
+            groups = request.data.get('groups') or []
         
-        # Kontrola rozpočtů po úpravě transakce
-        if transaction.type == 'EXPENSE':
-            BudgetAlertService.check_budget_alerts(self.request.user, transaction)
+        try:
+            result = resolve_duplicates(request.user, groups, mode=mode)
+        except (KeyError, TypeError, ValueError, Transaction.DoesNotExist) as e:
+            return Response(
+                {'error': f'Neplatné skupiny duplicit: {e}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'message': f'Odstraněno {result["deleted"]} duplicitních transakcí',
+            **result
+        })
 
     @action(detail=False, methods=['get'])
     def dashboard_stats(self, request):
         """Získá základní statistiky pro dashboard s rozšířenými KPI"""
         try:
             user = request.user
+            converter = CurrencyConverter(user)
             now = timezone.now()
             current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
             previous_month_start = (current_month_start - timedelta(days=1)).replace(day=1)
@@ -172,16 +444,16 @@ class TransactionViewSet(viewsets.ModelViewSet):
             last_30_days = now - timedelta(days=30)
             
             # Celkové příjmy
-            total_income = Transaction.objects.filter(
+            total_income = converter.total(Transaction.objects.filter(
                 user=user,
                 type='INCOME'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
             # Celkové výdaje
-            total_expenses = Transaction.objects.filter(
+            total_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
             # Zůstatek
             balance = total_income - total_expenses
@@ -191,25 +463,28 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 user=user
             ).order_by('-date')[:5]
             
-            # Top 3 výdajové kategorie (aktuální měsíc)
-            top_categories = Transaction.objects.filter(
-                user=user,
-                type='EXPENSE',
-                date__gte=current_month_start
-            ).values(
-                'category__name',
-                'category__icon',
-                'category__color'
-            ).annotate(
-                total=Sum('amount')
-            ).order_by('-total')[:3]
+            # Top 3 výdajové kategorie (aktuální měsíc) - součty v měně uživatele
+            top_categories = sorted(
+                converter.grouped(
+                    Transaction.objects.filter(
+                        user=user,
+                        type='EXPENSE',
+                        date__gte=current_month_start
+                    ),
+                    'category__name',
+                    'category__icon',
+                    'category__color'
+                ),
+                key=lambda row: row['total'],
+                reverse=True
+            )[:3]
             
             # Celkové výdaje aktuálního měsíce pro výpočet procent
-            current_month_expenses = Transaction.objects.filter(
+            current_month_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE',
                 date__gte=current_month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
             # Formátování top kategorií s procenty
             top_expense_categories = []
@@ -225,28 +500,28 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 })
             
             # Aktuální měsíc úspory
-            current_month_income = Transaction.objects.filter(
+            current_month_income = converter.total(Transaction.objects.filter(
                 user=user,
                 type='INCOME',
                 date__gte=current_month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
             current_month_savings = float(current_month_income) - float(current_month_expenses)
             
             # Předchozí měsíc úspory
-            previous_month_income = Transaction.objects.filter(
+            previous_month_income = converter.total(Transaction.objects.filter(
                 user=user,
                 type='INCOME',
                 date__gte=previous_month_start,
                 date__lt=current_month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
-            previous_month_expenses = Transaction.objects.filter(
+            previous_month_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE',
                 date__gte=previous_month_start,
                 date__lt=current_month_start
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
             previous_month_savings = float(previous_month_income) - float(previous_month_expenses)
             
@@ -261,22 +536,22 @@ class TransactionViewSet(viewsets.ModelViewSet):
             # --- ROZŠÍŘENÉ KPI ---
             
             # 1. Průměrné denní výdaje (posledních 30 dní)
-            last_30_expenses = Transaction.objects.filter(
+            last_30_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE',
                 date__gte=last_30_days
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             avg_daily_spending = float(last_30_expenses) / 30
             
             # Předchozích 30 dní pro porovnání
             prev_30_days_start = now - timedelta(days=60)
             prev_30_days_end = now - timedelta(days=30)
-            prev_30_expenses = Transaction.objects.filter(
+            prev_30_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE',
                 date__gte=prev_30_days_start,
                 date__lt=prev_30_days_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             prev_avg_daily = float(prev_30_expenses) / 30
             
             if prev_avg_daily > 0:
@@ -314,32 +589,38 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 next_due_date__lte=now + timedelta(days=7)
             ).count()
             
-            # 5. Sparkline data - posledních 7 dní výdajů
-            sparkline_data = []
-            for i in range(6, -1, -1):
-                day_start = (now - timedelta(days=i)).replace(hour=0, minute=0, second=0, microsecond=0)
-                day_end = day_start + timedelta(days=1)
-                day_expenses = Transaction.objects.filter(
-                    user=user,
-                    type='EXPENSE',
-                    date__gte=day_start.date(),
-                    date__lt=day_end.date()
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                sparkline_data.append(float(day_expenses))
+            # 5. Sparkline data - posledních 7 dní výdajů (jeden dotaz seskupený podle dne)
+            sparkline_start = (now - timedelta(days=6)).date()
+            daily_expenses = {
+                row['date']: row['total']
+                for row in converter.grouped(
+                    Transaction.objects.filter(
+                        user=user,
+                        type='EXPENSE',
+                        date__gte=sparkline_start,
+                        date__lte=now.date()
+                    ),
+                    'date'
+                )
+            }
+            sparkline_data = [
+                float(daily_expenses.get(sparkline_start + timedelta(days=i), 0))
+                for i in range(7)
+            ]
             
             # 6. Dnešní výdaje
             today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            today_expenses = Transaction.objects.filter(
+            today_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE',
                 date=today_start.date()
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
-            yesterday_expenses = Transaction.objects.filter(
+            yesterday_expenses = converter.total(Transaction.objects.filter(
                 user=user,
                 type='EXPENSE',
                 date=(today_start - timedelta(days=1)).date()
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            ))
             
             if yesterday_expenses > 0:
                 today_change = ((float(today_expenses) - float(yesterday_expenses)) / float(yesterday_expenses)) * 100
@@ -370,7 +651,9 @@ class TransactionViewSet(viewsets.ModelViewSet):
                 'upcoming_recurring_count': upcoming_recurring,
                 'sparkline_data': sparkline_data,
                 'today_expenses': float(today_expenses),
-                'today_change': today_change
+                'today_change': today_change,
+                'currency': converter.currency,
+                'missing_rates': sorted(converter.missing_rates)
             })
         except Exception as e:
             print(f"Error in dashboard_stats: {str(e)}")
@@ -482,13 +765,17 @@ class TransactionViewSet(viewsets.ModelViewSet):
         writer = csv.writer(response)
         writer.writerow(['Datum', 'Popis', 'Kategorie', 'Typ', 'Částka'])
         
-        for transaction in queryset:
+        # Jen potřebné sloupce, částka přímo v haléřích (bez Decimal a bez dotazu na kategorii)
+        rows = queryset.values_list(
+            'date', 'description', 'category__name', 'type', raw_cents()
+        ).iterator(chunk_size=2000)
+        for date, description, category_name, transaction_type, amount_cents in rows:
             writer.writerow([
-                transaction.date.strftime('%Y-%m-%d'),
-                transaction.description,
-                transaction.category.name if transaction.category else 'Bez kategorie',
-                'Příjem' if transaction.type == 'INCOME' else 'Výdaj',
-                float(transaction.amount)
+                date.strftime('%Y-%m-%d'),
+                description,
+                category_name or 'Bez kategorie',
+                'Příjem' if transaction_type == 'INCOME' else 'Výdaj',
+                amount_cents / 100
             ])
         
         return response
@@ -502,6 +789,9 @@ class TransactionViewSet(viewsets.ModelViewSet):
         Datum,Popis,Kategorie,Typ,Částka
         2024-01-15,Nákup v obchodě,Jídlo a nápoje,Výdaj,500
         2024-01-16,Výplata,Mzda,Příjem,25000
+        
+        Řádky bez kategorie se kategorizují podle pravidel uživatele (rules.py)
+        a zbylé modelem natrénovaným z dosavadních transakcí (categorizer.py).
         """
         if 'file' not in request.FILES:
             return Response(
@@ -536,6 +826,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
             imported_count = 0
             skipped_count = 0
             errors = []
+            parsed_rows = []
             
             for row_num, row in enumerate(reader, start=2):  # start=2 protože řádek 1 je hlavička
                 try:
@@ -601,25 +892,72 @@ class TransactionViewSet(viewsets.ModelViewSet):
                     # Popis
                     description = row.get('Popis', '').strip()
                     
+                    parsed_rows.append({
+                        'row_num': row_num,
+                        'date': date,
+                        'type': transaction_type,
+                        'amount': amount,
+                        'category': category,
+                        'description': description
+                    })
+                    
+                except Exception as e:
+                    errors.append(f'Řádek {row_num}: {str(e)}')
+                    skipped_count += 1
+            
+            # Řádky bez kategorie nejdřív projdou pravidly uživatele
+            uncategorized = [row for row in parsed_rows if row['category'] is None]
+            auto_categorized_count = 0
+            rule_set = get_rule_set(request.user)
+            if uncategorized and len(rule_set):
+                matches = rule_set.match_many(
+                    [(row['description'], row['amount'], row['type']) for row in uncategorized]
+                )
+                categories = Category.objects.filter(user=request.user).in_bulk(
+                    {category_id for category_id in matches if category_id is not None}
+                )
+                for row, category_id in zip(uncategorized, matches):
+                    if category_id in categories:
+                        row['category'] = categories[category_id]
+                        auto_categorized_count += 1
+                uncategorized = [row for row in uncategorized if row['category'] is None]
+            
+            # Zbylé řádky ohodnotíme modelem najednou, ne po jednom
+            if uncategorized:
+                predictions = get_categorizer(request.user).predict_many(
+                    [(row['description'], row['amount'], row['type']) for row in uncategorized]
+                )
+                predicted_ids = {
+                    prediction[0][0] for prediction in predictions
+                    if prediction and prediction[0][1] >= TransactionCategorizer.MIN_CONFIDENCE
+                }
+                categories = Category.objects.filter(user=request.user).in_bulk(predicted_ids)
+                for row, prediction in zip(uncategorized, predictions):
+                    if prediction and prediction[0][0] in categories \
+                            and prediction[0][1] >= TransactionCategorizer.MIN_CONFIDENCE:
+                        row['category'] = categories[prediction[0][0]]
+                        auto_categorized_count += 1
+            
+            for row in parsed_rows:
+                try:
                     # Vytvoření transakce
                     Transaction.objects.create(
                         user=request.user,
-                        date=date,
-                        type=transaction_type,
-                        amount=amount,
-                        category=category,
-                        description=description
+                        date=row['date'],
+                        type=row['type'],
+                        amount=row['amount'],
+                        category=row['category'],
+                        description=row['description']
                     )
-                    
                     imported_count += 1
-                    
                 except Exception as e:
-                    errors.append(f'Řádek {row_num}: {str(e)}')
+                    errors.append(f'Řádek {row["row_num"]}: {str(e)}')
                     skipped_count += 1
             
             return Response({
                 'message': f'Import dokončen',
                 'imported': imported_count,
+                'auto_categorized': auto_categorized_count,
                 'skipped': skipped_count,
                 'errors': errors[:10]  # Vrátit max 10 chyb
             }, status=status.HTTP_200_OK)
@@ -643,16 +981,19 @@ class TransactionViewSet(viewsets.ModelViewSet):
         if date_to:
             queryset = queryset.filter(date__lte=date_to)
         
-        data = []
-        for transaction in queryset:
-            data.append({
-                'id': transaction.id,
-                'date': transaction.date.strftime('%Y-%m-%d'),
-                'description': transaction.description,
-                'category': transaction.category.name if transaction.category else None,
-                'type': transaction.type,
-                'amount': float(transaction.amount)
-            })
+        data = [
+            {
+                'id': row['id'],
+                'date': row['date'].strftime('%Y-%m-%d'),
+                'description': row['description'],
+                'category': row['category__name'],
+                'type': row['type'],
+                'amount': row['amount_cents'] / 100
+            }
+            for row in queryset.values(
+                'id', 'date', 'description', 'category__name', 'type', amount_cents=raw_cents()
+            ).iterator(chunk_size=2000)
+        ]
         
         response = HttpResponse(json.dumps(data, indent=2, ensure_ascii=False), content_type='application/json; charset=utf-8')
         response['Content-Disposition'] = f'attachment; filename="transakce_{timezone.now().strftime("%Y%m%d")}.json"'
@@ -852,6 +1193,38 @@ class RecurringTransactionViewSet(viewsets.ModelViewSet):
         
         return Response(self.get_serializer(due, many=True).data)
     
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        """
+        Navrhne opakující se platby podle historie transakcí.
+        
+        Parametry:
+        - min_confidence: minimální jistota návrhu (0-1, výchozí 0.5)
+        
+        Návrhy mají stejná pole jako RecurringTransactionSerializer, takže je
+        klient může rovnou odeslat na vytvoření opakující se platby.
+        """
+        try:
+            min_confidence = float(request.query_params.get('min_confidence', 0.5))
+        except ValueError:
+            return Response(
+                {'error': 'min_confidence musí být číslo'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        suggestions = detect_recurring(request.user, min_confidence=min_confidence)
+        categories = Category.objects.filter(
+            user=request.user,
+            pk__in={item['category_id'] for item in suggestions if item['category_id']}
+        ).in_bulk()
+        
+        for item in suggestions:
+            category = categories.get(item['category_id'])
+            item['category'] = CategorySerializer(category).data if category else None
+            item['amount'] = str(item['amount'])
+        
+        return Response({'suggestions': suggestions, 'count': len(suggestions)})
+    
     @action(detail=True, methods=['post'])
     def toggle_status(self, request, pk=None):
         """Přepne status mezi ACTIVE a PAUSED"""